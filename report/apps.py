@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.conf import settings
 
 
 class ReportConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'report'
+
+    def ready(self):
+        from .block_memo import BlockResultMemo
+        from .parsers import CommandParserBase
+
+        # Per-block parse results are memoized for every parser when the memo is enabled
+        if settings.PARSE_MEMO_MAX_BYTES:
+            CommandParserBase.block_memo = BlockResultMemo(
+                max_bytes=settings.PARSE_MEMO_MAX_BYTES,
+                store_path=settings.PARSE_MEMO_STORE,
+                store_max_bytes=settings.PARSE_MEMO_STORE_MAX_BYTES,
+            )
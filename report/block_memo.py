@@ -0,0 +1,160 @@
+import base64
+import datetime
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from collections import OrderedDict
+
+from .parse_cache import parser_code_version
+
+
+class BlockResultMemo:
+    """
+    Content-addressed memo of per-block parse results.
+
+    Many command blocks are byte-identical between nodes and between successive health
+    checks of the same node (``romversion *``, ``eeshow backplane``, SFP data of
+    unchanged optics). Parsed rows are stored under a digest of the parser class, the
+    parser code version, the command line and the block output, so an identical block is
+    never parsed twice.
+
+    Rows are kept as compressed JSON (see encode_rows), never pickled, in a bounded
+    in-process LRU of ``max_bytes`` and, with ``store_path``, in a SQLite file shared by
+    every process (web workers, Celery workers, process-pool parse workers) whose least
+    recently used entries are deleted once it holds more than ``store_max_bytes``.
+    Blocks whose rows hold values JSON cannot carry are not memoized.
+    """
+
+    def __init__(self, max_bytes, store_path=None, store_max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.store_path = store_path
+        self.store_max_bytes = store_max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._connection = None
+        self._connection_pid = None
+        self._store_size = 0
+
+    def key(self, parser, command_key, output):
+        hasher = hashlib.sha1()
+        for part in (type(parser).__qualname__, parser_code_version(), command_key):
+            hasher.update(part.encode())
+            hasher.update(b'\0')
+        hasher.update(output.encode('utf-8', 'surrogatepass'))
+        return hasher.hexdigest()
+
+    def connection(self):
+        # SQLite connections must not cross a fork, so each process opens its own
+        if self._connection is None or self._connection_pid != os.getpid():
+            self._connection = sqlite3.connect(self.store_path, timeout=30, isolation_level=None)
+            self._connection.execute('PRAGMA journal_mode=WAL')
+            self._connection.execute('DROP TABLE IF EXISTS block_rows')  # Pickled rows of older versions
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS block_memo '
+                '(key TEXT PRIMARY KEY, rows BLOB, size INTEGER, used_at REAL)'
+            )
+            self._connection.execute('CREATE INDEX IF NOT EXISTS block_memo_used_at ON block_memo (used_at)')
+            self._connection_pid = os.getpid()
+            self._store_size = self.store_size()
+        return self._connection
+
+    def store_size(self):
+        return self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM block_memo').fetchone()[0]
+
+    def get(self, key):
+        blob = self.entries.get(key)
+        if blob is not None:
+            self.entries.move_to_end(key)
+        elif self.store_path:
+            connection = self.connection()
+            row = connection.execute('SELECT rows FROM block_memo WHERE key = ?', (key,)).fetchone()
+            if row is not None:
+                blob = row[0]
+                connection.execute('UPDATE block_memo SET used_at = ? WHERE key = ?', (time.time(), key))
+                self.remember(key, blob)
+        if blob is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Decoded afresh on every hit, so callers never share rows with the memo
+        return decode_rows(blob)
+
+    def put(self, key, rows):
+        try:
+            blob = encode_rows(rows)
+        except TypeError:
+            return
+        self.remember(key, blob)
+        if self.store_path:
+            connection = self.connection()
+            connection.execute(
+                'INSERT OR REPLACE INTO block_memo (key, rows, size, used_at) VALUES (?, ?, ?, ?)',
+                (key, blob, len(blob), time.time()),
+            )
+            self._store_size += len(blob)
+            if self._store_size > self.store_max_bytes:
+                self.evict_store()
+
+    def evict_store(self):
+        """Deletes the least recently used stored entries until the store fits in ``store_max_bytes``."""
+        connection = self.connection()
+        connection.execute(
+            'DELETE FROM block_memo WHERE key IN ('
+            ' SELECT key FROM (SELECT key, SUM(size) OVER (ORDER BY used_at DESC, key) AS total FROM block_memo)'
+            ' WHERE total > ?)',
+            (self.store_max_bytes,),
+        )
+        self._store_size = self.store_size()
+
+    def remember(self, key, blob):
+        if len(blob) > self.max_bytes:
+            return
+        previous = self.entries.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self.entries[key] = blob
+        self.size += len(blob)
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def clear(self):
+        self.entries.clear()
+        self.size = 0
+        self.hits = self.misses = 0
+
+    def __getstate__(self):
+        # Shipped to parse workers without the rows or the open connection
+        state = self.__dict__.copy()
+        state.update(entries=OrderedDict(), size=0, _connection=None, _connection_pid=None, _store_size=0)
+        return state
+
+
+def encode_value(value):
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    if isinstance(value, datetime.timedelta):
+        return {'__timedelta__': [value.days, value.seconds, value.microseconds]}
+    raise TypeError(f"{type(value).__name__} rows are not memoized")
+
+
+def decode_value(obj):
+    if '__bytes__' in obj:
+        return base64.b64decode(obj['__bytes__'])
+    if '__timedelta__' in obj:
+        return datetime.timedelta(*obj['__timedelta__'])
+    return obj
+
+
+def encode_rows(rows):
+    """Compressed JSON of parsed rows, with the bytes and timedelta values parsers produce tagged."""
+    return zlib.compress(json.dumps(rows, default=encode_value, separators=(',', ':')).encode())
+
+
+def decode_rows(blob):
+    return json.loads(zlib.decompress(blob), object_hook=decode_value)
@@ -0,0 +1,64 @@
+import hashlib
+import json
+from collections.abc import Mapping
+
+# Key used inside trie nodes to hold the base commands whose prefix ends at that node.
+_MATCHES = None
+
+
+class CommandPatternMatcher(Mapping):
+    """
+    Compiled form of ``command_patterns.yaml``.
+
+    A pattern matches a command line when the line equals the pattern or starts with
+    the pattern minus its last character (``'showline *'`` -> ``'showline '``), which
+    is the rule ``LogParser`` has always applied. Because an exact match always
+    satisfies the prefix rule, every pattern reduces to a single prefix, and all the
+    prefixes are stored in one character trie. Resolving a command line is a single
+    walk down the trie, independent of how many base commands or patterns exist.
+
+    The matcher behaves as a read-only mapping of base command -> pattern list, so it
+    can be used wherever the raw YAML dictionary was used before.
+    """
+
+    def __init__(self, command_key_to_fetch_pattern):
+        self.patterns = dict(command_key_to_fetch_pattern)
+        # Stable fingerprint of the pattern set, used to invalidate persisted block indexes
+        self.digest = hashlib.sha1(json.dumps(self.patterns, sort_keys=True).encode()).hexdigest()
+        # Base commands are reported in YAML order, like the original linear scan did
+        self.order = {base_command: index for index, base_command in enumerate(self.patterns)}
+        self.root = {}
+        for base_command, pattern_list in self.patterns.items():
+            for pattern in pattern_list:
+                node = self.root
+                for char in pattern[:-1]:
+                    node = node.setdefault(char, {})
+                node.setdefault(_MATCHES, set()).add(base_command)
+
+    def match(self, command_line):
+        """
+        Returns the base commands matching ``command_line``, in YAML order.
+
+        :param command_line: The command text following the ``AUTO>`` prompt.
+        :return: A list of base command names, empty when nothing matches.
+        """
+        matches = set()
+        node = self.root
+        if _MATCHES in node:
+            matches.update(node[_MATCHES])
+        for char in command_line:
+            node = node.get(char)
+            if node is None:
+                break
+            if _MATCHES in node:
+                matches.update(node[_MATCHES])
+        return sorted(matches, key=self.order.__getitem__)
+
+    def __getitem__(self, base_command):
+        return self.patterns[base_command]
+
+    def __iter__(self):
+        return iter(self.patterns)
+
+    def __len__(self):
+        return len(self.patterns)
@@ -1,54 +1,352 @@
-
-
-
-from .parser_factory import ParserFactory
-from .log_reader import LogParser
-from .report_generator import ReportGenerator
 import re
 import datetime
-from .excel_generator import ExcelGenerator
 from typing import List
-from .parser_factory import ParserFactory
-from .parsers import CommandParserBase
-from .log_reader import LogParser
+from .parsers import CommandParserBase, parse_shared_block, parser_factory
+from .log_reader import MODE_STREAMING, HashingReader, LogParser, block_index_path, iter_archive_logs, log_file_name
+from .command_matcher import CommandPatternMatcher
+from .parallel_parsing import parse_commands_parallel
+from .parse_cache import ParseCache, calculate_file_checksum
+from .subport_status import expand_subport_status
+import contextlib
+import time
+from collections import deque
+from itertools import groupby
+from operator import itemgetter
 from .report_generator import ReportGenerator
 from .excel_generator import ExcelGenerator
 from .pdf_generator import PDFReportGenerator
 from .word_generator import WordReportGenerator
-import datetime
 import yaml
 from django.conf import settings
 import os
-from .models import Report
+from .models import FileUpload, NodeLease, Report
 from pathlib import Path
+from report_data.counter_deltas import compute_gpon_deltas
+from report_data.ingestion_libs import batched, remove_unseen_rows
 from report_data.ingestion_registry import ingestion_registry
-from report_data.models import Node
+from report_data.models import HealthCheckRun, Node
+from report_data.summary import update_node_summary
+from django.db import transaction
+from django.utils import timezone
+from uuid import uuid4
 
 COMMAND_PATTERNS_FILE = settings.BASE_DIR / 'report' / 'command_patterns.yaml'
 
+# (mtime_ns, CommandPatternMatcher) of the last compiled command_patterns.yaml
+_command_patterns_cache = {}
+
 def load_command_patterns():
+    """
+    Loads command_patterns.yaml compiled into a CommandPatternMatcher.
+
+    The compiled matcher is cached across process_data calls and only rebuilt when
+    the YAML file changes on disk.
+    """
+    mtime_ns = os.stat(COMMAND_PATTERNS_FILE).st_mtime_ns
+    cached = _command_patterns_cache.get(COMMAND_PATTERNS_FILE)
+    if cached and cached[0] == mtime_ns:
+        return cached[1]
     with open(COMMAND_PATTERNS_FILE, 'r') as file:
-        return yaml.safe_load(file)
+        matcher = CommandPatternMatcher(yaml.safe_load(file))
+    _command_patterns_cache[COMMAND_PATTERNS_FILE] = (mtime_ns, matcher)
+    return matcher
 
 
 def get_reports_folder_path():
-    media_folder = os.path.join(settings.BASE_DIR, 'media')
-    data_folder = os.path.join(media_folder, 'data')
+    data_folder = os.path.join(settings.MEDIA_ROOT, 'data')
     reports_folder = os.path.join(data_folder, 'reports')
     os.makedirs(reports_folder, exist_ok=True)
     return reports_folder
 
-def process_data(log_filepath: str, create_report: bool = True, create_excel: bool = False):
-    # Initialize the parser factory and register command parsers
-    print("Processing data...")
-    print(f"Log file path: {log_filepath}")
-    parser_factory = ParserFactory()
-    for name, ParserClass in CommandParserBase.registry.items():
-        parser_factory.register_parser(name, ParserClass)
-    
-    command_key_to_fetch_pattern = load_command_patterns()
+def get_parse_cache():
+    """Returns the configured ParseCache, or None when the parse cache is disabled."""
+    if not settings.PARSE_CACHE_ENABLED:
+        return None
+    return ParseCache(settings.PARSE_CACHE_DIR, settings.PARSE_CACHE_MAX_BYTES)
+
+
+def parse_commands(parser_factory, commands_data, workers=1, shard_size=64):
+    """
+    Parses every command group, serially or fanned out to a process pool.
+
+    Returns:
+        dict: command -> parsed rows. Commands whose parser raised ValueError are
+        reported and left out, in both modes.
+    """
+    if workers > 1:
+        return parse_commands_parallel(commands_data, workers, shard_size)
+
+    parsed_by_command = {}
+    for command, blocks in commands_data.items():
+        try:
+            parser = parser_factory.get_parser(command)
+            parsed_by_command[command] = parser.parse(blocks)
+        except ValueError as e:
+            print(e)
+    return parsed_by_command
+
+
+def iter_parsed_commands(parser_factory, commands_data, cache_writer=None):
+    """
+    Yields ``(command, rows)`` pairs in which ``rows`` parses the blocks of the command as
+    it is iterated, so only the rows being ingested are held in memory.
+
+    With a ParseCacheWriter the rows are also written to the parse cache batch by batch.
+    Rows the consumer leaves unread are parsed before moving on, so the cache entry still
+    holds every row.
+    """
+    for command, blocks in commands_data.items():
+        try:
+            parser = parser_factory.get_parser(command)
+        except ValueError as e:
+            print(e)
+            continue
+        rows = parser.parse_iter(blocks)
+        if cache_writer is not None:
+            rows = write_through(cache_writer, command, rows)
+        yield command, rows
+        deque(rows, maxlen=0)
+
+
+def iter_streamed_commands(parser_factory, log_parser, commands, cache_writer=None):
+    """
+    Yields ``(command, rows)`` pairs parsed from a log one block at a time as
+    ``LogParser.iter_blocks`` reads it. Each block is handed to the parsers of its
+    commands and dropped once they are done with it, so neither the log nor its blocks
+    are held, only the block being parsed.
+
+    Consecutive blocks of the same commands go to their parsers as one group and are
+    yielded as one pair; the collector writes most commands slot by slot, so a command
+    usually comes in several pairs. Each parser keeps one context for the whole log (see
+    CommandParserBase.iter_block_rows). Only the blocks of ``commands`` are parsed; with
+    a ParseCacheWriter the rows are written through to the parse cache as well.
+    """
+    contexts = {command: {} for command in commands}
+    blocks = (
+        (tuple(command for command in base_commands if command in commands), command_line, output)
+        for command_line, base_commands, output in log_parser.iter_blocks()
+    )
+    for block_commands, group in groupby(blocks, key=itemgetter(0)):
+        parsers = []
+        for command in block_commands:
+            try:
+                parsers.append((command, parser_factory.get_parser(command)))
+            except ValueError as e:
+                print(e)
+        group = ((command_line, {'command': command_line, 'output': output}) for _, command_line, output in group)
+        if len(parsers) == 1:
+            (command, parser), = parsers
+            pairs = [(command, parser.parse_iter(group, contexts[command]))]
+        else:
+            # Blocks read by several commands are parsed for all of them at once
+            pairs = (
+                (command, rows)
+                for command_key, block in group
+                for command, rows in zip(
+                    [command for command, _ in parsers],
+                    parse_shared_block([parser for _, parser in parsers], command_key, block),
+                )
+            )
+        for command, rows in pairs:
+            if cache_writer is not None:
+                rows = write_through(cache_writer, command, rows)
+            yield command, rows
+            deque(rows, maxlen=0)
+
+
+def write_through(cache_writer, command, rows):
+    """Passes rows through while writing them to a ParseCacheWriter in batches."""
+    cache_writer.write(command, [])  # Commands without rows still get their entry
+    try:
+        for batch in batched(rows, settings.INGESTION_BATCH_SIZE):
+            cache_writer.write(command, batch)
+            yield from batch
+    except Exception:
+        # The entry would miss rows of this command, so it is not committed
+        cache_writer.failed = True
+        raise
+
+
+def iter_cached_commands(frames):
+    """Groups the consecutive frames of a parse cache entry into ``(command, rows)`` pairs."""
+    for command, group in groupby(frames, key=itemgetter(0)):
+        yield command, (row for _, rows in group for row in rows)
+
+
+def log_collected_at(log_filepath):
+    """When a log was collected, taken from its modification time (kept by archived logs)."""
+    return datetime.datetime.fromtimestamp(os.path.getmtime(log_filepath), tz=timezone.utc)
+
+
+def node_ip_address(file_name):
+    """The IP address of the node a log belongs to, from a name like ``log_<node ip>_...``."""
+    return file_name.split('_')[1]
+
+
+def start_run(file_name, checksum, collected_at, file_upload=None):
+    """
+    Returns the HealthCheckRun of a log for the node named in its file name, recording
+    it on first ingestion. The run is identified by the log checksum, so re-ingesting
+    the same log refreshes that run instead of recording another one.
+    """
+    ip_address = node_ip_address(file_name)
+    # Looked up by the key alone, so a node created concurrently is fetched, not duplicated
+    node_instance, _ = Node.objects.get_or_create(ip_address=ip_address, defaults={'name': ip_address})
+    run, _ = HealthCheckRun.objects.get_or_create(
+        node=node_instance,
+        checksum=checksum,
+        defaults={'collected_at': collected_at, 'file_upload': file_upload},
+    )
+    return run
+
+
+def ingest_command(run, command, parsed_data):
+    """
+    Ingests the parsed rows of one command into ``run`` with its registered function.
+
+    Returns:
+        IngestionResult: The outcome, or None when nothing ingests the command or its
+        ingestion raised ValueError.
+    """
+    try:
+        ingestion_function = ingestion_registry.get_ingestion_method(command)
+        if not ingestion_function:
+            print(f"No ingestion method registered for command: {command}")
+            return None
+        return ingestion_function(run, parsed_data)
+    except ValueError as e:
+        # import traceback
+        # traceback.print_exc()
+        print(e)
+
+
+def finish_run(run, ingested_models=()):
+    """
+    Removes the state rows the run no longer reported from the tables of
+    ``ingested_models``, the models whose rows the run ingested without failures, then
+    recomputes the node's summary and the counter deltas the run affects.
+    """
+    remove_unseen_rows(run, ingested_models)
+    update_node_summary(run)
+    # This run and the node's next one (when logs are back-loaded out of order) are the
+    # runs whose previous run may have changed
+    affected = HealthCheckRun.objects.filter(node=run.node_id, collected_at__gte=run.collected_at)
+    affected_pks = list(affected.order_by('collected_at').values_list('pk', flat=True)[:2])
+    deltas = compute_gpon_deltas(HealthCheckRun.objects.filter(pk__in=affected_pks))
+    print(f"GponOnuStatsDelta: {deltas} rows computed.")
+
+
+def ingest_output(run, output):
+    """
+    Ingests parsed rows into ``run``, in command order.
 
-    log_parser = LogParser(log_filepath, command_key_to_fetch_pattern)
+    ``output`` is either a dict of command -> rows or an iterable of ``(command, rows)``
+    pairs whose rows are consumed as they are ingested.
+
+    Returns:
+        tuple: The IngestionResult of each ingested command, and the models whose rows
+        were all ingested, for finish_run.
+    """
+    results = []
+    ingested = {}
+    failed_commands = set()
+    for command, parsed_data in (output.items() if isinstance(output, dict) else output):
+        result = ingest_command(run, command, parsed_data)
+        if result is None or result.failures:
+            # A streamed command comes in several groups; one that raised or dropped rows
+            # leaves rows of the command unseen, so none of its rows are removed
+            failed_commands.add(command)
+        if result is not None:
+            results.append(result)
+            ingested[command] = result.model
+    failed_models = {model for command, model in ingested.items() if command in failed_commands}
+    return results, [model for model in ingested.values() if model not in failed_models]
+
+
+def ingest_parsed_data(file_name, output, checksum, collected_at, file_upload=None):
+    """
+    Ingests parsed rows for the node named in the log file name, in command order (see
+    ingest_output). Every row is attached to the HealthCheckRun of the log (see
+    start_run).
+
+    Returns:
+        list: The IngestionResult of each ingested command.
+    """
+    run = start_run(file_name, checksum, collected_at, file_upload)
+    results, ingested_models = ingest_output(run, output)
+    finish_run(run, ingested_models)
+    return results
+
+
+def ingest_log_stream(file_name, output, hashing_reader, collected_at, file_upload=None, skip_known=False):
+    """
+    Ingests the parsed rows of a log streamed through ``hashing_reader``, whose checksum
+    is only known once the stream was read to the end.
+
+    The rows go into a provisional run, recorded under a random checksum, in one
+    transaction. Once the stream is read the run gets the log's checksum, unless a run
+    of the node already has it or, with ``skip_known``, it was ingested or uploaded
+    before. Such a log was seen before, and as a stream cannot be read again to refresh
+    that run, the transaction is rolled back instead.
+
+    Returns:
+        tuple: The checksum of the log, and the IngestionResult of each ingested
+        command, or None when the log was seen before.
+    """
+    ip_address = node_ip_address(file_name)
+    node, _ = Node.objects.get_or_create(ip_address=ip_address, defaults={'name': ip_address})
+    with transaction.atomic():
+        # Writing first has SQLite take its write lock up front, waiting for other writers,
+        # rather than fail to upgrade a read lock later on
+        run = HealthCheckRun.objects.create(
+            node=node, checksum=uuid4().hex, collected_at=collected_at, file_upload=file_upload,
+        )
+        results, ingested_models = ingest_output(run, output)
+        checksum = hashing_reader.hexdigest()
+        if checksum_known(checksum) if skip_known else run.node.runs.filter(checksum=checksum).exists():
+            transaction.set_rollback(True)
+            return checksum, None
+        run.checksum = checksum
+        run.save(update_fields=['checksum'])
+        finish_run(run, ingested_models)
+    return checksum, results
+
+
+def load_cached_output(parse_cache, cache_key, streaming, create_excel):
+    """The cached parsed output of a log in the form parsed_log_output yields, or None."""
+    if streaming:
+        frames = parse_cache.load_iter(cache_key)
+        return iter_cached_commands(frames) if frames is not None else None
+    return parse_cache.load(cache_key, require_complete=create_excel)
+
+
+@contextlib.contextmanager
+def parsed_log_output(log_source, checksum=None, streaming=True, create_excel=False, workers=None):
+    """
+    Yields the checksum and parsed output of a log, loaded from the parse cache when it
+    holds the log and parsed otherwise.
+
+    When ``streaming``, the output is an iterator of ``(command, rows)`` pairs whose rows
+    are parsed (or read from the cache) as they are consumed, and a fresh parse is written
+    through to the parse cache on the way. In the streaming LOG_PARSER_MODE the blocks
+    are parsed as they are read from the log, one at a time. Otherwise the output is a
+    dict of command -> rows, parsed by ``workers`` processes (REPORT_PARSE_WORKERS by
+    default). Commands nothing ingests are not parsed unless ``create_excel`` needs them.
+
+    A new cache entry is committed when the block exits normally, after parsing whatever
+    it left unread, and dropped when the block raises.
+
+    Args:
+        log_source (str or file): Path of a plain or gzip-compressed log, or a binary
+            stream such as an ArchiveMember's file.
+        checksum (str, optional): MD5 of the log. Computed from the file of a path when
+            omitted; a stream without one bypasses the parse cache, and its checksum is
+            only yielded when it is parsed up front.
+        streaming (bool): Stream the output instead of parsing it all up front.
+        create_excel (bool): Parse every command, for the Excel workbook.
+        workers (int, optional): Parse processes, REPORT_PARSE_WORKERS by default.
+    """
+    command_key_to_fetch_pattern = load_command_patterns()
     command_keywords = list(CommandParserBase.registry.keys())
     
     # Check if command_keywords and command_key_to_fetch_pattern keys match
@@ -56,41 +354,237 @@ def process_data(log_filepath: str, create_report: bool = True, create_excel: bo
         print('command_key_to_fetch_pattern', command_key_to_fetch_pattern.keys())
         print('command_keywords', command_keywords)
         raise ValueError("Parser keys don't match Keys defined in the yaml file")
-    log_parser.parse()   
-    
-    commands_data = log_parser.get_commands()
-
-    file_name = Path(log_filepath).stem
-    print(f"Processing data for {file_name}...")    
-    ip_address = file_name.split('_')[1]
-    node_instance, _ = Node.objects.get_or_create(ip_address=ip_address, name=ip_address)
-    # Step 2: Dynamically parse command outputs using registered parsers
-    output = {}
-    for command, blocks in commands_data.items():
-        try:
-            parser = parser_factory.get_parser(command)
-            parsed_data = parser.parse(blocks)
-            output[command] = parsed_data
-            ingestion_function = ingestion_registry.get_ingestion_method(command)
-            if not ingestion_function:
-                print(f"No ingestion method registered for command: {command}")
-                continue
-            ingestion_function(node_instance, parsed_data)
-        except ValueError as e:
-            # import traceback
-            # traceback.print_exc()
-            print(e)
+
+    def consumed(command):
+        if ingestion_registry.get_ingestion_method(command) or create_excel:
+            return True
+        # Nothing consumes this command, so its blocks are never decoded or parsed
+        print(f"No ingestion method registered for command: {command}")
+        return False
+
+    is_path = isinstance(log_source, (str, os.PathLike))
+    parse_cache = get_parse_cache()
+    cache_key = None
+    cache_writer = None
+    complete = True
+    output = None
+    if parse_cache and is_path:
+        checksum = checksum or calculate_file_checksum(log_source)
+    if parse_cache and checksum:
+        cache_key = parse_cache.key(checksum, command_key_to_fetch_pattern.digest)
+        output = load_cached_output(parse_cache, cache_key, streaming, create_excel)
+
+    if output is not None:
+        print(f"Loaded parsed data for {log_source} from the parse cache")
+    else:
+        log_parser = LogParser(
+            log_source,
+            command_key_to_fetch_pattern,
+            mode=settings.LOG_PARSER_MODE,
+            index_path=block_index_path(log_source) if is_path else None,
+        )
+        if cache_key is not None and streaming:
+            cache_writer = parse_cache.writer(cache_key, checksum)
+
+        if streaming and log_parser.mode == MODE_STREAMING:
+            consumed_commands = {command for command in command_key_to_fetch_pattern if consumed(command)}
+            complete = len(consumed_commands) == len(command_key_to_fetch_pattern)
+            output = iter_streamed_commands(parser_factory, log_parser, consumed_commands, cache_writer)
+        else:
+            log_parser.parse()
+            checksum = checksum or log_parser.checksum
+            commands_data = log_parser.get_commands()
+
+            # Step 2: Dynamically parse command outputs using registered parsers
+            consumed_commands = {
+                command: blocks for command, blocks in commands_data.items() if consumed(command)
+            }
+            complete = len(consumed_commands) == len(commands_data)
+
+            if streaming:
+                output = iter_parsed_commands(parser_factory, consumed_commands, cache_writer)
+            else:
+                output = parse_commands(
+                    parser_factory,
+                    consumed_commands,
+                    workers=workers or settings.REPORT_PARSE_WORKERS,
+                    shard_size=settings.REPORT_PARSE_SHARD_SIZE,
+                )
+                if cache_key is not None:
+                    parse_cache.store(cache_key, output, checksum, complete=complete)
+
+    try:
+        yield checksum, output
+        if cache_writer is not None:
+            # Whatever the block left unread is still parsed, so the entry holds every row
+            for _, rows in output:
+                deque(rows, maxlen=0)
+    except BaseException:
+        if cache_writer is not None:
+            cache_writer.abort()
+        raise
+    if cache_writer is not None:
+        cache_writer.commit(complete)
+
+
+def checksum_known(checksum):
+    """Whether a log with this checksum was ingested or uploaded before."""
+    return (
+        HealthCheckRun.objects.filter(checksum=checksum).exists()
+        or FileUpload.objects.filter(checksum=checksum).exists()
+    )
+
+
+def process_data(log_filepath: str, create_report: bool = True, create_excel: bool = False,
+                 checksum: str = None, ingest: bool = True, file_upload=None, skip_known: bool = False,
+                 workers: int = None):
+    """
+    Parses a node log, ingests the parsed rows and optionally renders reports.
+
+    Parsed output is kept in the parse cache keyed by the log checksum, so repeated
+    runs for the same file (e.g. report-only runs with ``ingest=False``) skip reading
+    and parsing the raw log.
+
+    Unless the Excel workbook or parse workers need whole command groups, rows stream
+    from the parsers (or the parse cache) into the ingestion functions and are written
+    to the parse cache on the way, so memory does not grow with the number of rows.
+
+    Uploads from the web UI go through the Celery pipeline in report.tasks instead,
+    which runs the same steps as separate tasks. Archives of logs go through
+    process_archive.
+
+    Args:
+        log_filepath (str): Path of the uploaded log, named ``<prefix>_<node ip>...``,
+            plain or gzip-compressed.
+        create_report (bool): Render the Word report for the log's node afterwards.
+        create_excel (bool): Render the Excel workbook with every parsed command.
+        checksum (str, optional): MD5 of the log, e.g. ``FileUpload.checksum``. Computed
+            from the file when omitted and needed.
+        ingest (bool): Write the parsed rows to the report_data tables.
+        file_upload (FileUpload, optional): The upload the log came from, recorded on
+            the HealthCheckRun.
+        skip_known (bool): Leave the log alone if its checksum was ingested or uploaded
+            before, without parsing it.
+        workers (int, optional): Processes parsing the log, REPORT_PARSE_WORKERS by
+            default. Anything above 1 parses whole command groups up front.
+
+    Returns:
+        dict: What was processed, for throughput reporting: the log's ``checksum``,
+        ``bytes`` and ``node``, whether it was ``skipped``, the ``rows`` ingested split
+        into ``inserted``, ``updated``, ``unchanged`` and ``failed``, and the elapsed
+        ``seconds``.
+    """
+    if file_upload is not None:
+        checksum = checksum or file_upload.checksum
+    if ingest or skip_known:
+        checksum = checksum or calculate_file_checksum(log_filepath)
+    return process_log(
+        log_filepath, log_file_name(log_filepath), log_collected_at(log_filepath), os.path.getsize(log_filepath),
+        create_report=create_report, create_excel=create_excel, checksum=checksum, ingest=ingest,
+        file_upload=file_upload, skip_known=skip_known, workers=workers,
+    )
+
+
+def process_log(log_source, file_name, collected_at, size, create_report=True, create_excel=False,
+                checksum=None, ingest=True, file_upload=None, skip_known=False, holder=None, workers=None):
+    """
+    Does the work of process_data for a log given as a path or a binary stream, named
+    ``file_name`` and collected at ``collected_at``. ``size`` is reported in the stats.
+    With ``skip_known``, a log whose checksum was ingested or uploaded before is left
+    alone, unparsed, and its stats have ``skipped`` set. Ingestion holds the NodeLease of the node
+    under ``holder``, by default a name unique to this call.
+
+    A stream without a ``checksum`` is read once, through a HashingReader that
+    checksums it as it is parsed, and ingested with ingest_log_stream; with
+    ``skip_known`` a log seen before is only recognised once parsed, and rolled back.
+    """
+    started = time.perf_counter()
+    print("Processing data...")
+    print(f"Log file path: {log_source}")
+
+    workers = workers or settings.REPORT_PARSE_WORKERS
+    streaming = not create_excel and workers <= 1
+    # Ingestion waits for any other job ingesting a log of the same node
+    holder = holder or NodeLease.unique_holder()
+    lease = NodeLease.held(node_ip_address(file_name), holder) if ingest else contextlib.nullcontext()
+    skipped = False
+    results = []
+    hashing_reader = None
+    if checksum is None and not isinstance(log_source, (str, os.PathLike)):
+        log_source = hashing_reader = HashingReader(log_source)
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(lease)
+        # Checked under the lease, so of two copies of a log only the first is ingested
+        if skip_known and checksum and checksum_known(checksum):
+            print(f"{file_name} ({checksum}) was processed before, skipping it")
+            skipped = True
+        else:
+            checksum, output = stack.enter_context(
+                parsed_log_output(log_source, checksum, streaming, create_excel, workers)
+            )
+            print(f"Processing data for {file_name}...")    
+            if ingest and hashing_reader is not None:
+                checksum, results = ingest_log_stream(
+                    file_name, output, hashing_reader, collected_at, file_upload, skip_known,
+                )
+                if results is None:
+                    print(f"{file_name} ({checksum}) was processed before, its rows were rolled back")
+                    skipped, results = True, []
+            elif ingest:
+                results = ingest_parsed_data(file_name, output, checksum, collected_at, file_upload)
+            elif hashing_reader is not None:
+                checksum = hashing_reader.hexdigest()
 
     timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
     report_filename = f"report_{file_name}_{timestamp}.docx"
     excel_report_filename = f"report_{file_name}_{timestamp}.xlsx"
 
-    if create_report:
-        generate_word_report(report_filename)
+    if create_report and not skipped:
+        generate_word_report(report_filename, nodes=Node.objects.filter(ip_address=node_ip_address(file_name)))
 
-    if create_excel:
+    if create_excel and not skipped:
         generate_excel_report(output, excel_report_filename)
 
+    stats = {
+        'checksum': checksum,
+        'bytes': size,
+        'node': node_ip_address(file_name),
+        'skipped': skipped,
+        'inserted': sum(result.inserted for result in results),
+        'updated': sum(result.updated for result in results),
+        'unchanged': sum(result.unchanged for result in results),
+        'failed': sum(len(result.failures) for result in results),
+    }
+    stats['rows'] = stats['inserted'] + stats['updated'] + stats['unchanged'] + stats['failed']
+    stats['seconds'] = time.perf_counter() - started
+    return stats
+
+
+def process_archive(archive_path, create_report=True, pattern='log_*', skip_known=True):
+    """
+    Processes every log in a .zip or .tar(.gz) archive as its own node log, reading the
+    members out of the archive one after the other without extracting it. Each member
+    is checksummed as it is parsed (see process_log); with ``skip_known`` those seen
+    before are rolled back instead of ingested again.
+
+    Returns:
+        list: The process_log stats of each member processed.
+    """
+    stats = []
+    for member in iter_archive_logs(archive_path, pattern):
+        stats.append(process_log(
+            member.file, log_file_name(member.name), member.collected_at, member.size,
+            create_report=False, skip_known=skip_known,
+        ))
+
+    if create_report and stats:
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        generate_word_report(
+            f"report_{log_file_name(archive_path)}_{timestamp}.docx",
+            nodes=Node.objects.filter(ip_address__in=[member_stats['node'] for member_stats in stats]),
+        )
+    return stats
+
 
 def generate_report(output: dict, filename: str):
     reports_folder = get_reports_folder_path()
@@ -112,6 +606,9 @@ def generate_excel_report(output: dict, filename: str):
     excel_filepath = os.path.join(reports_folder, filename)
     excel_generator = ExcelGenerator(excel_filepath)
     for command, entries in output.items():
+        if entries and 'Subport Status' in entries[0]:
+            # Packed showline subport states get one column per subport in the workbook
+            entries = [expand_subport_status(entry) for entry in entries]
         if entries:
             heading = f"{command.title()}"
             headers = list(entries[0].keys())
@@ -129,12 +626,12 @@ def generate_pdf_report(filename: str):
    # save_report_record(pdf_filepath, 'xlsx')
     print(f"PDF Report generated at {report_generator.get_filepath()}")
   
-def generate_word_report(filename: str):
+def generate_word_report(filename: str, nodes=None):
     reports_folder = get_reports_folder_path()
     word_filepath = os.path.join(reports_folder, filename)
     report_generator = WordReportGenerator(word_filepath)
     from report_data.libs import fetch_olt_info_report_data
-    data_by_node = fetch_olt_info_report_data()
+    data_by_node = fetch_olt_info_report_data(nodes)
     print('data_by_node', data_by_node)
     report_generator.generate_report(data_by_node)
     save_report_record(word_filepath, 'word')
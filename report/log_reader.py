@@ -1,10 +1,269 @@
 # log_parser.py
+import datetime
+import fnmatch
+import gzip
+import hashlib
+import io
+import json
+import mmap
+import os
+import re
+import tarfile
+import zipfile
+from collections.abc import Mapping
+from contextlib import contextmanager
+from .command_matcher import CommandPatternMatcher
+
+MODE_BUFFERED = 'buffered'
+MODE_STREAMING = 'streaming'
+MODE_INDEXED = 'indexed'
+LOG_PARSER_MODES = (MODE_BUFFERED, MODE_STREAMING, MODE_INDEXED)
+
+BLOCK_INDEX_VERSION = 1
+LOG_ENCODING = 'ISO-8859-1'
+
+# An AUTO> prompt at the start of a line, allowing the leading characters str.strip() removes
+AUTO_PROMPT_PATTERN = re.compile(rb'^[\t\x0b\x0c\r\x1c-\x1f \x85\xa0]*AUTO>([^\n]*)', re.MULTILINE)
+
+
+GZIP_MAGIC = b'\x1f\x8b'
+ARCHIVE_SUFFIXES = ('.zip', '.tar', '.tar.gz', '.tgz')
+
+
+def block_index_path(filepath):
+    """Path of the persisted block index kept next to a log file."""
+    return f"{filepath}.blockidx.json"
+
+
+def log_file_name(path):
+    """The name of a log without its extensions, e.g. ``log_<node ip>`` for ``.../log_<node ip>.txt.gz``."""
+    name = os.path.basename(path)
+    if name.lower().endswith('.gz'):
+        name = name[:-3]
+    return os.path.splitext(name)[0]
+
+
+def is_gzip_file(filepath):
+    with open(filepath, 'rb') as file:
+        return file.read(2) == GZIP_MAGIC
+
+
+def is_log_archive(path):
+    """Whether ``path`` names a .zip or .tar(.gz) archive of logs rather than a single log."""
+    return str(path).lower().endswith(ARCHIVE_SUFFIXES)
+
+
+class ArchiveMember:
+    """
+    A log inside an archive, readable as a binary stream that decompresses as it is
+    read. ``offset`` is where a tarball member's header starts, None in a .zip.
+    """
+
+    def __init__(self, name, size, collected_at, file, offset=None):
+        self.name = name
+        self.size = size
+        self.collected_at = collected_at
+        self.file = file
+        self.offset = offset
+
+
+def zip_member(info, file):
+    collected_at = datetime.datetime(*info.date_time).astimezone(datetime.timezone.utc)
+    return ArchiveMember(info.filename, info.file_size, collected_at, file)
+
+
+def tar_member(archive, member):
+    collected_at = datetime.datetime.fromtimestamp(member.mtime, tz=datetime.timezone.utc)
+    return ArchiveMember(member.name, member.size, collected_at, archive.extractfile(member), member.offset)
+
+
+def iter_archive_logs(archive_path, pattern='log_*'):
+    """
+    Yields an ArchiveMember for every file of a .zip or .tar(.gz) archive whose base
+    name matches ``pattern``, in archive order. Nothing is extracted to disk: a member
+    is decompressed as its ``file`` is read, and tarballs are read in a single pass, so
+    a member can only be read until the next one is yielded.
+    """
+    if str(archive_path).lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            for info in archive.infolist():
+                if not info.is_dir() and fnmatch.fnmatch(os.path.basename(info.filename), pattern):
+                    with archive.open(info) as file:
+                        yield zip_member(info, file)
+        return
+    with tarfile.open(archive_path, mode='r|*') as archive:
+        for member in archive:
+            if member.isfile() and fnmatch.fnmatch(os.path.basename(member.name), pattern):
+                yield tar_member(archive, member)
+
+
+@contextmanager
+def open_archive_member(archive_path, name, offset=None):
+    """
+    Opens one member of a .zip or .tar(.gz) archive as an ArchiveMember, found by its
+    ``name`` in a .zip and by the ``offset`` iter_archive_logs gave it in a tarball.
+    A plain tarball is read from that offset on; a compressed one cannot be seeked, so
+    it is decompressed up to the member, in memory. Either way nothing is extracted.
+    """
+    if str(archive_path).lower().endswith('.zip'):
+        with zipfile.ZipFile(archive_path) as archive:
+            info = archive.getinfo(name)
+            with archive.open(info) as file:
+                yield zip_member(info, file)
+        return
+    with tarfile.open(archive_path, mode='r:*') as archive:
+        if offset:
+            # TarFile.next reads the header at TarFile.offset, past the first member it read on opening
+            archive.firstmember = None
+            archive.offset = offset
+        member = archive.next()
+        if member is None or member.name != name:
+            raise KeyError(f"{name} is not at offset {offset} of {archive_path}")
+        yield tar_member(archive, member)
+
+
+class HashingReader(io.RawIOBase):
+    """Binary stream that computes the MD5 of the bytes read through it from ``raw``."""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.hasher = hashlib.md5()
+        self.size = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self.raw.read(len(buffer))
+        buffer[:len(data)] = data
+        self.hasher.update(data)
+        self.size += len(data)
+        return len(data)
+
+    def hexdigest(self):
+        # Bytes the reader stopped short of still belong to the log
+        while chunk := self.raw.read(1024 * 1024):
+            self.hasher.update(chunk)
+            self.size += len(chunk)
+        return self.hasher.hexdigest()
+
+
+@contextmanager
+def open_log(source):
+    """
+    Opens a log as text: ``source`` is the path of a plain or gzip-compressed log, or a
+    binary stream such as an ArchiveMember's file. Compressed logs are decompressed as
+    they are read. Yields the text stream and the HashingReader under it, whose checksum
+    is that of the bytes as stored, e.g. of the .gz file, like FileUpload.checksum.
+    """
+    raw = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else source
+    try:
+        # A stream already read through a HashingReader is checksummed by that one
+        hashing_reader = raw if isinstance(raw, HashingReader) else HashingReader(raw)
+        stream = io.BufferedReader(hashing_reader)
+        if stream.peek(2)[:2] == GZIP_MAGIC:
+            stream = gzip.GzipFile(fileobj=stream, mode='rb')
+        yield io.TextIOWrapper(stream, encoding=LOG_ENCODING), hashing_reader
+    finally:
+        if raw is not source:
+            raw.close()
+
+
+class MappedLogFile:
+    """Read-only mmap of a log file, opened on first use and shared by its LazyBlocks."""
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._mmap = None
+
+    def open(self):
+        if self._mmap is None:
+            with open(self.filepath, 'rb') as file:
+                if os.fstat(file.fileno()).st_size == 0:
+                    return b''
+                self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def read(self, start, end):
+        return self.open()[start:end]
+
+    def __getstate__(self):
+        # The mapping is re-opened lazily wherever the object is unpickled
+        return {'filepath': self.filepath, '_mmap': None}
+
+
+class LazyBlock(Mapping):
+    """
+    A command block that decodes its output from the log file only when accessed.
+
+    Behaves like the ``{'command': ..., 'output': ...}`` dictionaries produced by the
+    other modes, so parsers can use it unchanged. ``spans`` holds the byte ranges of
+    every occurrence of the command line; repeated command lines are concatenated just
+    like the buffered mode does.
+    """
+
+    _keys = ('command', 'output')
+
+    def __init__(self, source, command_line, spans=None):
+        self.source = source
+        self.command_line = command_line
+        self.spans = spans if spans is not None else []
+
+    @property
+    def output(self):
+        return ''.join(self.decode_span(start, end) for start, end in self.spans)
+
+    def decode_span(self, start, end):
+        text = self.source.read(start, end).decode(LOG_ENCODING)
+        text = text.replace('\r\n', '\n').replace('\r', '\n')
+        lines = text.split('\n')
+        if text.endswith('\n'):
+            lines.pop()
+        return ''.join(line.strip() + '\n' for line in lines)
+
+    def __getitem__(self, key):
+        if key == 'command':
+            return self.command_line
+        if key == 'output':
+            return self.output
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"LazyBlock({self.command_line!r}, spans={self.spans!r})"
+
 
 class LogParser:
-    def __init__(self, filepath, command_key_to_fetch_pattern):
+    """
+    Collects the output of the ``AUTO>`` command blocks of a log by base command.
+
+    ``filepath`` is the path of a plain or gzip-compressed log, or a binary stream (see
+    open_log). The buffered and streaming modes read it once, decompressing on the fly,
+    and leave the MD5 of what they read in ``checksum``. The indexed mode needs byte
+    offsets into an uncompressed file on disk, so other logs are parsed in streaming
+    mode instead.
+    """
+
+    def __init__(self, filepath, command_key_to_fetch_pattern, mode=MODE_BUFFERED, index_path=None):
+        if mode not in LOG_PARSER_MODES:
+            raise ValueError(f"Unknown log parser mode: {mode}")
+        if mode == MODE_INDEXED and not (isinstance(filepath, (str, os.PathLike)) and not is_gzip_file(filepath)):
+            mode = MODE_STREAMING
         self.filepath = filepath
+        self.checksum = None
         self.commands = {}
+        self.blocks = {}
+        if not isinstance(command_key_to_fetch_pattern, CommandPatternMatcher):
+            command_key_to_fetch_pattern = CommandPatternMatcher(command_key_to_fetch_pattern)
         self.command_key_to_fetch_pattern = command_key_to_fetch_pattern
+        self.mode = mode
+        self.index_path = index_path
+        self.block_index = []
 
     def expand_fetch_patterns(self, patterns):
         """Expand fetch patterns to recognize both parameterized and non-parameterized commands."""
@@ -19,31 +278,155 @@ class LogParser:
             expanded_patterns[command] = expanded
         return expanded_patterns
 
+    def match_base_commands(self, command_line):
+        """Return the base commands whose fetch patterns match an ``AUTO>`` command line."""
+        return self.command_key_to_fetch_pattern.match(command_line)
+
     def parse(self):
-        with open(self.filepath, 'r', encoding='ISO-8859-1') as file:
+        if self.mode == MODE_STREAMING:
+            return self.parse_streaming()
+        if self.mode == MODE_INDEXED:
+            return self.parse_indexed()
+        return self.parse_buffered()
+
+    def shared_block(self, command_line, base_commands, factory=None):
+        """
+        Returns the single block entry for ``command_line``, registering it under every
+        matching base command.
+
+        Command lines matched by several base commands (``showline *`` feeds both
+        ``ONU-Line-Stats`` and ``OLT-Line-Stats``) are stored once and referenced from
+        each base command instead of being copied per command.
+        """
+        block = self.blocks.get(command_line)
+        if block is None:
+            block = factory() if factory else {'command': command_line, 'output': ''}
+            self.blocks[command_line] = block
+            for base_command in base_commands:
+                self.commands.setdefault(base_command, {})[command_line] = block
+        return block
+
+    def parse_buffered(self):
+        with open_log(self.filepath) as (file, hashing_reader):
             lines = file.readlines()
+            self.checksum = hashing_reader.hexdigest()
 
-        active_commands = []
+        active_block = None
         for line in lines:
             line = line.strip()
             if line.startswith('AUTO>'):
                 command_line = line[5:].strip()
-                active_commands = []  # Reset active commands for each new command line
-                for base_command, pattern_set in self.command_key_to_fetch_pattern.items():
-                    if any(command_line == pattern or command_line.startswith(pattern[:-1]) for pattern in pattern_set):
-                        if base_command not in self.commands:
-                            self.commands[base_command] = {}
-                        if command_line not in self.commands[base_command]:
-                            self.commands[base_command][command_line] = {'command': command_line, 'output': ''}
-                        active_commands.append(base_command)  # Track all commands that match the line
-            elif active_commands:
-                # Append the line to the output of all active base commands
-                for base_command in active_commands:
-                    if command_line in self.commands[base_command]:
-                        self.commands[base_command][command_line]['output'] += line + '\n'
-
-
-    
+                active_block = None  # Reset the active block for each new command line
+                base_commands = self.match_base_commands(command_line)
+                if base_commands:
+                    active_block = self.shared_block(command_line, base_commands)
+            elif active_block is not None:
+                active_block['output'] += line + '\n'
+
+    def iter_blocks(self):
+        """
+        Lazily walks the log file and yields one tuple per matched ``AUTO>`` block.
+
+        The file is iterated line by line and the lines of the current block are
+        collected in a chunk list that is joined once when the block ends, so peak
+        memory is bounded by the largest block instead of the whole file.
+
+        Yields:
+            tuple: ``(command_line, base_commands, output)`` where ``output`` uses the
+            same normalisation as :meth:`parse_buffered` (stripped lines, each
+            terminated by a newline).
+        """
+        command_line = None
+        base_commands = []
+        chunks = []
+        with open_log(self.filepath) as (file, hashing_reader):
+            for line in file:
+                line = line.strip()
+                if line.startswith('AUTO>'):
+                    if base_commands:
+                        yield command_line, base_commands, ''.join(chunks)
+                    command_line = line[5:].strip()
+                    base_commands = self.match_base_commands(command_line)
+                    chunks = []
+                elif base_commands:
+                    chunks.append(line + '\n')
+            self.checksum = hashing_reader.hexdigest()
+        if base_commands:
+            yield command_line, base_commands, ''.join(chunks)
+
+    def parse_streaming(self):
+        """
+        Collects the blocks read by :meth:`iter_blocks` into :meth:`get_commands`, for
+        consumers that need whole command groups. Consumers that parse one block at a
+        time iterate :meth:`iter_blocks` directly and hold no block once it is parsed.
+        """
+        for command_line, base_commands, output in self.iter_blocks():
+            # Repeated command lines accumulate, exactly like the buffered mode
+            self.shared_block(command_line, base_commands)['output'] += output
+
+    def build_block_index(self):
+        """
+        Scans an mmap of the log for ``AUTO>`` prompts without decoding any output.
+
+        Returns:
+            list: ``(base_command, command_line, start_offset, end_offset)`` tuples, one
+            per matching base command, where the offsets delimit the block output.
+        """
+        source = MappedLogFile(self.filepath)
+        data = source.open()
+        block_index = []
+        prompts = list(AUTO_PROMPT_PATTERN.finditer(data))
+        for position, prompt in enumerate(prompts):
+            command_line = prompt.group(1).decode(LOG_ENCODING).strip()
+            start = min(prompt.end() + 1, len(data))
+            end = prompts[position + 1].start() if position + 1 < len(prompts) else len(data)
+            for base_command in self.match_base_commands(command_line):
+                block_index.append((base_command, command_line, start, end))
+        return block_index
+
+    def index_signature(self):
+        """Identifies the log file and pattern set a persisted block index was built for."""
+        stat = os.stat(self.filepath)
+        return {
+            'version': BLOCK_INDEX_VERSION,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'patterns': self.command_key_to_fetch_pattern.digest,
+        }
+
+    def load_block_index(self):
+        """Returns the persisted block index, or None when it is missing or stale."""
+        if not self.index_path or not os.path.exists(self.index_path):
+            return None
+        try:
+            with open(self.index_path, 'r') as file:
+                persisted = json.load(file)
+        except (OSError, ValueError):
+            return None
+        if persisted.get('signature') != self.index_signature():
+            return None
+        return [tuple(entry) for entry in persisted['blocks']]
+
+    def save_block_index(self):
+        if not self.index_path:
+            return
+        with open(self.index_path, 'w') as file:
+            json.dump({'signature': self.index_signature(), 'blocks': self.block_index}, file)
+
+    def parse_indexed(self):
+        self.block_index = self.load_block_index()
+        if self.block_index is None:
+            self.block_index = self.build_block_index()
+            self.save_block_index()
+
+        source = MappedLogFile(self.filepath)
+        for base_command, command_line, start, end in self.block_index:
+            block = self.shared_block(command_line, [], factory=lambda: LazyBlock(source, command_line))
+            self.commands.setdefault(base_command, {})[command_line] = block
+            # The index holds one entry per base command; the span itself is stored once
+            if not block.spans or block.spans[-1] != (start, end):
+                block.spans.append((start, end))
+
     def get_commands(self):
         return self.commands
 
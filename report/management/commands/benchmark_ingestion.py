@@ -0,0 +1,94 @@
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import IntegrityError, connection
+from django.test import override_settings
+from django.utils import timezone
+
+from report.libs import load_command_patterns, parse_commands
+from report.log_reader import LogParser, MODE_STREAMING
+from report.parsers import parser_factory
+from report.synthetic_logs import SyntheticLogWriter
+from report_data import ingestion_libs
+from report_data.ingestion_registry import ingestion_registry
+from report_data.models import HealthCheckRun, Node
+
+
+def ingest_row_by_row(model, data_list, build, describe, batch_size=None):
+    """How every ingest function used to work: one autocommitted INSERT per row."""
+    result = ingestion_libs.IngestionResult(model)
+    for data in data_list:
+        try:
+            build(data).save(force_insert=True)
+            result.inserted += 1
+        except IntegrityError:
+            result.fail(describe(data), "already exists")
+    return result
+
+
+class Command(BaseCommand):
+    help = 'Compare row-by-row, bulk and (on PostgreSQL) COPY ingestion of a parsed multi-slot MXK 1419 log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=20, help='Size of the synthetic log to generate')
+        parser.add_argument('--path', help='Use an existing log file instead of generating one')
+        parser.add_argument('--batch-size', type=int, help='Rows per bulk insert, INGESTION_BATCH_SIZE by default')
+
+    def ingest_once(self, parsed_by_command):
+        """Ingests every command for a scratch node's run and returns (seconds, rows inserted)."""
+        node = Node.objects.create(ip_address='192.0.2.1', name='ingestion-benchmark')
+        run = HealthCheckRun.objects.create(node=node, checksum='benchmark', collected_at=timezone.now())
+        try:
+            inserted = 0
+            start = time.perf_counter()
+            # The per-row and per-command progress prints are not what is being measured
+            with contextlib.redirect_stdout(io.StringIO()):
+                for command, rows in parsed_by_command.items():
+                    ingestion_function = ingestion_registry.get_ingestion_method(command)
+                    if ingestion_function:
+                        inserted += ingestion_function(run, rows).inserted
+            return time.perf_counter() - start, inserted
+        finally:
+            node.delete()
+
+    def handle(self, *args, **options):
+        log_filepath = options['path']
+        generated = not log_filepath
+        if generated:
+            log_filepath = os.path.join(tempfile.gettempdir(), 'log_0.0.0.0_ingestion_benchmark.txt')
+            self.stdout.write(f"Generating {options['size_mb']} MB multi-slot MXK 1419 log at {log_filepath}...")
+            SyntheticLogWriter().write(log_filepath, options['size_mb'] * 1024 * 1024)
+
+        try:
+            log_parser = LogParser(log_filepath, load_command_patterns(), mode=MODE_STREAMING)
+            log_parser.parse()
+            parsed_by_command = parse_commands(parser_factory, log_parser.get_commands())
+        finally:
+            if generated:
+                os.remove(log_filepath)
+
+        self.stdout.write(f"Ingesting into {connection.vendor} ({connection.settings_dict['NAME']})")
+        ingest_in_batches = ingestion_libs.ingest_in_batches
+        ingestion_libs.ingest_in_batches = ingest_row_by_row
+        try:
+            row_elapsed, row_inserted = self.ingest_once(parsed_by_command)
+        finally:
+            ingestion_libs.ingest_in_batches = ingest_in_batches
+        self.stdout.write(f"row by row : {row_elapsed:8.2f} s  {row_inserted / row_elapsed:10.0f} rows/s  ({row_inserted} rows)")
+
+        runs = [('bulk ORM', False)]
+        if connection.vendor == 'postgresql':
+            runs.append(('bulk COPY', True))
+        batch_size = options['batch_size'] or settings.INGESTION_BATCH_SIZE
+        for label, copy in runs:
+            with override_settings(INGESTION_BATCH_SIZE=batch_size, INGESTION_COPY=copy):
+                elapsed, inserted = self.ingest_once(parsed_by_command)
+            self.stdout.write(
+                f"{label:11}: {elapsed:8.2f} s  {inserted / elapsed:10.0f} rows/s  ({inserted} rows)"
+                f"  speedup {row_elapsed / elapsed:5.2f}x"
+            )
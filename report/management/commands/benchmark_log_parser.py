@@ -0,0 +1,57 @@
+import os
+import resource
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from report.libs import load_command_patterns
+from report.log_reader import LogParser, LOG_PARSER_MODES
+from report.synthetic_logs import SyntheticLogWriter
+
+
+def run_log_parser(log_filepath, command_key_to_fetch_pattern, mode):
+    """Parses the log in a fresh process and reports wall time and peak RSS for that process only."""
+    start = time.perf_counter()
+    log_parser = LogParser(log_filepath, command_key_to_fetch_pattern, mode=mode)
+    log_parser.parse()
+    elapsed = time.perf_counter() - start
+    blocks = sum(len(blocks) for blocks in log_parser.get_commands().values())
+    peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return elapsed, peak_rss_kb, blocks
+
+
+class Command(BaseCommand):
+    help = 'Compare the buffered and streaming LogParser modes on a synthetic (or given) log file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=1024, help='Size of the synthetic log to generate')
+        parser.add_argument('--path', help='Use an existing log file instead of generating one')
+        parser.add_argument('--modes', nargs='+', default=list(LOG_PARSER_MODES), choices=LOG_PARSER_MODES)
+        parser.add_argument('--keep', action='store_true', help='Keep the generated synthetic log')
+
+    def handle(self, *args, **options):
+        log_filepath = options['path']
+        generated = not log_filepath
+        if generated:
+            log_filepath = os.path.join(tempfile.gettempdir(), 'log_0.0.0.0_benchmark.txt')
+            self.stdout.write(f"Generating {options['size_mb']} MB synthetic log at {log_filepath}...")
+            SyntheticLogWriter().write(log_filepath, options['size_mb'] * 1024 * 1024)
+
+        size_mb = os.path.getsize(log_filepath) / (1024 * 1024)
+        command_key_to_fetch_pattern = load_command_patterns()
+        try:
+            for mode in options['modes']:
+                # One process per mode so the peak RSS of one run cannot hide the other
+                with ProcessPoolExecutor(max_workers=1) as executor:
+                    elapsed, peak_rss_kb, blocks = executor.submit(
+                        run_log_parser, log_filepath, command_key_to_fetch_pattern, mode
+                    ).result()
+                self.stdout.write(
+                    f"{mode:>10}: {elapsed:8.2f} s  {size_mb / elapsed:8.1f} MB/s  "
+                    f"peak RSS {peak_rss_kb / 1024:8.1f} MB  ({blocks} blocks)"
+                )
+        finally:
+            if generated and not options['keep']:
+                os.remove(log_filepath)
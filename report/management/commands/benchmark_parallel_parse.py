@@ -0,0 +1,53 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from report.libs import load_command_patterns, parse_commands
+from report.log_reader import LogParser, MODE_INDEXED
+from report.parsers import parser_factory
+from report.synthetic_logs import SyntheticLogWriter
+
+
+class Command(BaseCommand):
+    help = 'Compare serial and process-pool parsing of the command groups of a multi-slot MXK 1419 log'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=200, help='Size of the synthetic log to generate')
+        parser.add_argument('--path', help='Use an existing log file instead of generating one')
+        parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, os.cpu_count() or 1])
+        parser.add_argument('--shard-size', type=int, default=64)
+
+    def parse_once(self, log_filepath, workers, shard_size):
+        # A fresh LogParser per run so no run benefits from blocks decoded by another
+        log_parser = LogParser(log_filepath, load_command_patterns(), mode=MODE_INDEXED)
+        log_parser.parse()
+
+        start = time.perf_counter()
+        parsed_by_command = parse_commands(parser_factory, log_parser.get_commands(), workers, shard_size)
+        return time.perf_counter() - start, parsed_by_command
+
+    def handle(self, *args, **options):
+        log_filepath = options['path']
+        generated = not log_filepath
+        if generated:
+            log_filepath = os.path.join(tempfile.gettempdir(), 'log_0.0.0.0_parallel_benchmark.txt')
+            self.stdout.write(f"Generating {options['size_mb']} MB multi-slot MXK 1419 log at {log_filepath}...")
+            SyntheticLogWriter().write(log_filepath, options['size_mb'] * 1024 * 1024)
+
+        try:
+            serial_elapsed, serial_result = self.parse_once(log_filepath, 1, options['shard_size'])
+            rows = sum(len(parsed) for parsed in serial_result.values())
+            self.stdout.write(f"serial     : {serial_elapsed:8.2f} s  ({rows} rows)")
+            for workers in sorted(set(options['workers'])):
+                if workers < 2:
+                    continue
+                elapsed, result = self.parse_once(log_filepath, workers, options['shard_size'])
+                identical = 'identical' if result == serial_result else 'MISMATCH'
+                self.stdout.write(
+                    f"{workers:2d} workers : {elapsed:8.2f} s  speedup {serial_elapsed / elapsed:5.2f}x  ({identical})"
+                )
+        finally:
+            if generated:
+                os.remove(log_filepath)
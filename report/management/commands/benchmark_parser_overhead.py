@@ -0,0 +1,75 @@
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+
+from report.libs import load_command_patterns
+from report.log_reader import LogParser, MODE_STREAMING
+from report.parser_factory import ParserFactory
+from report.parsers import CommandParserBase, parser_factory
+from report.synthetic_logs import SyntheticLogWriter
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-block overhead of building parsers per call against the prebuilt parser factory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--size-mb', type=int, default=5, help='Size of the synthetic log to generate')
+        parser.add_argument('--path', help='Use an existing log file instead of generating one')
+        parser.add_argument('--repeat', type=int, default=5, help='Passes over every block')
+
+    def time_blocks(self, commands_data, get_parser, repeat):
+        """Parses every block on its own, as a single-block group, and returns seconds per command."""
+        elapsed = {}
+        for command, blocks in commands_data.items():
+            start = time.perf_counter()
+            for _ in range(repeat):
+                for command_key, command_data in blocks.items():
+                    get_parser(command).parse({command_key: command_data})
+            elapsed[command] = time.perf_counter() - start
+        return elapsed
+
+    def handle(self, *args, **options):
+        log_filepath = options['path']
+        generated = not log_filepath
+        if generated:
+            log_filepath = os.path.join(tempfile.gettempdir(), 'log_0.0.0.0_parser_overhead.txt')
+            self.stdout.write(f"Generating {options['size_mb']} MB multi-slot MXK 1419 log at {log_filepath}...")
+            SyntheticLogWriter().write(log_filepath, options['size_mb'] * 1024 * 1024)
+
+        # Memoized blocks would skip the parser entirely
+        block_memo, CommandParserBase.block_memo = CommandParserBase.block_memo, None
+        try:
+            log_parser = LogParser(log_filepath, load_command_patterns(), mode=MODE_STREAMING)
+            log_parser.parse()
+            # 'Slots - Status' needs its whole group at once, so it cannot be timed per block
+            commands_data = {
+                command: blocks for command, blocks in log_parser.get_commands().items()
+                if CommandParserBase.registry[command].shardable
+            }
+
+            def per_call_parser(command):
+                # What process_data used to do: a fresh factory and parser instance per use
+                return ParserFactory.from_registry(CommandParserBase.registry).get_parser(command)
+
+            repeat = options['repeat']
+            per_call = self.time_blocks(commands_data, per_call_parser, repeat)
+            prebuilt = self.time_blocks(commands_data, parser_factory.get_parser, repeat)
+
+            self.stdout.write(f"{'command':32} {'blocks':>7} {'per call us':>12} {'prebuilt us':>12} {'saved us':>9}")
+            for command, blocks in commands_data.items():
+                calls = len(blocks) * repeat
+                if not calls:
+                    continue
+                before = per_call[command] / calls * 1e6
+                after = prebuilt[command] / calls * 1e6
+                self.stdout.write(f"{command:32} {len(blocks):7d} {before:12.1f} {after:12.1f} {before - after:9.1f}")
+            total_calls = sum(len(blocks) for blocks in commands_data.values()) * repeat
+            before = sum(per_call.values()) / total_calls * 1e6
+            after = sum(prebuilt.values()) / total_calls * 1e6
+            self.stdout.write(f"{'all blocks':32} {total_calls // repeat:7d} {before:12.1f} {after:12.1f} {before - after:9.1f}")
+        finally:
+            CommandParserBase.block_memo = block_memo
+            if generated:
+                os.remove(log_filepath)
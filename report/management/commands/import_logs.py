@@ -0,0 +1,160 @@
+import contextlib
+import datetime
+import fnmatch
+import glob
+import io
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from report.libs import generate_word_report, node_ip_address, process_data, process_log
+from report.log_reader import is_log_archive, iter_archive_logs, log_file_name, open_archive_member
+from report_data.models import Node
+
+
+def init_worker():
+    # Spawned workers start without Django set up; each worker then opens one database
+    # connection on its first query and keeps it for every log it imports
+    django.setup()
+
+
+def import_log(path, quiet, member=None):
+    """
+    Ingests one log, in a worker process or inline, unless its checksum was ingested or
+    uploaded before, and returns its process_log stats. A log file is checksummed here,
+    so the workers share that work too. A ``member`` of the archive at ``path``, given
+    as its name and offset (see open_archive_member), is streamed out of the archive
+    here and checksummed as it is parsed.
+    """
+    with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+        # The pool already runs a log per core, so each log is parsed in its worker
+        if member is None:
+            return process_data(path, create_report=False, skip_known=True, workers=1)
+        with open_archive_member(path, *member) as archive_member:
+            return process_log(
+                archive_member.file, log_file_name(archive_member.name), archive_member.collected_at,
+                archive_member.size, create_report=False, skip_known=True, workers=1,
+            )
+
+
+class Command(BaseCommand):
+    help = 'Import plain or .gz node logs from directories, globs or .tar/.tar.gz/.zip archives with a pool of workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sources', nargs='+', help='Log files, directories, glob patterns or archives')
+        parser.add_argument('--pattern', default='log_*', help='File names of the logs to import (default: log_*)')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes, each with its own database connection (default: one per CPU)')
+        parser.add_argument('--report', action='store_true',
+                            help='Render one Word report for every node of the imported logs when finished')
+
+    def collect_logs(self, sources, pattern):
+        """The paths of the logs and of the archives in ``sources``."""
+        paths, archives = [], []
+        for source in sources:
+            if os.path.isdir(source):
+                candidates = sorted(
+                    os.path.join(directory, name)
+                    for directory, _, names in os.walk(source) for name in names
+                )
+            else:
+                candidates = sorted(glob.glob(source, recursive=True))
+                if not candidates:
+                    raise CommandError(f"No logs found at {source}")
+            for candidate in candidates:
+                if is_log_archive(candidate):
+                    archives.append(candidate)
+                elif fnmatch.fnmatch(os.path.basename(candidate), pattern):
+                    paths.append(candidate)
+        return paths, archives
+
+    def iter_logs(self, paths, archives, pattern):
+        """
+        Yields ``(name, path, member)`` for every log to import, ``member`` being the
+        name and offset of a log in the archive at ``path``, or None. Each archive is
+        listed once, here, without reading its members, so each worker only reads the
+        members it imports.
+        """
+        for path in paths:
+            yield os.path.basename(path), path, None
+        for archive in archives:
+            for member in iter_archive_logs(archive, pattern):
+                yield f"{os.path.basename(archive)}:{member.name}", archive, (member.name, member.offset)
+
+    def handle(self, *args, **options):
+        quiet = options['verbosity'] < 2
+        workers = options['workers']
+        started = time.perf_counter()
+        paths, archives = self.collect_logs(options['sources'], options['pattern'])
+        # Logs whose checksum was ingested or uploaded before are skipped by the workers
+        self.stdout.write(f"Found {len(paths)} logs and {len(archives)} archives")
+
+        imported, failed = [], []
+        logs = self.iter_logs(paths, archives, options['pattern'])
+        if workers <= 1:
+            for name, path, member in logs:
+                try:
+                    imported.append(self.imported(name, import_log(path, quiet, member)))
+                except Exception as e:
+                    failed.append(self.failed(name, e))
+        else:
+            # Forked workers must not share the connection of this process
+            connections.close_all()
+            with ProcessPoolExecutor(workers, initializer=init_worker) as executor:
+                futures = {}
+                for name, path, member in logs:
+                    # Archives are listed no further ahead than two logs per worker
+                    if len(futures) >= 2 * workers:
+                        done, _ = wait(futures, return_when=FIRST_COMPLETED)
+                        self.collect(futures, done, imported, failed)
+                    futures[executor.submit(import_log, path, quiet, member)] = name
+                self.collect(futures, wait(futures).done, imported, failed)
+
+        skipped = sum(stats['skipped'] for stats in imported)
+        imported = [stats for stats in imported if not stats['skipped']]
+        elapsed = time.perf_counter() - started
+        total_bytes = sum(stats['bytes'] for stats in imported)
+        total_rows = sum(stats['rows'] for stats in imported)
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {len(imported)} logs ({total_bytes / 1024 ** 2:.1f} MB, {total_rows} rows) "
+            f"in {elapsed:.1f} s with {workers} workers, {skipped} skipped, {len(failed)} failed"
+        ))
+        self.stdout.write(
+            f"  {len(imported) / elapsed:.2f} files/s, {total_bytes / 1024 ** 2 / elapsed:.2f} MB/s, "
+            f"{total_rows / elapsed:.0f} rows/s"
+        )
+
+        if options['report']:
+            ip_addresses = {node_ip_address(log_file_name(path)) for path in paths}
+            ip_addresses |= {stats['node'] for stats in imported}
+            timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+            with contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext():
+                generate_word_report(f"fleet_report_{timestamp}.docx", nodes=Node.objects.filter(ip_address__in=ip_addresses))
+            self.stdout.write(f"Fleet report for {len(ip_addresses)} nodes written as fleet_report_{timestamp}.docx")
+
+        if failed:
+            raise CommandError(f"{len(failed)} logs failed to import")
+
+    def collect(self, futures, done, imported, failed):
+        for future in done:
+            name = futures.pop(future)
+            try:
+                imported.append(self.imported(name, future.result()))
+            except Exception as e:
+                failed.append(self.failed(name, e))
+
+    def imported(self, name, stats):
+        if not stats['skipped']:
+            self.stdout.write(
+                f"{name} ({stats['node']}): {stats['rows']} rows ({stats['inserted']} inserted, "
+                f"{stats['updated']} updated, {stats['failed']} failed) in {stats['seconds']:.1f} s"
+            )
+        return stats
+
+    def failed(self, name, error):
+        self.stderr.write(f"{name}: {error}")
+        return name
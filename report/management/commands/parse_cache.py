@@ -0,0 +1,54 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from report.parse_cache import ParseCache, parser_code_version
+
+
+class Command(BaseCommand):
+    help = 'Inspect, evict or purge the on-disk cache of parsed log output'
+
+    def add_arguments(self, parser):
+        parser.add_argument('action', choices=['list', 'evict', 'purge'], nargs='?', default='list')
+        parser.add_argument('keys', nargs='*', help='Cache keys to purge')
+        parser.add_argument('--checksum', help='Purge the entries of the log with this checksum')
+        parser.add_argument('--all', action='store_true', help='Purge every entry')
+        parser.add_argument('--stale', action='store_true', help='Purge entries built by another parser version')
+
+    def handle(self, *args, **options):
+        parse_cache = ParseCache(settings.PARSE_CACHE_DIR, settings.PARSE_CACHE_MAX_BYTES)
+        action = options['action']
+
+        if action == 'list':
+            entries = parse_cache.entries()
+            total = sum(entry['size'] for entry in entries)
+            self.stdout.write(
+                f"{len(entries)} entries, {total / 1024 ** 2:.1f} MB of "
+                f"{parse_cache.max_bytes / 1024 ** 2:.1f} MB in {parse_cache.cache_dir}"
+            )
+            for entry in entries:
+                last_used = datetime.datetime.fromtimestamp(entry['last_used']).strftime("%Y-%m-%d %H:%M:%S")
+                stale = '' if entry.get('parser_version') == parser_code_version() else '  [stale]'
+                rows = sum(entry.get('rows', {}).values())
+                self.stdout.write(
+                    f"{entry['key']}  {entry.get('checksum', '?'):32}  {entry['size'] / 1024:10.1f} KB  "
+                    f"{rows:8d} rows  last used {last_used}{stale}"
+                )
+
+        elif action == 'evict':
+            evicted = parse_cache.evict()
+            self.stdout.write(self.style.SUCCESS(f"Evicted {len(evicted)} entries"))
+
+        else:
+            if options['stale']:
+                keys = [entry['key'] for entry in parse_cache.entries()
+                        if entry.get('parser_version') != parser_code_version()]
+                removed = parse_cache.purge(keys=keys)
+            elif options['all']:
+                removed = parse_cache.purge()
+            elif options['keys'] or options['checksum']:
+                removed = parse_cache.purge(keys=options['keys'] or None, checksum=options['checksum'])
+            else:
+                raise CommandError("Give cache keys, --checksum, --stale or --all to purge")
+            self.stdout.write(self.style.SUCCESS(f"Purged {len(removed)} entries"))
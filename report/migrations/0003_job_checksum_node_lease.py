@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+def key_jobs_by_checksum(apps, schema_editor):
+    # Keeps the latest job of each upload, now that a log has one job
+    ProcessingJob = apps.get_model('report', 'ProcessingJob')
+    kept = set()
+    for job in ProcessingJob.objects.select_related('file_upload').order_by('-created_at', '-pk'):
+        if job.file_upload_id in kept:
+            job.delete()
+            continue
+        kept.add(job.file_upload_id)
+        job.checksum = job.file_upload.checksum
+        job.save(update_fields=['checksum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0002_processing_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='processingjob',
+            name='checksum',
+            field=models.CharField(default='', max_length=32),
+            preserve_default=False,
+        ),
+        migrations.RunPython(key_jobs_by_checksum, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='processingjob',
+            name='checksum',
+            field=models.CharField(max_length=32, unique=True),
+        ),
+        migrations.CreateModel(
+            name='NodeLease',
+            fields=[
+                ('ip_address', models.GenericIPAddressField(primary_key=True, serialize=False)),
+                ('holder', models.CharField(max_length=100)),
+                ('expires_at', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -1,7 +1,14 @@
-from django.db import models
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import IntegrityError, models, transaction
+from django.utils import timezone
 import os
+import socket
+import time
 from uuid import uuid4
 import hashlib
+from .log_reader import block_index_path
 
 # Create your models here.
 class FileUploadManager(models.Manager):
@@ -13,8 +20,11 @@ class FileUpload(models.Model):
         # Optionally, use a UUID or similar strategy to ensure unique filenames
         # and avoid relying on `uploaded_at` for directory naming.
         uuid_name = uuid4()
-        extension = os.path.splitext(filename)[1]
-        file_name = os.path.splitext(filename)[0]
+        file_name, extension = os.path.splitext(filename)
+        if extension.lower() == '.gz':
+            # Compressed logs and tarballs keep their inner extension, e.g. .txt.gz or .tar.gz
+            file_name, inner_extension = os.path.splitext(file_name)
+            extension = inner_extension + extension
         return f"data/files/{file_name}_{uuid_name}{extension}"
 
     @staticmethod
@@ -47,6 +57,11 @@ class FileUpload(models.Model):
             self.file_name = os.path.basename(self.file_path.name)
         super().save(*args, **kwargs)
 
+    @property
+    def block_index_path(self):
+        # Block offsets persisted by LogParser in 'indexed' mode, kept next to the upload
+        return block_index_path(self.file_path.path)
+
     def get_size_with_units(self):
         # Convert the size to human-readable units
         size = self.size
@@ -113,5 +128,192 @@ class Report(models.Model):
             size /= 1024.0
 
 
+class ProcessingJob(models.Model):
+    """
+    The asynchronous processing of an uploaded log by the tasks in report.tasks: a
+    'parse' stage, one 'ingest <command>' stage per command and a 'render' stage.
+
+    ``stages`` maps each stage name to its status, start and finish times and duration
+    in seconds, which the job status endpoint reports while the file list polls it.
+
+    A log has one job, keyed by its checksum, so submitting it again returns the same
+    job. A failed job is resumed rather than restarted: the tasks skip the stages that
+    already succeeded. So is a running job whose stages made no progress for as long
+    as a NodeLease lasts, as the worker running it died.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    )
+
+    file_upload = models.ForeignKey(FileUpload, on_delete=models.CASCADE, related_name='jobs')
+    checksum = models.CharField(max_length=32, unique=True)
+    run = models.ForeignKey('report_data.HealthCheckRun', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    stages = models.JSONField(default=dict)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def work_dir(self):
+        # Parsed rows handed from the parse stage to the ingest stages
+        return os.path.join(settings.JOB_WORK_DIR, str(self.pk))
+
+    @property
+    def holder(self):
+        # The name the job holds its NodeLease under
+        return f"job {self.pk}"
+
+    def stage_succeeded(self, name):
+        return self.stages.get(name, {}).get('status') == self.SUCCEEDED
+
+    def last_progress(self):
+        """When a stage of the job last started or finished, or when it was created."""
+        times = [
+            datetime.fromisoformat(stage[field])
+            for stage in self.stages.values() for field in ('started_at', 'finished_at') if stage.get(field)
+        ]
+        return max(times, default=self.created_at)
+
+    def is_stale(self):
+        """Whether the job is running but its stages stopped progressing for longer than a lease lasts."""
+        stale_before = timezone.now() - timedelta(seconds=settings.NODE_LEASE_SECONDS)
+        return self.status == self.RUNNING and self.last_progress() < stale_before
+
+    def reset_resumable(self):
+        """
+        Moves a failed or stale job back to pending, keeping the stages that succeeded.
+        Returns whether the job was reset, so of two callers resuming it only one does.
+        """
+        with transaction.atomic():
+            job = ProcessingJob.objects.select_for_update().get(pk=self.pk)
+            if job.status != self.FAILED and not job.is_stale():
+                return False
+            job.stages = {name: stage for name, stage in job.stages.items() if stage.get('status') == self.SUCCEEDED}
+            job.status, job.error, job.finished_at = self.PENDING, '', None
+            job.save(update_fields=['stages', 'status', 'error', 'finished_at'])
+        self.stages, self.status, self.error, self.finished_at = job.stages, job.status, job.error, job.finished_at
+        return True
 
+    def update_stage(self, name, job_status=None, **values):
+        """
+        Merges ``values`` into a stage and moves the job to ``job_status``. Stages of one job
+        run in parallel tasks, so the row is locked while its stages are rewritten.
+        """
+        with transaction.atomic():
+            job = ProcessingJob.objects.select_for_update().get(pk=self.pk)
+            job.stages.setdefault(name, {}).update(values)
+            # A failed job stays failed whatever its other stages do
+            if job_status and job.status != self.FAILED:
+                job.status = job_status
+            if job.status in (self.SUCCEEDED, self.FAILED) and not job.finished_at:
+                job.finished_at = timezone.now()
+            if 'error' in values and not job.error:
+                job.error = f"{name}: {values['error']}"
+            job.save(update_fields=['stages', 'status', 'error', 'finished_at'])
+        self.stages, self.status, self.error, self.finished_at = job.stages, job.status, job.error, job.finished_at
 
+    @contextmanager
+    def stage(self, name, final=False, fatal=True):
+        """
+        Records the status and timing of the stage run inside the block. The job fails
+        with the block's exception; with ``final`` it succeeds when the block returns.
+        A stage that is not ``fatal`` records its failure, leaves the job running and
+        swallows the exception, so the stages after it still run.
+        """
+        started_at = timezone.now()
+        self.update_stage(name, self.RUNNING, status=self.RUNNING, started_at=started_at.isoformat())
+        try:
+            yield
+        except Exception as e:
+            finished_at = timezone.now()
+            self.update_stage(
+                name, self.FAILED if fatal else None, status=self.FAILED, error=str(e),
+                finished_at=finished_at.isoformat(), seconds=(finished_at - started_at).total_seconds(),
+            )
+            if fatal:
+                raise
+            return
+        finished_at = timezone.now()
+        self.update_stage(
+            name, self.SUCCEEDED if final else None, status=self.SUCCEEDED, finished_at=finished_at.isoformat(),
+            seconds=(finished_at - started_at).total_seconds(),
+        )
+
+    def to_dict(self):
+        return {
+            'job_id': self.pk,
+            'file_id': self.file_upload_id,
+            'checksum': self.checksum,
+            'status': self.status,
+            'stages': self.stages,
+            'error': self.error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    def __str__(self):
+        return f"Processing of {self.file_upload} ({self.get_status_display()})"
+
+
+class NodeLease(models.Model):
+    """
+    A lease on the ingestion of one node's logs, so logs of the same node are ingested
+    one at a time while different nodes proceed in parallel. It is keyed by IP address,
+    as it is taken before the node is first recorded. A lease past ``expires_at`` is
+    free to take over, so a crashed holder does not block its node for good.
+    """
+    ip_address = models.GenericIPAddressField(primary_key=True)
+    holder = models.CharField(max_length=100)
+    expires_at = models.DateTimeField()
+
+    @classmethod
+    def acquire(cls, ip_address, holder):
+        """Takes or renews the lease on a node for ``holder``; False while someone else holds it."""
+        now = timezone.now()
+        expires_at = now + timedelta(seconds=settings.NODE_LEASE_SECONDS)
+        free = models.Q(holder=holder) | models.Q(expires_at__lte=now)
+        if cls.objects.filter(free, ip_address=ip_address).update(holder=holder, expires_at=expires_at):
+            return True
+        try:
+            with transaction.atomic():
+                cls.objects.create(ip_address=ip_address, holder=holder, expires_at=expires_at)
+        except IntegrityError:
+            return False
+        return True
+
+    @staticmethod
+    def unique_holder():
+        """A holder name for a process_data call outside a job, unique across hosts and calls."""
+        return f"process {socket.gethostname()[:40]} {os.getpid()} {uuid4().hex}"
+
+    @classmethod
+    def renew(cls, ip_address, holder):
+        """Extends a lease ``holder`` still holds; False once it was taken over."""
+        expires_at = timezone.now() + timedelta(seconds=settings.NODE_LEASE_SECONDS)
+        return bool(cls.objects.filter(ip_address=ip_address, holder=holder).update(expires_at=expires_at))
+
+    @classmethod
+    def release(cls, ip_address, holder):
+        cls.objects.filter(ip_address=ip_address, holder=holder).delete()
+
+    @classmethod
+    @contextmanager
+    def held(cls, ip_address, holder):
+        """Waits for the lease on a node and holds it for the duration of the block."""
+        while not cls.acquire(ip_address, holder):
+            time.sleep(settings.NODE_LEASE_RETRY_SECONDS)
+        try:
+            yield
+        finally:
+            cls.release(ip_address, holder)
+
+    def __str__(self):
+        return f"{self.ip_address} held by {self.holder} until {self.expires_at}"
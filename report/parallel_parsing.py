@@ -0,0 +1,103 @@
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from .parsers import CommandParserBase, parse_shared_block, parser_factory
+
+
+def parse_task(groups):
+    """
+    Parses a list of ``(command, blocks)`` pairs inside a worker process.
+
+    Commands whose blocks share the same entries (``ONU-Line-Stats`` and
+    ``OLT-Line-Stats``) travel in the same task, so the shared entries are pickled once,
+    and each shared block is parsed for all of them at once (see parse_shared_block).
+    """
+    parsers = [parser_factory.get_parser(command) for command, _ in groups]
+    if len(groups) == 1:
+        return [parsers[0].parse(groups[0][1])]
+
+    parsed = [[] for _ in groups]
+    for command_key in dict.fromkeys(key for _, blocks in groups for key in blocks):
+        readers = defaultdict(list)
+        for i, (_, blocks) in enumerate(groups):
+            if command_key in blocks:
+                readers[id(blocks[command_key])].append(i)
+        for indices in readers.values():
+            block = groups[indices[0]][1][command_key]
+            for i, rows in zip(indices, parse_shared_block([parsers[i] for i in indices], command_key, block)):
+                parsed[i].extend(rows)
+    return parsed
+
+
+def group_shared_commands(commands_data):
+    """Groups commands that reference the same block entries, preserving command order."""
+    units = []
+    unit_by_entry = {}
+    for command, blocks in commands_data.items():
+        unit = next((unit_by_entry[id(entry)] for entry in blocks.values() if id(entry) in unit_by_entry), None)
+        if unit is None:
+            unit = []
+            units.append(unit)
+        unit.append(command)
+        for entry in blocks.values():
+            unit_by_entry[id(entry)] = unit
+    return units
+
+
+def shard_unit(commands_data, unit, shard_size):
+    """Splits a unit of commands into tasks of at most ``shard_size`` command lines each."""
+    if not all(getattr(CommandParserBase.registry[command], 'shardable', True) for command in unit):
+        return [[(command, commands_data[command]) for command in unit]]
+
+    command_keys = list(dict.fromkeys(key for command in unit for key in commands_data[command]))
+    keys_iter = iter(command_keys)
+    tasks = []
+    while shard_keys := list(islice(keys_iter, shard_size)):
+        tasks.append([
+            (command, {key: commands_data[command][key] for key in shard_keys if key in commands_data[command]})
+            for command in unit
+        ])
+    return tasks
+
+
+def parse_commands_parallel(commands_data, workers, shard_size=64):
+    """
+    Parses independent command groups in a process pool.
+
+    Large command groups are split into shards of ``shard_size`` command lines and the
+    shard results are concatenated in their original order, so the result is identical
+    to parsing every group serially.
+
+    Args:
+        commands_data (dict): ``LogParser.get_commands()`` output, command -> blocks.
+        workers (int): Number of worker processes.
+        shard_size (int): Maximum number of command lines per task.
+
+    Returns:
+        dict: command -> parsed (merged) rows, in ``commands_data`` order. Commands
+        whose parser raised ``ValueError`` are reported and left out.
+    """
+    parsed_by_command = {}
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = []
+        for unit in group_shared_commands(commands_data):
+            for task in shard_unit(commands_data, unit, shard_size):
+                futures.append((task, executor.submit(parse_task, task)))
+
+        failed = set()
+        for task, future in futures:
+            try:
+                results = future.result()
+            except ValueError as e:
+                print(e)
+                failed.update(command for command, _ in task)
+                continue
+            for (command, _), rows in zip(task, results):
+                parsed_by_command.setdefault(command, []).extend(rows)
+
+    return {
+        command: parsed_by_command.get(command, [])
+        for command in commands_data
+        if command not in failed
+    }
@@ -0,0 +1,246 @@
+import gzip
+import hashlib
+import os
+import pickle
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+# Bump when the on-disk layout changes; old entries then simply stop matching.
+PARSE_CACHE_FORMAT_VERSION = 2
+
+# Modules whose code shapes the parsed output, with every report module they import.
+# Any edit to them invalidates the cache.
+PARSER_CODE_MODULES = (
+    'parsers.py', 'parser_factory.py', 'log_reader.py', 'command_matcher.py', 'subport_status.py', 'uptime.py',
+)
+
+CACHE_SUFFIX = '.parsed.gz'
+
+_parser_code_version = None
+
+
+def parser_code_version():
+    """Digest of the parser source files, computed once per process."""
+    global _parser_code_version
+    if _parser_code_version is None:
+        hasher = hashlib.sha1()
+        for module in PARSER_CODE_MODULES:
+            hasher.update((Path(__file__).parent / module).read_bytes())
+        _parser_code_version = hasher.hexdigest()
+    return _parser_code_version
+
+
+def calculate_file_checksum(filepath, chunk_size=1024 * 1024):
+    """MD5 of a file on disk, matching FileUpload.calculate_checksum for uploads."""
+    hasher = hashlib.md5()
+    with open(filepath, 'rb') as file:
+        while chunk := file.read(chunk_size):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+class ParseCache:
+    """
+    Persistent cache of the rows parsed by ``process_data``.
+
+    Entries are keyed by the log checksum, the parser code version and the digest of
+    ``command_patterns.yaml``. Each entry is a gzip stream of pickles: a small header
+    (used by :meth:`entries` without reading the rows) followed by ``(command, rows)``
+    frames, so entries can be written and read while rows stream through. Reads refresh
+    the entry mtime, and the least recently used entries are evicted once the directory
+    grows past ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+
+    def key(self, checksum, patterns_digest):
+        raw = f"{PARSE_CACHE_FORMAT_VERSION}:{checksum}:{parser_code_version()}:{patterns_digest}"
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def path(self, key):
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def load(self, key, require_complete=False):
+        """
+        Returns the cached output dictionary, or None on a miss.
+
+        :param require_complete: Only accept entries in which every command was parsed,
+            not just the ones with an ingestion function.
+        """
+        frames = self.load_iter(key, require_complete)
+        if frames is None:
+            return None
+        output = {}
+        try:
+            for command, rows in frames:
+                output.setdefault(command, []).extend(rows)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            self.discard(key, e)
+            return None
+        return output
+
+    def load_iter(self, key, require_complete=False):
+        """
+        Returns an iterator over the ``(command, rows)`` frames of an entry, or None on a
+        miss. Frames are read only as they are iterated, in the order they were written,
+        so the rows of a command may be split over several runs of frames.
+        """
+        path = self.path(key)
+        try:
+            file = gzip.open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        try:
+            header = pickle.load(file)
+        except (OSError, EOFError, pickle.UnpicklingError) as e:
+            file.close()
+            self.discard(key, e)
+            return None
+        if require_complete and not header['complete']:
+            file.close()
+            return None
+        os.utime(path)  # Mark as recently used for LRU eviction
+        return self.iter_frames(file)
+
+    @staticmethod
+    def iter_frames(file):
+        with file:
+            while True:
+                try:
+                    frame = pickle.load(file)
+                except EOFError:
+                    if file.peek(1):
+                        raise
+                    return
+                yield frame
+
+    def discard(self, key, error):
+        path = self.path(key)
+        print(f"Discarding unreadable parse cache entry {path.name}: {error}")
+        path.unlink(missing_ok=True)
+
+    def writer(self, key, checksum):
+        """Starts an entry that is filled frame by frame, see :class:`ParseCacheWriter`."""
+        return ParseCacheWriter(self, key, checksum)
+
+    def store(self, key, output, checksum, complete):
+        writer = self.writer(key, checksum)
+        try:
+            for command, rows in output.items():
+                writer.write(command, rows)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.commit(complete)
+
+    def entries(self):
+        """
+        Lists the cache entries, most recently used first.
+
+        Returns:
+            list: dicts with ``key``, ``size``, ``last_used`` and the stored header fields.
+        """
+        if not self.cache_dir.exists():
+            return []
+        entries = []
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            stat = path.stat()
+            entry = {'key': path.name[:-len(CACHE_SUFFIX)], 'size': stat.st_size, 'last_used': stat.st_mtime}
+            try:
+                with gzip.open(path, 'rb') as file:
+                    entry.update(pickle.load(file))
+            except (OSError, EOFError, pickle.UnpicklingError):
+                entry['corrupt'] = True
+            entries.append(entry)
+        return sorted(entries, key=lambda entry: entry['last_used'], reverse=True)
+
+    def evict(self):
+        """Removes least recently used entries until the cache fits in ``max_bytes``."""
+        if not self.cache_dir.exists():
+            return []
+        paths = sorted(self.cache_dir.glob(f"*{CACHE_SUFFIX}"), key=lambda path: path.stat().st_mtime)
+        total = sum(path.stat().st_size for path in paths)
+        evicted = []
+        for path in paths:
+            if total <= self.max_bytes:
+                break
+            total -= path.stat().st_size
+            path.unlink(missing_ok=True)
+            evicted.append(path.name[:-len(CACHE_SUFFIX)])
+        return evicted
+
+    def purge(self, keys=None, checksum=None):
+        """Removes the given entries, the entries of one log checksum, or everything."""
+        removed = []
+        for entry in self.entries():
+            if keys is not None and entry['key'] not in keys:
+                continue
+            if checksum is not None and entry.get('checksum') != checksum:
+                continue
+            self.path(entry['key']).unlink(missing_ok=True)
+            removed.append(entry['key'])
+        return removed
+
+
+class ParseCacheWriter:
+    """
+    Writes one parse cache entry as rows stream past.
+
+    Frames go to a temporary gzip member first. :meth:`commit` writes the header, whose
+    row counts are only known at the end, as the first member of the entry and appends
+    the frames after it, then moves the entry into place so readers never see a partial
+    one.
+    """
+
+    def __init__(self, cache, key, checksum):
+        self.cache = cache
+        self.key = key
+        self.checksum = checksum
+        self.rows = {}
+        # Set when a command's rows could not all be written; the entry is then dropped
+        self.failed = False
+        cache.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, self.frames_path = tempfile.mkstemp(dir=cache.cache_dir, suffix='.tmp')
+        self.raw = os.fdopen(fd, 'w+b')
+        self.frames = gzip.GzipFile(fileobj=self.raw, mode='wb', compresslevel=3)
+
+    def write(self, command, rows):
+        self.rows[command] = self.rows.get(command, 0) + len(rows)
+        pickle.dump((command, rows), self.frames, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def commit(self, complete):
+        if self.failed:
+            self.abort()
+            return
+        header = {
+            'checksum': self.checksum,
+            'parser_version': parser_code_version(),
+            'complete': complete,
+            'created_at': time.time(),
+            'rows': self.rows,
+        }
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache.cache_dir, suffix='.tmp')
+        try:
+            self.frames.close()
+            with os.fdopen(fd, 'wb') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=3) as file:
+                    pickle.dump(header, file, protocol=pickle.HIGHEST_PROTOCOL)
+                # gzip readers treat concatenated members as one stream
+                self.raw.seek(0)
+                shutil.copyfileobj(self.raw, raw)
+            os.replace(tmp_path, self.cache.path(self.key))
+        except BaseException:
+            Path(tmp_path).unlink(missing_ok=True)
+            raise
+        finally:
+            self.abort()
+        self.cache.evict()
+
+    def abort(self):
+        self.frames.close()
+        self.raw.close()
+        Path(self.frames_path).unlink(missing_ok=True)
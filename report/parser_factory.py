@@ -1,15 +1,26 @@
-
-
-
 class ParserFactory:
     def __init__(self):
         self.parsers = {}
+        self.instances = {}
+
+    @classmethod
+    def from_registry(cls, registry):
+        """Builds a factory with every parser of a ``CommandParserBase.registry``."""
+        factory = cls()
+        for command_keyword, parser in registry.items():
+            factory.register_parser(command_keyword, parser)
+        return factory
 
     def register_parser(self, command_keyword, parser):
         self.parsers[command_keyword] = parser
+        self.instances.pop(command_keyword, None)
 
     def get_parser(self, command_keyword):
-        parser = self.parsers.get(command_keyword)
-        if not parser:
-            raise ValueError(f"No parser registered for command: {command_keyword}")
-        return parser()
\ No newline at end of file
+        """Returns the shared instance of the parser registered for a command."""
+        instance = self.instances.get(command_keyword)
+        if instance is None:
+            parser = self.parsers.get(command_keyword)
+            if not parser:
+                raise ValueError(f"No parser registered for command: {command_keyword}")
+            instance = self.instances[command_keyword] = parser()
+        return instance
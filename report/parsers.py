@@ -1,8 +1,14 @@
 
+import io
 import re
 from collections import defaultdict
+from collections.abc import Mapping
 import datetime
 
+from .parser_factory import ParserFactory
+from .subport_status import STATUS_CODES, SubportStatus
+from .uptime import parse_uptime
+
 class KeyValueParser:
     def parse(self, text, keywords=None):
         # Split the input text into lines
@@ -63,44 +69,79 @@ class SpaceSeparatedKeyValueParser:
 
 
 class ColumnBasedParser:
-    def __init__(self):
-        self.headers = []
-        self.column_positions = []
-
-    def detect_headers_and_data_start(self, lines):
-        """Detects headers and their positions to parse columns accurately."""
-        for i, line in enumerate(lines):
-            if "----" in line:  # Assuming dashed lines under headers
-                self.headers = re.findall(r'\S+', lines[i - 1])
-                # Detect the start position of each header based on non-space characters following spaces.
-                self.column_positions = [match.start() for match in re.finditer(r'\S+(?=\s|$)', lines[i - 1])]
-                return i + 1  # Return the index where data starts
-
-    def parse_line_into_columns(self, line):
-        """Parses a line into data columns based on the positions of headers."""
-        row_data = {}
-        for header, start_pos in zip(self.headers, self.column_positions):
-            end_pos = self.column_positions[self.column_positions.index(start_pos) + 1] if self.column_positions.index(start_pos) + 1 < len(self.column_positions) else None
-            # Extract the substring for each column based on start and end positions.
-            value = line[start_pos:end_pos].strip() if end_pos else line[start_pos:].strip()
-            row_data[header] = value
-        return row_data
+    """
+    Parses fixed-width tables whose header line is underlined with dashes.
 
-    def parse(self, text):
-        lines = text.strip().split('\n')
-        data_start_line_index = self.detect_headers_and_data_start(lines)
-        
-        if data_start_line_index is None:
+    Each header line is turned once into ``(header, slice)`` pairs and every data row is
+    cut with those slices. A header line followed by another dashed line starts a new
+    table, so outputs that repeat their header block (paged ``alarm show`` output) are
+    parsed with the layout of the table each row belongs to.
+
+    The parser keeps no state between calls, so a single instance can be shared by
+    every parser and thread.
+    """
+
+    header_pattern = re.compile(r'\S+')
+
+    def detect_layout(self, header_line):
+        """
+        Computes the column layout of a header line.
+
+        Each column runs from the start of its header to the start of the next one; the
+        last column runs to the end of the line.
+
+        Returns:
+            list: (header, slice) tuples in column order.
+        """
+        matches = list(self.header_pattern.finditer(header_line))
+        ends = [match.start() for match in matches[1:]] + [None]
+        return [(match.group(), slice(match.start(), end)) for match, end in zip(matches, ends)]
+
+    def parse_line_into_columns(self, line, layout):
+        """Parses a line into data columns using a layout from :meth:`detect_layout`."""
+        return {header: line[column].strip() for header, column in layout}
+
+    def parse_iter(self, text):
+        """
+        Yields the rows of every table in ``text`` as they are read.
+
+        Lines are held back by one so that a line followed by a dashed line is recognised
+        as the header of the next table rather than emitted as a row.
+        """
+        layout = None
+        held = None  # Previous non-empty line, not yet known to be a row or a header
+        for line in io.StringIO(text.strip()):
+            line = line.rstrip('\n')
+            if layout is None:
+                if "----" in line and held is not None:  # Assuming dashed lines under headers
+                    layout = self.detect_layout(held)
+                    held = None
+                else:
+                    held = line
+                continue
+
+            if line.startswith('----'):
+                if held is not None:  # The held line heads a repeated table
+                    layout = self.detect_layout(held)
+                    held = None
+                continue
+
+            if held is not None:
+                yield self.parse_line_into_columns(held, layout)
+            held = line if line.strip() else None  # Exclude empty lines
+
+        if layout is None:
             print("Headers not detected.")
-            return []
+        elif held is not None:
+            yield self.parse_line_into_columns(held, layout)
 
-        parsed_data = []
-        for line in lines[data_start_line_index:]:
-            if line.strip() and not line.startswith('----'):  # Exclude dashed lines and empty lines.
-                row_data = self.parse_line_into_columns(line)
-                parsed_data.append(row_data)
+    def parse(self, text):
+        return list(self.parse_iter(text))
 
-        return parsed_data
+
+def block_items(blocks):
+    """The ``(command_key, command_data)`` pairs of a dict of blocks, or the pairs themselves."""
+    return blocks.items() if isinstance(blocks, Mapping) else blocks
 
 
 class TextSplitter:
@@ -141,14 +182,6 @@ class TextSplitter:
         
     #     return sections
     
-class DataMerger:
-    def merge(self, parsed_data):
-        merged_data = []
-        for key in parsed_data:
-            merged_data.extend(parsed_data[key])
-        return merged_data
-
-
 class ParserMeta(type):
     def __init__(cls, name, bases, attrs):
         if not hasattr(cls, 'registry'):
@@ -159,126 +192,189 @@ class ParserMeta(type):
         
         
 class CommandParserBase(metaclass=ParserMeta):
-    def __init__(self):
-        self.key_value_parser = KeyValueParser()
-        self.space_separated_key_value_parser = SpaceSeparatedKeyValueParser()
-        self.column_based_key_value_parser = ColumnBasedParser()
-        self.data_merger = DataMerger()
-
-    def parse(self, blocks):
-        raise NotImplementedError("Each parser must implement the parse method.")
-    
-    def return_parsed_data(self, parsed_data, merge):
+    """
+    Base class of the command parsers.
+
+    Parsers are stateless: patterns are compiled once at class definition and the helper
+    sub-parsers are shared class attributes, so ``ParserFactory`` hands out a single
+    instance per command for the lifetime of the process.
+    """
+
+    # Whether a command group may be split into shards parsed independently
+    shardable = True
+    # Shared BlockResultMemo consulted by parse_block_memoized, None to disable memoization
+    block_memo = None
+    # Scanner shared with the other parsers of the same blocks, see parse_shared_block
+    section_scanner = None
+
+    key_value_parser = KeyValueParser()
+    space_separated_key_value_parser = SpaceSeparatedKeyValueParser()
+    column_based_key_value_parser = ColumnBasedParser()
+
+    def parse(self, blocks, merge=True):
+        """
+        Parses every block of a command group, given as a dict of command line -> block
+        or as ``(command_line, block)`` pairs read one at a time.
+
+        Returns:
+            list: all rows in block order, or with ``merge=False`` a dict of rows per command line.
+        """
         if merge:
-            return self.data_merger.merge(parsed_data)
-        else:
-            return parsed_data
+            return list(self.parse_iter(blocks))
+        parsed_data = defaultdict(list)
+        for command_key, rows in self.iter_block_rows(blocks):
+            parsed_data[command_key].extend(rows)
+        return parsed_data
+
+    def parse_iter(self, blocks, context=None):
+        """Yields the rows of every block in order, parsing each block only when reached."""
+        for _, rows in self.iter_block_rows(blocks, context):
+            yield from rows
+
+    def iter_block_rows(self, blocks, context=None):
+        """
+        Yields ``(command_key, rows)`` for each block.
+
+        ``context`` is a dict kept between the calls that parse the blocks of one log a
+        few at a time, for parsers whose blocks depend on each other; by default every
+        block is parsed on its own.
+        """
+        for command_key, command_data in block_items(blocks):
+            if self.block_memo is None:
+                yield command_key, self.iter_block(command_key, command_data)
+            else:
+                yield command_key, self.parse_block_memoized(command_key, command_data)
+
+    def parse_block(self, command_key, command_data):
+        """Parses the output of a single command line into a list of rows."""
+        raise NotImplementedError("Each parser must implement the parse or parse_block method.")
+
+    def iter_block(self, command_key, command_data):
+        """Iterates over the rows of a single block; parsers able to yield rows as they read them override this."""
+        return iter(self.parse_block(command_key, command_data))
+
+    def parse_block_memoized(self, command_key, command_data):
+        """
+        Parses one block into a list, reusing the rows of any byte-identical block parsed
+        before (by this process or, with a shared store, by any other).
+        """
+        if self.block_memo is None:
+            return self.parse_block(command_key, command_data)
+        key = self.block_memo.key(self, command_key, command_data['output'])
+        rows = self.block_memo.get(key)
+        if rows is None:
+            rows = self.parse_block(command_key, command_data)
+            self.block_memo.put(key, rows)
+        return rows
 
 
 class ShowlineParser(CommandParserBase):
     command_keyword = 'Line-Stats'
-    
-    def parse(self, blocks, merge=True):
-        # Updated to capture optional port information
-        section_pattern = re.compile(
-            r"shelf = (\d+),\s+slot = (\w+),\s*(?:port (\d+),)?\s*line type = (\w+)(.*?)(?=\n-{72}|\Z)",
-            re.DOTALL
-        )
-        sub_port_pattern = re.compile(r"(\d+-\d+|\d+)\s+([A-Z\s]+)")
-
-        parsed_data = {}
 
-        for command_key, command_data in blocks.items():
-            sections = section_pattern.findall(command_data['output'])
-            parsed_data[command_key] = []
-
-            for shelf, slot, port, line_type, statuses in sections:
-                port = port or ""  # Keep port as an empty string if not present
-                status_lines = statuses.strip().split('\n')
-                for status_line in status_lines:
-                    port_match = sub_port_pattern.match(status_line.strip())
-                    if port_match:
-                        sub_port_range, status = port_match.groups()
-                        parsed_data[command_key].append({
-                            'Shelf': shelf,
-                            'Slot': slot,
-                            'Port': port,  # Now including port
-                            'Line Type': line_type,
-                            'Sub Port Range': sub_port_range,
-                            'Status': ' '.join(status.split())  # Normalize spaces
-                        })
-        return self.return_parsed_data(parsed_data, merge)
+    # Updated to capture optional port information
+    section_pattern = re.compile(
+        r"shelf = (\d+),\s+slot = (\w+),\s*(?:port (\d+),)?\s*line type = (\w+)(.*?)(?=\n-{72}|\Z)",
+        re.DOTALL
+    )
+    sub_port_pattern = re.compile(r"(\d+-\d+|\d+)\s+([A-Z\s]+)")
+    
+    def parse_block(self, command_key, command_data):
+        rows = []
+        for shelf, slot, port, line_type, statuses in self.section_pattern.findall(command_data['output']):
+            port = port or ""  # Keep port as an empty string if not present
+            status_lines = statuses.strip().split('\n')
+            for status_line in status_lines:
+                port_match = self.sub_port_pattern.match(status_line.strip())
+                if port_match:
+                    sub_port_range, status = port_match.groups()
+                    rows.append({
+                        'Shelf': shelf,
+                        'Slot': slot,
+                        'Port': port,  # Now including port
+                        'Line Type': line_type,
+                        'Sub Port Range': sub_port_range,
+                        'Status': ' '.join(status.split())  # Normalize spaces
+                    })
+        return rows
     
     
 class SlotsParser(CommandParserBase):
     command_keyword = 'Slots - Status'
-    
-    def __init__(self):
-        super().__init__()
+    shardable = False  # Every block needs the card mapping from the 'slots' block
+
+    keywords = ('Shelf', 'Slot', 'Type', 'Card Version', 'Software Version', 'Uptime', 'State', 'ROM Version', 'Mode', 'Serial #')
+    # Pattern to detect category lines and card entry lines
+    category_pattern = re.compile(r'^(Management Cards|Fabric Cards|Line Cards)$')
+    card_entry_pattern = re.compile(r'(\w+)\s*:(.*)\((.*)\)')
         
-    def parse(self, blocks, merge=True):
+    def iter_block_rows(self, blocks, context=None):
         """_summary_
 
         command_data{'command': 'slots m1', 'output': 'MXK 1419 \nType            :*MXK-MC-TOP, 14U MGMT W/ TOP\nCard Version    : 800-03576-04-B\nEEPROM Version  : 1\nSerial #        : 15691446\nCLEI Code       : No CLEI   \nCard-Profile ID : 1/m1/20001\nShelf           : 1\nSlot            : m1\nROM Version     : MXK 3.4.2.144.007\nSoftware Version: MXK 3.4.2.272\nState           : RUNNING\nMode            : FUNCTIONAL\nHeartbeat check : enabled\nHeartbeat last  : FRI MAR 22 09:19:01 2024\nHeartbeat resp  : 317647\nHeartbeat late  : 0\nHbeat seq error : 0\nHbeat longest   : 11\nFault reset     : enabled\nPower fault mon : supported\nUptime          : 3 days, 16 hours, 14 minutes\n'}
         
         Args:
             blocks (_type_): _description_
-            merge (bool, optional): _description_. Defaults to True.
 
-        Returns:
-            _type_: _description_
+        Yields:
+            tuple: (command_key, rows) for every 'slots <slot>' block. Blocks read before
+            the 'slots' block, which maps the cards, are held until it arrives, in
+            ``context`` when the blocks of a log come in several calls.
         """
-        parsed_data = defaultdict(list)
-        slots_output = blocks.pop('slots', None)
-        cards_info = self.parse_cards_info(slots_output['output'])
-        for command_key, command_data in blocks.items():
-            input_data = command_data['output']
-            chassis_type = input_data.split('\n')[0].strip()
-            result_dict = self.key_value_parser.parse(input_data, keywords=['Shelf', 'Slot', 'Type', 'Card Version', 'Software Version', 'Uptime', 'State', 'ROM Version', 'Mode', 'Serial #'])
-            card_type = result_dict.get('Type')
-            card_mapping = cards_info.get(card_type)
-            filtered_dict = {
-                'Component': card_mapping['component'],
-                'Shelf': result_dict.get('Shelf'),
-                'Slot': result_dict.get('Slot'),
-                'Chassis Type': chassis_type,
-                'Type': card_type.split(',')[0].strip(),
-                'Card Version': result_dict.get('Card Version'),
-                'Software Version': result_dict.get('Software Version'),
-                'Uptime': result_dict.get('Uptime'),
-                'Mode': result_dict.get('Mode'),
-                'ROM Version': result_dict.get('ROM Version'),
-                'Serial Number': result_dict.get('Serial #'),
-                'Additional Information': card_mapping['card_key'],
-                'State': result_dict.get('State'),
-                'Slots Status': card_mapping['status']
-                
-            }
-            parsed_data[command_key].append(filtered_dict)
-
-        return self.return_parsed_data(parsed_data, merge)
+        streamed = context is not None
+        context = context if streamed else {}
+        pending = context.setdefault('pending', [])
+        for command_key, command_data in block_items(blocks):
+            if command_key == 'slots':
+                context['cards_info'] = self.parse_cards_info(command_data['output'])
+                for pending_key, pending_data in pending:
+                    yield pending_key, [self.parse_slot(pending_data['output'], context['cards_info'])]
+                pending.clear()
+            elif 'cards_info' not in context:
+                pending.append((command_key, command_data))
+            else:
+                yield command_key, [self.parse_slot(command_data['output'], context['cards_info'])]
+        if pending and not streamed:
+            raise ValueError("No 'slots' block to map the cards of the slot blocks to")
+
+    def parse_slot(self, input_data, cards_info):
+        chassis_type = input_data.split('\n')[0].strip()
+        result_dict = self.key_value_parser.parse(input_data, keywords=self.keywords)
+        card_type = result_dict.get('Type')
+        card_mapping = cards_info.get(card_type)
+        return {
+            'Component': card_mapping['component'],
+            'Shelf': result_dict.get('Shelf'),
+            'Slot': result_dict.get('Slot'),
+            'Chassis Type': chassis_type,
+            'Type': card_type.split(',')[0].strip(),
+            'Card Version': result_dict.get('Card Version'),
+            'Software Version': result_dict.get('Software Version'),
+            'Uptime': parse_uptime(result_dict.get('Uptime')),
+            'Mode': result_dict.get('Mode'),
+            'ROM Version': result_dict.get('ROM Version'),
+            'Serial Number': result_dict.get('Serial #'),
+            'Additional Information': card_mapping['card_key'],
+            'State': result_dict.get('State'),
+            'Slots Status': card_mapping['status']
+            
+        }
 
     def parse_cards_info(self, text):
         lines = text.split('\n')[1:]  # Skip the first line
 
-        # Pattern to detect category lines and card entry lines
-        category_pattern = re.compile(r'^(Management Cards|Fabric Cards|Line Cards)$')
-        card_entry_pattern = re.compile(r'(\w+)\s*:(.*)\((.*)\)')
-
-
         parsed_data = {}
         current_category = None
 
         for line in lines:
             # Check for category lines
-            category_match = category_pattern.match(line.strip())
+            category_match = self.category_pattern.match(line.strip())
             if category_match:
                 current_category = category_match.group(1)  # Capture the current category
                 continue
 
             # Process card entry lines within the current category
             if current_category:
-                card_match = card_entry_pattern.match(line.strip())
+                card_match = self.card_entry_pattern.match(line.strip())
                 if card_match:
                     card_key, card_detail, status = card_match.groups()
                     card_detail = card_detail.strip().split(' (')[0]  # Extract card detail, exclude status
@@ -294,23 +390,21 @@ class SlotsParser(CommandParserBase):
 
 class SFPDataParser(CommandParserBase):
     command_keyword = 'HW Inventory - Sfp'
-    
-    def __init__(self):
-        super().__init__()
-        self.keyword_mapping = {
-            "vendorName": "Vendor Name",
-            "vendorOui": "Vendor OUI",
-            "vendorPartNumber": "Vendor Part Number",
-            "vendorRevisionLevel": "Vendor Revision Level",
-            "serialNumber": "Serial Number",
-            "manufacturingDateCode": "Manufacturing Date",
-            "connectorType": "Connector Type",
-            "transceiverType": "Transceiver Type",
-            "nominalBitRate": "Nominal Bit Rate (Gbps)",
-            "nineTo125mmFiberLinkLengthKm": "9/125mm Fiber Link Length (km)",
-            "nineTo125mmFiberLinkLength100m": "9/125mm Fiber Link Length (100m)",
-        }
-        self.interface_pattern = re.compile(r"SFP Data for interface (.+)")
+
+    keyword_mapping = {
+        "vendorName": "Vendor Name",
+        "vendorOui": "Vendor OUI",
+        "vendorPartNumber": "Vendor Part Number",
+        "vendorRevisionLevel": "Vendor Revision Level",
+        "serialNumber": "Serial Number",
+        "manufacturingDateCode": "Manufacturing Date",
+        "connectorType": "Connector Type",
+        "transceiverType": "Transceiver Type",
+        "nominalBitRate": "Nominal Bit Rate (Gbps)",
+        "nineTo125mmFiberLinkLengthKm": "9/125mm Fiber Link Length (km)",
+        "nineTo125mmFiberLinkLength100m": "9/125mm Fiber Link Length (100m)",
+    }
+    interface_pattern = re.compile(r"SFP Data for interface (.+)")
         
     def extract_interface(self, command_data):
         interface_line = command_data.strip().split('\n')[0]
@@ -322,101 +416,83 @@ class SFPDataParser(CommandParserBase):
         formatted_date = date.strftime("%Y-%m-%d")
         return formatted_date
 
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-
-        for command_key, command_data in blocks.items():
-            interface = self.extract_interface(command_data['output'])
-            mapped_data = {}
-            if interface:
-                mapped_data['Interface'] = interface
-                
-            result_dict = self.space_separated_key_value_parser.parse(command_data['output'], keywords=self.keyword_mapping.keys())
-            result_dict["manufacturingDateCode"] = self.format_manufacturing_date(result_dict["manufacturingDateCode"])   
-
-            mapped_data.update({self.keyword_mapping.get(k, k): v for k, v in result_dict.items()})
+    def parse_block(self, command_key, command_data):
+        interface = self.extract_interface(command_data['output'])
+        mapped_data = {}
+        if interface:
+            mapped_data['Interface'] = interface
             
-            parsed_data[command_key].append(mapped_data)
+        result_dict = self.space_separated_key_value_parser.parse(command_data['output'], keywords=self.keyword_mapping.keys())
+        result_dict["manufacturingDateCode"] = self.format_manufacturing_date(result_dict["manufacturingDateCode"])   
 
-        return self.return_parsed_data(parsed_data, merge)
+        mapped_data.update({self.keyword_mapping.get(k, k): v for k, v in result_dict.items()})
+        return [mapped_data]
 
 
 class ShowFatalDataParser(CommandParserBase):
     command_keyword = 'Alarms - Fatal Logs'
-    
-    def __init__(self):
-        super().__init__()
-        self.keywords = [
-            "Timestamp",
-            "SW version",
-            "Task name",
-            "Errno",
-            "Fatal code",
-        ]
-        
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        splitter = TextSplitter()
 
-        fatal_record_pattern = re.compile(r'(Fatal record#\s*\d+)')
+    keywords = (
+        "Timestamp",
+        "SW version",
+        "Task name",
+        "Errno",
+        "Fatal code",
+    )
+    fatal_record_pattern = re.compile(r'(Fatal record#\s*\d+)')
+    record_number_pattern = re.compile(r'Fatal record#\s*(\d+)')
+        
+    def parse_block(self, command_key, command_data):
+        rows = []
 
-        for command_key, command_data in blocks.items():
-            # Use the splitter function to divide the text into sections by "Fatal record#"
-            records = splitter.split_text_by_pattern(command_data['output'], fatal_record_pattern)
+        # Use the splitter function to divide the text into sections by "Fatal record#"
+        records = TextSplitter.split_text_by_pattern(command_data['output'], self.fatal_record_pattern)
 
-            for header, content in records:
-                # Extract the record number from the header
-                record_number_match = re.search(r'Fatal record#\s*(\d+)', header)
-                record_number = record_number_match.group(1) if record_number_match else "Unknown"
+        for header, content in records:
+            # Extract the record number from the header
+            record_number_match = self.record_number_pattern.search(header)
+            record_number = record_number_match.group(1) if record_number_match else "Unknown"
 
-                # Parse the content of each record
-                result_dict = self.key_value_parser.parse(content, keywords=self.keywords)
-                if result_dict:
-                    result_dict["Card Number"] = record_number
-                    parsed_data[command_key].append(result_dict)
+            # Parse the content of each record
+            result_dict = self.key_value_parser.parse(content, keywords=self.keywords)
+            if result_dict:
+                result_dict["Card Number"] = record_number
+                rows.append(result_dict)
 
-        return self.return_parsed_data(parsed_data, merge)
+        return rows
 
         
 class RomVersionParser(CommandParserBase):
     command_keyword = 'HW Inventory - Card ROM Version'
-    
-    def __init__(self):
-        super().__init__()
+
+    card_identifier_pattern = re.compile(r'\s+(\w+)$')
         
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        for command_key, command_data in blocks.items():
-            # Extract card identifier (number or string) directly from command_key
-            card_identifier_match = re.search(r'\s+(\w+)$', command_key)
-            card_identifier = card_identifier_match.group(1) if card_identifier_match else "Unknown"
-
-            # Split the command output by new lines to separate rom version and timestamp
-            lines = command_data['output'].split('\n')
-            rom_version = lines[0].strip() if len(lines) > 0 else "N/A"
-            timestamp = lines[1].strip() if len(lines) > 1 else "N/A"
-
-            parsed_data[command_key].append({
-                'Card': card_identifier,
-                'ROM Version': rom_version,
-                'Timestamp': timestamp
-            })
-            
-        return self.return_parsed_data(parsed_data, merge)
+    def parse_block(self, command_key, command_data):
+        # Extract card identifier (number or string) directly from command_key
+        card_identifier_match = self.card_identifier_pattern.search(command_key)
+        card_identifier = card_identifier_match.group(1) if card_identifier_match else "Unknown"
+
+        # Split the command output by new lines to separate rom version and timestamp
+        lines = command_data['output'].split('\n')
+        rom_version = lines[0].strip() if len(lines) > 0 else "N/A"
+        timestamp = lines[1].strip() if len(lines) > 1 else "N/A"
+
+        return [{
+            'Card': card_identifier,
+            'ROM Version': rom_version,
+            'Timestamp': timestamp
+        }]
 
 
 class AlarmParser(CommandParserBase):
     command_keyword = 'Alarms'
-    
-    def __init__(self):
-        super().__init__()
         
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        for command_key, command_data in blocks.items():
-            result_dict = self.column_based_key_value_parser.parse(command_data['output'])
-            parsed_data[command_key].extend(result_dict)
-        return self.return_parsed_data(parsed_data, merge)
+    def parse_block(self, command_key, command_data):
+        return self.column_based_key_value_parser.parse(command_data['output'])
+
+    def iter_block(self, command_key, command_data):
+        # An 'alarm show' table can hold every alarm of the node, so its rows are yielded as they are cut
+        return self.column_based_key_value_parser.parse_iter(command_data['output'])
     
     
 
@@ -468,23 +544,32 @@ class AlarmParser(CommandParserBase):
 
 class EEShowBackPlaneParser(CommandParserBase):
     command_keyword = 'HW Inventory Backplane'
-    
-    def __init__(self):
-        super().__init__()
         
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        for command_key, command_data in blocks.items():
-            result_dict = self.key_value_parser.parse(command_data['output'])
-            parsed_data[command_key].append(result_dict)
-        return self.return_parsed_data(parsed_data, merge)
+    def parse_block(self, command_key, command_data):
+        return [self.key_value_parser.parse(command_data['output'])]
     
 
 class GponOnuStatusParser(CommandParserBase):
     command_keyword = 'GPON-ONU-Stats'
-    
-    def __init__(self):
-        super().__init__()
+
+    keywords = (
+        "Upstream Bip UNits", "FEC Corrected Bytes", "FEC Corrected codewords",
+        "FEC Uncorrected codewords", "Total received codewords", "received bytes",
+        "received packets", "transmitted bytes", "transmitted packets",
+        "Unreceived bursts", "BIP Error", "Remote BIP Error", "Drift of Window Indications"
+    )
+    slot_pattern = re.compile(r'rcom (\d+) gpononuponstat showall (\d+)')
+    # Metric patterns by keyword tuple, compiled on first use
+    metric_patterns = {}
+
+    @classmethod
+    def metric_pattern(cls, keywords):
+        keywords = tuple(keywords)
+        pattern = cls.metric_patterns.get(keywords)
+        if pattern is None:
+            keywords_regex = '|'.join(re.escape(keyword) for keyword in keywords)
+            pattern = cls.metric_patterns[keywords] = re.compile(rf'ONU\((\d+)\) ({keywords_regex}):[^\S\n]+(\d+)')
+        return pattern
         
     def extract_slot(self, command):
         """
@@ -494,7 +579,7 @@ class GponOnuStatusParser(CommandParserBase):
         :return: A string formatted as 'x-y' where x is the slot after 'rcom' and y is the slot after 'showall'.
         """
         # Regular expression to find numbers after 'rcom' and 'showall'
-        match = re.search(r'rcom (\d+) gpononuponstat showall (\d+)', command)
+        match = self.slot_pattern.search(command)
         if match:
             slot_rcom = match.group(1)
             slot_showall = match.group(2)
@@ -504,57 +589,50 @@ class GponOnuStatusParser(CommandParserBase):
     def parse_gpon_data(self, output, slot, keywords):
         """
         Parses GPON ONU status output into a list of dictionaries, each containing metrics for a single subport.
+        The output is scanned once for every metric line instead of once per line.
 
         :param output: Multi-line string containing the command output.
         :param keywords: List of keywords to include in the output.
         :return: List of dictionaries where each dictionary contains data for a single subport.
         """
-        subport_data = defaultdict(dict)
-        keywords_regex = '|'.join(re.escape(keyword) for keyword in keywords)  # Prepare regex pattern for keywords
-        pattern = rf'ONU\(\d+\) ({keywords_regex}):\s+(\d+)'
-
-        lines = output.split('\n')
-        for line in lines:
-            match = re.search(pattern, line)
-            if match:
-                metric = match.group(1).strip()
-                value = int(match.group(2).strip())
-                subport = line.split()[0]  # Extract 'ONU(1)' or similar
-
-                if subport not in subport_data:
-                    subport_data[subport]['Slot'] = slot
-                    subport_data[subport]['Sub Port'] = subport
-                    
-                subport_data[subport][metric] = value
-                
-
-        # Convert the dictionary to a list of dictionaries
+        subport_data = {}
+        for onu, metric, value in self.metric_pattern(keywords).findall(output):
+            subport = subport_data.get(onu)
+            if subport is None:
+                subport = subport_data[onu] = {'Slot': slot, 'Sub Port': f"ONU({onu})"}
+            subport[metric] = int(value)
         return list(subport_data.values())
 
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        keywords = [
-            "Upstream Bip UNits", "FEC Corrected Bytes", "FEC Corrected codewords",
-            "FEC Uncorrected codewords", "Total received codewords", "received bytes",
-            "received packets", "transmitted bytes", "transmitted packets",
-            "Unreceived bursts", "BIP Error", "Remote BIP Error", "Drift of Window Indications"
-        ]
-        for command_key, command_data in blocks.items():
-            slot = self.extract_slot(command_key)
-            result = self.parse_gpon_data(command_data['output'], slot, keywords)
-            # result_dict = self.column_based_key_value_parser.parse(command_data['output'])
-            parsed_data[command_key].extend(result)
-        return self.return_parsed_data(parsed_data, merge)
+    def parse_block(self, command_key, command_data):
+        slot = self.extract_slot(command_key)
+        # result_dict = self.column_based_key_value_parser.parse(command_data['output'])
+        return self.parse_gpon_data(command_data['output'], slot, self.keywords)
     
 class CardStatsParser(CommandParserBase):
     command_keyword = 'Card Stats'
-    
-    def __init__(self):
-        super().__init__()
+
+    # Matches the detailed structure of each line
+    line_regex = re.compile(
+        r'(\w+\*?)\s+'  # Slot, possibly with an asterisk
+        r'(\d+)\s+'  # CPU Idle (%)
+        r'(\d+)\s+'  # CPU Usage (%)
+        r'\d+\s+'  # CPU high (not used)
+        r'\d+\s+'  # services (not used)
+        r'\d+\s+'  # framework (not used)
+        r'\d+\s+'  # low (not used)
+        r'(\d+\.\d+)\s+'  # Memory Utilization (%)
+        r'(\d+)\s+'  # Card Memory Used (KB)
+        r'(\d+)\s+'  # Card Memory Peak (KB)
+        r'(\d+)\s+'  # Card Memory Available (KB)
+        r'(\d+ - OK)\s+'  # Status
+        r'(\d{1,3}:\d{2}:\d{2}:\d{2})\s+'  # Uptime
+        r'(.+)$'  # Software Version, captures till end
+    )
     
     def parse_card_stats(self, data):
         """
-        Parses a block of system status data into a list of dictionaries with formatted values.
+        Parses a block of system status data into a list of dictionaries with native values:
+        numbers for the CPU and memory columns and a timedelta for the uptime.
         Uses detailed regular expressions to accurately extract each field based on expected patterns.
         :param data: Multi-line string containing the raw data.
         :return: List of dictionaries where each dictionary represents the status of one slot.
@@ -562,27 +640,9 @@ class CardStatsParser(CommandParserBase):
         # Split the data into lines
         lines = data.strip().split('\n')
         
-        # Define a regex that matches the detailed structure of each line
-        line_regex = re.compile(
-            r'(\w+\*?)\s+'  # Slot, possibly with an asterisk
-            r'(\d+)\s+'  # CPU Idle (%)
-            r'(\d+)\s+'  # CPU Usage (%)
-            r'\d+\s+'  # CPU high (not used)
-            r'\d+\s+'  # services (not used)
-            r'\d+\s+'  # framework (not used)
-            r'\d+\s+'  # low (not used)
-            r'(\d+\.\d+)\s+'  # Memory Utilization (%)
-            r'(\d+)\s+'  # Card Memory Used (KB)
-            r'(\d+)\s+'  # Card Memory Peak (KB)
-            r'(\d+)\s+'  # Card Memory Available (KB)
-            r'(\d+ - OK)\s+'  # Status
-            r'(\d{1,3}:\d{2}:\d{2}:\d{2})\s+'  # Uptime
-            r'(.+)$'  # Software Version, captures till end
-        )
-        
         parsed_data = []
         for line in lines[2:]:  # skip the header lines
-            match = line_regex.match(line.strip())
+            match = self.line_regex.match(line.strip())
             if match:
                 # Extract all matched groups
                 groups = match.groups()
@@ -591,118 +651,126 @@ class CardStatsParser(CommandParserBase):
                     "CPU Idle (%)": int(groups[1]),
                     "CPU Usage (%)": int(groups[2]),
                     "Memory Utilization (%)": float(groups[3]),
-                    "Card Memory Used (KB)": format(int(groups[4]), ','),
-                    "Card Memory Peak (KB)": format(int(groups[5]), ','),
-                    "Card Memory Available (KB)": format(int(groups[6]), ','),
+                    "Card Memory Used (KB)": int(groups[4]),
+                    "Card Memory Peak (KB)": int(groups[5]),
+                    "Card Memory Available (KB)": int(groups[6]),
                     "Status": groups[7],
-                    "Uptime": groups[8],
+                    "Uptime": parse_uptime(groups[8]),
                     "Software Version": groups[9]
                 }
                 parsed_data.append(slot_data)
             
         return parsed_data
 
-    def parse(self, blocks, merge=True):
-        parsed_data = defaultdict(list)
-        for command_key, command_data in blocks.items():
-            result_dict = self.parse_card_stats(command_data['output'])
-            parsed_data[command_key].extend(result_dict)
-        return self.return_parsed_data(parsed_data, merge)
-    
-
-class OnuLineStatsParser(CommandParserBase):
-    command_keyword = 'ONU-Line-Stats'
+    def parse_block(self, command_key, command_data):
+        return self.parse_card_stats(command_data['output'])
     
-    def __init__(self):
-        super().__init__()
-        
-    def parse(self, blocks, merge=True):
-        section_pattern = re.compile(
-            r"shelf = (\d+),\s+slot = (\w+),\s*(?:port (\d+),)?\s*(?:channel = (\d+),)?\s*line type = (\w+)(.*?)(?=\n-{72}|\Z)",
-            re.DOTALL
-        )
-        sub_port_pattern = re.compile(r"(\d+)-(\d+)\s+(.*)")
 
-        parsed_data = defaultdict(list)
-
-        for command_key, command_data in blocks.items():
-            sections = section_pattern.findall(command_data['output'])
-            for shelf, slot, port, channel, line_type, statuses in sections:
-                if line_type != "ONU":
-                    continue  # Process only 'ONU' line types
-                
-                # Set default values for optional fields
-                port = port if port else "1"
-                channel = channel if channel else "0"
-
-                port_data = {
-                    'Shelf': shelf,
-                    'Slot': slot,
-                    'Port': port,
-                    'Channel': channel,
-                    'Line Type': line_type + " subport"
-                }
+class SubportStatusSectionScanner:
+    """
+    Splits ``showline`` output into per-port sections and routes each section by its
+    ``line type``.
+
+    ``showline *`` blocks are read by both the ONU and OLT line stats parsers, so
+    parse_shared_block scans such a block once and hands each parser its line type. The
+    scanner keeps no state and is shared like the parsers.
+    """
+
+    section_pattern = re.compile(
+        r"shelf = (\d+),\s+slot = (\w+),\s*(?:port (\d+),)?\s*(?:channel = (\d+),)?\s*line type = (\w+)(.*?)(?=\n-{72}|\Z)",
+        re.DOTALL
+    )
+    sub_port_pattern = re.compile(r"(\d+)-(\d+)\s+(.*)")
+
+    def __init__(self, line_types):
+        self.line_types = frozenset(line_types)
+
+    def scan(self, output):
+        routed = defaultdict(list)
+        for shelf, slot, port, channel, line_type, statuses in self.section_pattern.findall(output):
+            if line_type not in self.line_types:
+                continue
 
-                status_lines = statuses.strip().split('\n')[1:]  # Skip the 'subport' label line
-                for status_line in status_lines:
-                    if port_match := sub_port_pattern.search(status_line.strip()):
-                        start_subport, end_subport, status_string = port_match.groups()
-                        statuses = status_string.split()
-                        subport_range = int(end_subport) - int(start_subport) + 1
+            # Set default values for optional fields
+            port = port if port else "1"
+            channel = channel if channel else "0"
+
+            # One SubportStatus code per subport, see report.subport_status
+            codes = bytearray()
+            status_lines = statuses.strip().split('\n')[1:]  # Skip the 'subport' label line
+            for status_line in status_lines:
+                if port_match := self.sub_port_pattern.search(status_line.strip()):
+                    start_subport, end_subport, status_string = port_match.groups()
+                    start_subport = int(start_subport)
+                    if start_subport < 1:
+                        continue
+                    subport_range = int(end_subport) - start_subport + 1
+                    subport_statuses = status_string.split()[:max(subport_range, 0)]
+                    end = start_subport - 1 + len(subport_statuses)
+                    if end > len(codes):
+                        codes.extend(bytes(end - len(codes)))
+                    codes[start_subport - 1:end] = bytes(
+                        STATUS_CODES.get(status, SubportStatus.UNKNOWN) for status in subport_statuses
+                    )
+
+            routed[line_type].append({
+                'Shelf': shelf,
+                'Slot': slot,
+                'Port': port,
+                'Channel': channel,
+                'Line Type': line_type + " subport",
+                'Subport Status': bytes(codes),
+            })
+        return routed
 
-                        for i in range(subport_range):
-                            if i < len(statuses):
-                                port_data[str(int(start_subport) + i)] = statuses[i].strip()
 
-                parsed_data[command_key].append(port_data)
+class SubportLineStatsParser(CommandParserBase):
+    """
+    Common parser for the ONU and OLT sections of ``showline`` output.
 
-        return self.return_parsed_data(parsed_data, merge)
+    Each row carries the subport states packed under ``'Subport Status'``;
+    ``report.subport_status.expand_subport_status`` restores the one key per subport form.
+    """
 
-    
-class OLTLineStatsParser(CommandParserBase):
-    command_keyword = 'OLT-Line-Stats'
-    
-    def __init__(self):
-        super().__init__()
-        
-    def parse(self, blocks, merge=True):
-        section_pattern = re.compile(
-            r"shelf = (\d+),\s+slot = (\w+),\s*(?:port (\d+),)?\s*(?:channel = (\d+),)?\s*line type = (\w+)(.*?)(?=\n-{72}|\Z)",
-            re.DOTALL
-        )
-        sub_port_pattern = re.compile(r"(\d+)-(\d+)\s+(.*)")
+    line_type = None
+    section_scanner = SubportStatusSectionScanner(line_types=('ONU', 'OLT'))
 
-        parsed_data = defaultdict(list)
+    def parse_block(self, command_key, command_data):
+        return self.rows_from_sections(self.section_scanner.scan(command_data['output']))
 
-        for command_key, command_data in blocks.items():
-            sections = section_pattern.findall(command_data['output'])
-            for shelf, slot, port, channel, line_type, statuses in sections:
-                if line_type != "OLT":
-                    continue  # Process only 'ONU' line types
-                
-                # Set default values for optional fields
-                port = port if port else "1"
-                channel = channel if channel else "0"
-
-                port_data = {
-                    'Shelf': shelf,
-                    'Slot': slot,
-                    'Port': port,
-                    'Channel': channel,
-                    'Line Type': line_type + " subport"
-                }
+    def rows_from_sections(self, routed):
+        """Picks this parser's rows from the sections a SubportStatusSectionScanner routed."""
+        return routed.get(self.line_type, [])
 
-                status_lines = statuses.strip().split('\n')[1:]  # Skip the 'subport' label line
-                for status_line in status_lines:
-                    if port_match := sub_port_pattern.search(status_line.strip()):
-                        start_subport, end_subport, status_string = port_match.groups()
-                        statuses = status_string.split()
-                        subport_range = int(end_subport) - int(start_subport) + 1
 
-                        for i in range(subport_range):
-                            if i < len(statuses):
-                                port_data[str(int(start_subport) + i)] = statuses[i].strip()
+class OnuLineStatsParser(SubportLineStatsParser):
+    command_keyword = 'ONU-Line-Stats'
+    line_type = 'ONU'
 
-                parsed_data[command_key].append(port_data)
 
-        return self.return_parsed_data(parsed_data, merge)
\ No newline at end of file
+class OLTLineStatsParser(SubportLineStatsParser):
+    command_keyword = 'OLT-Line-Stats'
+    line_type = 'OLT'
+
+
+def parse_shared_block(parsers, command_key, command_data):
+    """
+    Parses one block read by several parsers and returns the rows of each, in parser
+    order. Parsers sharing a section scanner get their rows from a single scan of the
+    block, which is forgotten once this returns.
+    """
+    scans = {}
+    parsed = []
+    for parser in parsers:
+        scanner = parser.section_scanner
+        if scanner is None:
+            parsed.append(parser.parse_block_memoized(command_key, command_data))
+            continue
+        if scanner not in scans:
+            scans[scanner] = scanner.scan(command_data['output'])
+        parsed.append(parser.rows_from_sections(scans[scanner]))
+    return parsed
+
+
+# Prebuilt factory holding one shared instance of every registered parser
+parser_factory = ParserFactory.from_registry(CommandParserBase.registry)
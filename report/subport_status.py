@@ -0,0 +1,67 @@
+from enum import IntEnum
+
+
+class SubportStatus(IntEnum):
+    """
+    States reported per subport in the ``showline`` ONU and OLT sections.
+
+    A port's states are packed into one byte per subport: byte ``i`` holds the code of
+    subport ``i + 1``, and ``ABSENT`` marks a subport missing from the output. Tokens
+    outside this enum are stored as ``UNKNOWN``.
+    """
+
+    ABSENT = 0
+    ACT = 1
+    OOS = 2
+    NONE = 3
+    DSA = 4
+    ADN = 5
+    TST = 6
+    INIT = 7
+    UNKNOWN = 255
+
+
+STATUS_CODES = {status.name: status.value for status in SubportStatus if status.name not in ('ABSENT', 'UNKNOWN')}
+STATUS_NAMES = {status.value: status.name for status in SubportStatus}
+
+# bytes.translate tables turning packed codes into '1'/'0' digits, one per status
+_BITMAP_TABLES = {
+    status: bytes(0x31 if code == status else 0x30 for code in range(256))
+    for status in SubportStatus
+}
+
+
+def pack_statuses(statuses):
+    """
+    Packs the dict form produced by the parsers before (``{'1': 'ACT', '2': 'OOS', ...}``).
+    Non-numeric keys such as ``'Shelf'`` are ignored, so a whole legacy row can be passed.
+    """
+    subports = {int(key): status for key, status in statuses.items() if key.isdigit() and int(key) > 0}
+    codes = bytearray(max(subports, default=0))
+    for subport, status in subports.items():
+        codes[subport - 1] = STATUS_CODES.get(status, SubportStatus.UNKNOWN)
+    return bytes(codes)
+
+
+def unpack_statuses(codes):
+    """Expands packed codes back to the ``{'1': 'ACT', ...}`` dict form."""
+    return {str(subport): STATUS_NAMES[code] for subport, code in enumerate(bytes(codes), start=1) if code}
+
+
+def status_bitmap(codes, status=SubportStatus.ACT):
+    """Bitmap with bit ``i`` set when subport ``i + 1`` is in ``status``."""
+    digits = bytes(codes).translate(_BITMAP_TABLES[status])
+    return int(digits[::-1], 2) if digits else 0
+
+
+def count_status(codes, status=SubportStatus.ACT):
+    """Number of subports in ``status``, as the popcount of their bitmap."""
+    # bin().count rather than int.bit_count, which needs Python 3.10
+    return bin(status_bitmap(codes, status)).count('1')
+
+
+def expand_subport_status(row, field='Subport Status'):
+    """Returns a copy of a parsed row with the packed codes replaced by one key per subport."""
+    row = dict(row)
+    row.update(unpack_statuses(row.pop(field, b'')))
+    return row
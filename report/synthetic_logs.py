@@ -0,0 +1,170 @@
+import os
+
+# Metric lines emitted by "rcom <slot> gpononuponstat showall <port>" for every ONU.
+GPON_ONU_METRICS = [
+    "Upstream Bip Errors", "Upstream Bip UNits", "FEC Corrected Bytes", "FEC Corrected codewords",
+    "FEC Uncorrected codewords", "Total received codewords", "received bytes", "received packets",
+    "transmitted bytes", "transmitted packets", "Unreceived bursts", "BIP Error", "Remote BIP Error",
+    "Drift of Window Indications", "Message Error Message",
+]
+
+LINE_CARD_TYPE = "MXK-LC-GP16, LINE CARD W/ 16 GPON"
+SECTION_SEPARATOR = '-' * 72
+
+
+class SyntheticLogWriter:
+    """
+    Writes synthetic MXK 1419 health check logs shaped like the collector output in
+    ``sample_files/dgx-log.txt``. Used by the benchmark management commands to build
+    logs of arbitrary size without shipping large fixtures.
+
+    Larger targets are reached by adding line card slots, so command lines stay unique
+    and the result looks like a (very) large multi-slot chassis.
+    """
+
+    def __init__(self, pon_ports=16, onus_per_port=64, alarms=200):
+        self.pon_ports = pon_ports
+        self.onus_per_port = onus_per_port
+        self.alarms = alarms
+
+    def header(self):
+        return (
+            "login: admin\n"
+            "password: \n"
+            "KANO_MASTER> setprompt session AUTO>\n"
+            "Prompt set to AUTO>\n"
+            "AUTO> setline 0\n"
+            "0 was entered, setting continuous scroll mode.\n"
+            "AUTO> eeshow backplane\n"
+            "EEPROM contents: for slot 0\n"
+            "EEPROM_ID   : 06 -- BACKPLANE \n"
+            "Version     : 01\n"
+            "Size        : 054\n"
+            "CardType    : 20702 -- BACKPLANE_MXK_1419 \n"
+            "CardVersion : 800-03425-01-A\n"
+            "SerialNum   : 14980440\n"
+            "ShelfNumber : 00001\n"
+            "CLEI Code   : No CLEI   \n"
+            "Cksum       : 0x4EFB\n"
+            "Feature bits modification date: 3/12/2024 14:46:31\n"
+        )
+
+    def alarm_show(self, page_rows=None):
+        """``alarm show`` output, repeating the header block every ``page_rows`` alarms."""
+        table_header = [
+            "ResourceId                AlarmType                                 AlarmSeverity",
+            "----------                ---------                                 -------------",
+        ]
+        lines = [
+            "AUTO> alarm show",
+            "************    Central Alarm Manager    ************",
+            f"ActiveAlarmCurrentCount\t\t:{self.alarms}",
+            *table_header,
+        ]
+        for i in range(self.alarms):
+            if page_rows and i and i % page_rows == 0:
+                lines.extend(table_header)
+            resource = f"1-{i % 16 + 1}-{i % 64 + 1}-0/gponolt"
+            lines.append(f"{resource:<26}{'linkDown':<45}critical  ")
+        return '\n'.join(lines) + '\n'
+
+    def slots_summary(self, slots):
+        lines = ["AUTO> slots", "MXK 1419 ", "Line Cards"]
+        lines.extend(f"{slot}: {LINE_CARD_TYPE} (RUNNING)" for slot in slots)
+        return '\n'.join(lines) + '\n'
+
+    def slot_section(self, slot):
+        lines = [
+            f"AUTO> slots {slot}",
+            "MXK 1419 ",
+            f"Type            : {LINE_CARD_TYPE}",
+            "Card Version    : 800-03450-04-A",
+            f"Serial #        : {15000000 + slot}",
+            "Shelf           : 1",
+            f"Slot            : {slot}",
+            "ROM Version     : MXK 3.4.2.144.007",
+            "Software Version: MXK 3.4.2.272",
+            "State           : RUNNING",
+            "Mode            : FUNCTIONAL",
+            "Uptime          : 3 days, 16 hours, 14 minutes",
+            f"AUTO> showfataldata {slot}",
+            "No Bootrom fatal record exists",
+            "End of fatal record",
+            f"AUTO> romversion {slot}",
+            "MXK 3.4.2.144.007",
+            "Aug  5 2022, 12:32:34",
+            f"AUTO> showline {slot}",
+            "Search in progress .........",
+        ]
+        for port in range(1, self.pon_ports + 1):
+            lines.append(SECTION_SEPARATOR)
+            lines.append(f"shelf = 1,  slot = {slot}, port {port}, line type = ONU")
+            lines.append("subport")
+            lines.extend(self.subport_rows(self.onus_per_port, active=port % 4))
+        lines.append(SECTION_SEPARATOR)
+        lines.append(f"shelf = 1,  slot = {slot}, line type = OLT")
+        lines.append("line")
+        lines.extend(self.subport_rows(self.pon_ports, active=self.pon_ports // 2))
+        for port in range(1, self.pon_ports + 1):
+            lines.append(f"AUTO> sfp show 1/{slot}/{port}/0/gponolt")
+            lines.append(f"SFP Data for interface 1-{slot}-{port}-0/gponolt")
+            lines.append("vendorName                               Ligent          ")
+            lines.append("vendorOui                                00-01-47")
+            lines.append("vendorPartNumber                         LTE3680M-BH     ")
+            lines.append("vendorRevisionLevel                      3.8 ")
+            lines.append(f"serialNumber                             LIG{slot:05d}{port:04d}  ")
+            lines.append("manufacturingDateCode                    210622")
+            lines.append("connectorType                            sc (1)")
+            lines.append("transceiverType                          sfp (3)")
+            lines.append("nineTo125mmFiberLinkLengthKm             20")
+            lines.append("nineTo125mmFiberLinkLength100m           200")
+            lines.append("nominalBitRate                           25")
+        for port in range(1, self.pon_ports + 1):
+            lines.append(f"AUTO> rcom {slot} gpononuponstat showall {port}")
+            lines.append(f"gpononuponstat showall {port}")
+            for onu in range(1, self.onus_per_port + 1):
+                for offset, metric in enumerate(GPON_ONU_METRICS):
+                    lines.append(f"{f'ONU({onu}) {metric}:':<41}{(slot * onu + offset) * 1013}")
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def subport_rows(count, active=0):
+        rows = []
+        for start in range(1, count + 1, 12):
+            end = min(start + 11, count)
+            states = ''.join('ACT  ' if n <= active else 'OOS  ' for n in range(start, end + 1))
+            rows.append(f"{start}-{start + 11}    {states}")
+        return rows
+
+    def card_stats(self, slots):
+        lines = [
+            "AUTO> card stats all",
+            "-------------- cpu % utilization ------------  -------- memory (KB)----------  Card Memory       uptime",
+            "slot  idle usage  high   services framework   low    % Used Total   Peak    Avail      Status       ddd:hh:mm:ss   s/w version",
+        ]
+        for slot in slots:
+            lines.append(
+                f"{slot}    87    13      4       1         6        3     23.68  756571  179250  577409  "
+                f"1 - OK           3:16:03:57  MXK 3.4.2.272"
+            )
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path, target_size):
+        """
+        Writes a single chassis log to ``path`` with enough line card slots for the file
+        to reach roughly ``target_size`` bytes.
+
+        Returns:
+            int: The size of the written file in bytes.
+        """
+        slot_size = len(self.slot_section(1))
+        slot_count = max(1, -(-target_size // slot_size))
+        slots = range(1, slot_count + 1)
+        with open(path, 'w', encoding='ISO-8859-1') as file:
+            file.write(self.header())
+            file.write(self.alarm_show())
+            file.write(self.slots_summary(slots))
+            file.write(self.card_stats(slots))
+            for slot in slots:
+                file.write(self.slot_section(slot))
+        return os.path.getsize(path)
@@ -0,0 +1,239 @@
+import contextlib
+import datetime
+import gzip
+import os
+import pickle
+import re
+import shutil
+
+from celery import chord, shared_task
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+from report_data.ingestion_libs import batched
+from report_data.ingestion_registry import ingestion_registry
+from report_data.models import Node
+
+from .libs import (
+    finish_run, generate_word_report, ingest_command, log_collected_at, node_ip_address, parsed_log_output,
+    process_log, start_run,
+)
+from .log_reader import is_log_archive, iter_archive_logs, log_file_name
+from .models import NodeLease, ProcessingJob
+
+
+def spool_path(job, command):
+    """File the parse stage leaves a command's rows in for its ingest stage."""
+    return os.path.join(job.work_dir, re.sub(r'\W+', '_', command) + '.pickle.gz')
+
+
+def write_spool(file, rows):
+    for batch in batched(rows, settings.INGESTION_BATCH_SIZE):
+        pickle.dump(batch, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def read_spool(job, command):
+    with gzip.open(spool_path(job, command), 'rb') as file:
+        while True:
+            try:
+                yield from pickle.load(file)
+            except EOFError:
+                return
+
+
+def start_processing(file_upload):
+    """
+    Queues the processing of an uploaded log and returns its ProcessingJob, of which a
+    log has one per checksum. A job that is queued, running or done is left as it is;
+    a failed one, or a running one gone stale (see ProcessingJob.is_stale), is resumed
+    from the stages it completed. The task is sent once the job is committed, so a
+    worker never looks for a job it cannot see yet.
+
+    The tasks are acknowledged late, so one lost with its worker is delivered again;
+    they skip the stages that already succeeded.
+    """
+    job, created = ProcessingJob.objects.get_or_create(
+        checksum=file_upload.checksum, defaults={'file_upload': file_upload},
+    )
+    if created or job.reset_resumable():
+        task = ingest_log_archive if is_log_archive(file_upload.file_path.name) else parse_log
+        transaction.on_commit(lambda: task.delay(job.pk))
+    return job
+
+
+def spool_commands(job, log_filepath, checksum):
+    """
+    Parses a log into one spool file per command with an ingestion method and returns
+    those commands in the order they first came. Streamed output has a command in as
+    many ``(command, rows)`` pairs as it has groups of blocks, so each spool is opened
+    once and every group of its command is written into it.
+    """
+    spools = {}
+    streaming = settings.REPORT_PARSE_WORKERS <= 1
+    os.makedirs(job.work_dir, exist_ok=True)
+    with contextlib.ExitStack() as stack:
+        _, output = stack.enter_context(parsed_log_output(log_filepath, checksum, streaming))
+        for command, rows in (output if streaming else output.items()):
+            if not ingestion_registry.get_ingestion_method(command):
+                continue
+            if command not in spools:
+                spools[command] = stack.enter_context(
+                    gzip.open(spool_path(job, command), 'wb', compresslevel=3)
+                )
+            write_spool(spools[command], rows)
+    return list(spools)
+
+
+@shared_task(bind=True, acks_late=True)
+def parse_log(self, job_id):
+    """
+    Parses the log of a job into one spool file per command, records its HealthCheckRun
+    and fans the commands out to ingest_log_command tasks, joined by a chord whose
+    callback renders the report.
+
+    The job first takes the NodeLease of its node and holds it until it succeeds or
+    fails, so logs of one node are ingested in turn; while another job holds it, the
+    task is retried. Stages that already succeeded, e.g. before a resumed job failed,
+    are skipped, their spool files being kept until the job succeeds.
+    """
+    job = ProcessingJob.objects.select_related('file_upload').get(pk=job_id)
+    if job.status in (ProcessingJob.SUCCEEDED, ProcessingJob.FAILED):
+        return
+    file_upload = job.file_upload
+    log_filepath = file_upload.file_path.path
+    ip_address = node_ip_address(log_file_name(log_filepath))
+    if not NodeLease.acquire(ip_address, job.holder):
+        raise self.retry(countdown=settings.NODE_LEASE_RETRY_SECONDS, max_retries=None)
+
+    try:
+        if not job.stage_succeeded('parse'):
+            with job.stage('parse'):
+                commands = spool_commands(job, log_filepath, file_upload.checksum)
+                job.run = start_run(
+                    log_file_name(log_filepath), file_upload.checksum, log_collected_at(log_filepath), file_upload,
+                )
+                job.save(update_fields=['run'])
+                job.update_stage('parse', commands=commands)
+    except Exception:
+        NodeLease.release(ip_address, job.holder)
+        raise
+
+    pending = [command for command in job.stages['parse']['commands'] if not job.stage_succeeded(f"ingest {command}")]
+    if not pending:
+        render_log_report.delay(job_id)
+        return
+    # Once a command fails the callback never runs, and its error callback releases the
+    # lease after the other commands have finished
+    callback = render_log_report.si(job_id).on_error(release_job_lease.si(job_id))
+    try:
+        chord(ingest_log_command.si(job_id, command) for command in pending)(callback)
+    except Exception:
+        # The chord could not be sent, or ran eagerly and failed; no command runs any more
+        NodeLease.release(ip_address, job.holder)
+        raise
+
+
+@shared_task(acks_late=True)
+def ingest_log_command(job_id, command):
+    """
+    Ingests the spooled rows of one command of a job, renewing the lease on its node. A
+    failed command leaves the lease to the chord's error callback, release_job_lease,
+    as the other commands of the job may still be ingesting.
+    """
+    job = ProcessingJob.objects.select_related('run').get(pk=job_id)
+    name = f"ingest {command}"
+    if job.stage_succeeded(name):
+        return
+    ip_address = job.run.node_id
+    with job.stage(name):
+        if not NodeLease.renew(ip_address, job.holder):
+            raise RuntimeError(f"The lease on node {ip_address} expired and was taken over")
+        result = ingest_command(job.run, command, read_spool(job, command))
+        if result is not None:
+            job.update_stage(name, model=result.model._meta.label, failed=len(result.failures))
+
+
+@shared_task(acks_late=True)
+def release_job_lease(job_id):
+    """Error callback of a job's ingest chord: releases the lease on its node."""
+    job = ProcessingJob.objects.select_related('run').get(pk=job_id)
+    NodeLease.release(job.run.node_id, job.holder)
+
+
+@shared_task(acks_late=True)
+def render_log_report(job_id):
+    """
+    Finishes the run of a job once every command is ingested, renders its Word report
+    and releases the lease on its node.
+    """
+    job = ProcessingJob.objects.select_related('file_upload', 'run').get(pk=job_id)
+    if job.stage_succeeded('render'):
+        return
+    try:
+        with job.stage('render', final=True):
+            # A command whose ingestion raised ValueError records no model, so its rows stay
+            stages = [stage for stage in job.stages.values() if 'model' in stage]
+            failed = {stage['model'] for stage in stages if stage['failed']}
+            finish_run(job.run, [
+                apps.get_model(model) for model in dict.fromkeys(stage['model'] for stage in stages) if model not in failed
+            ])
+            file_name = log_file_name(job.file_upload.file_path.path)
+            timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+            generate_word_report(
+                f"report_{file_name}_{timestamp}.docx",
+                nodes=Node.objects.filter(ip_address=node_ip_address(file_name)),
+            )
+        shutil.rmtree(job.work_dir, ignore_errors=True)
+    finally:
+        NodeLease.release(job.run.node_id, job.holder)
+
+
+@shared_task(bind=True, acks_late=True)
+def ingest_log_archive(self, job_id):
+    """
+    Ingests every log in an uploaded .zip or .tar(.gz) archive as its own node log, one
+    'ingest <member>' stage each, then renders one report for the nodes ingested. Each
+    member is parsed as it is decompressed out of the archive and checksummed on the
+    way (see process_log); neither the archive nor its members are written to disk.
+
+    Each member is ingested under the job's lease on its node; while another job holds
+    it, the task is retried like parse_log, skipping the members ingested before. A
+    member that fails is recorded in its stage and the others are still ingested and
+    reported; the job then ends failed, and resuming it ingests only the failed members.
+    """
+    job = ProcessingJob.objects.select_related('file_upload').get(pk=job_id)
+    if job.status in (ProcessingJob.SUCCEEDED, ProcessingJob.FAILED):
+        return
+    archive_path = job.file_upload.file_path.path
+    ip_addresses, failed = [], []
+    for member in iter_archive_logs(archive_path):
+        file_name = log_file_name(member.name)
+        ip_address = node_ip_address(file_name)
+        name = f"ingest {member.name}"
+        if not job.stage_succeeded(name):
+            if not NodeLease.acquire(ip_address, job.holder):
+                raise self.retry(countdown=settings.NODE_LEASE_RETRY_SECONDS, max_retries=None)
+            with job.stage(name, fatal=False):
+                # process_log keeps the job's lease while it ingests the member and then releases it
+                stats = process_log(
+                    member.file, file_name, member.collected_at, member.size, create_report=False,
+                    file_upload=job.file_upload, holder=job.holder,
+                )
+                job.update_stage(name, rows=stats['rows'])
+        if job.stage_succeeded(name):
+            ip_addresses.append(ip_address)
+        else:
+            # In case the member failed before process_log took over the lease
+            NodeLease.release(ip_address, job.holder)
+            failed.append(name)
+
+    with job.stage('render', final=not failed):
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        generate_word_report(
+            f"report_{log_file_name(archive_path)}_{timestamp}.docx",
+            nodes=Node.objects.filter(ip_address__in=ip_addresses),
+        )
+    if failed:
+        # The job's error names the first member that failed
+        job.update_stage(failed[0], ProcessingJob.FAILED)
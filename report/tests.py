@@ -1,3 +1,820 @@
-from django.test import TestCase
+import ast
+import gzip
+import hashlib
+import io
+import itertools
+import os
+import shutil
+import tarfile
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from report_data.models import Alarms, GponOnuStats, HealthCheckRun, NodeSummary
+from report_generator.celery import app as celery_app
+
+from .block_memo import BlockResultMemo
+from .command_matcher import CommandPatternMatcher
+from .libs import (
+    ingest_command, load_command_patterns, parse_commands, parsed_log_output, process_data, process_log,
+)
+from .log_reader import (
+    LOG_ENCODING, MODE_BUFFERED, MODE_INDEXED, MODE_STREAMING, LogParser, block_index_path, iter_archive_logs,
+    open_archive_member,
+)
+from .models import FileUpload, NodeLease, ProcessingJob
+from .parallel_parsing import group_shared_commands, parse_commands_parallel, parse_task
+from .parse_cache import PARSER_CODE_MODULES, ParseCache
+from .parser_factory import ParserFactory
+
+from .parsers import (
+    AlarmParser, CardStatsParser, ColumnBasedParser, CommandParserBase, GponOnuStatusParser, OLTLineStatsParser,
+    OnuLineStatsParser, parse_shared_block, parser_factory,
+)
+from .subport_status import SubportStatus, count_status, expand_subport_status, pack_statuses, unpack_statuses
+from .synthetic_logs import SyntheticLogWriter
+from .tasks import ingest_log_command, release_job_lease, start_processing
+from .uptime import parse_uptime
 
 # Create your tests here.
+
+
+def alarm_output(alarms, page_rows=None):
+    """``alarm show`` block output as handed to the parsers, without the command line."""
+    return SyntheticLogWriter(alarms=alarms).alarm_show(page_rows).split('\n', 1)[1]
+
+
+def linear_match(command_key_to_fetch_pattern, command_line):
+    """The base commands of a command line by the linear scan LogParser used before CommandPatternMatcher."""
+    return [
+        base_command for base_command, pattern_list in command_key_to_fetch_pattern.items()
+        if any(command_line == pattern or command_line.startswith(pattern[:-1]) for pattern in pattern_list)
+    ]
+
+
+class CommandPatternMatcherTests(SimpleTestCase):
+    command_lines = [
+        '', 'slots', 'slots 3', 'slot', 'slotsx', 'alarm show', 'alarm showall', 'alarm', 'showline 1/3/2',
+        'showline', 'showlinex', 'rcom 4 gpononuponstat showall 2', 'rcom', 'card stats all', 'card stats',
+        'eeshow backplane', 'eeshow backplanes', 'sfp show 1/1/1/0/gponolt', 'romversion 3', 'unknown command',
+    ]
+
+    def assert_matches_linear_scan(self, patterns):
+        matcher = CommandPatternMatcher(patterns)
+        for command_line in self.command_lines:
+            self.assertEqual(matcher.match(command_line), linear_match(patterns, command_line), command_line)
+
+    def test_command_patterns_yaml(self):
+        self.assert_matches_linear_scan(dict(load_command_patterns()))
+
+    def test_wildcard_and_exact_patterns(self):
+        # An exact pattern matches on its prefix minus the last character too, as it always has
+        self.assert_matches_linear_scan({'Slots': ['slots'], 'Slot Detail': ['slots *'], 'Alarms': ['alarm show']})
+
+    def test_overlapping_prefixes(self):
+        self.assert_matches_linear_scan({
+            'Lines': ['showline *'],
+            'Line Stats': ['showline *', 'show *'],
+            'Shows': ['show*'],
+            'Everything': ['*'],
+            'Card': ['card stats all', 'card *'],
+        })
+
+
+class ColumnBasedParserTests(SimpleTestCase):
+    alarms = 100_000
+
+    def expected_row(self, i):
+        return {
+            'ResourceId': f"1-{i % 16 + 1}-{i % 64 + 1}-0/gponolt",
+            'AlarmType': 'linkDown',
+            'AlarmSeverity': 'critical',
+        }
+
+    def test_large_alarm_table(self):
+        rows = AlarmParser().parse_block('alarm show', {'output': alarm_output(self.alarms)})
+
+        self.assertEqual(len(rows), self.alarms)
+        for i in (0, 1, self.alarms // 2, self.alarms - 1):
+            self.assertEqual(rows[i], self.expected_row(i))
+
+    def test_repeated_header_blocks(self):
+        single = ColumnBasedParser().parse(alarm_output(self.alarms))
+        paged = ColumnBasedParser().parse(alarm_output(self.alarms, page_rows=1000))
+
+        self.assertEqual(paged, single)
+
+    def test_tables_with_different_layouts(self):
+        text = (
+            "Slot  State\n"
+            "----  -----\n"
+            "1     RUNNING\n"
+            "\n"
+            "ResourceId        AlarmSeverity\n"
+            "----------        -------------\n"
+            "1-1-6-0/gponolt   critical\n"
+        )
+        self.assertEqual(list(ColumnBasedParser().parse_iter(text)), [
+            {'Slot': '1', 'State': 'RUNNING'},
+            {'ResourceId': '1-1-6-0/gponolt', 'AlarmSeverity': 'critical'},
+        ])
+
+    def test_without_headers(self):
+        self.assertEqual(ColumnBasedParser().parse("no table here\n"), [])
+
+
+class GponOnuStatusParserTests(SimpleTestCase):
+    def test_rows_keep_output_order_and_full_counters(self):
+        output = (
+            "gpononuponstat showall 2\n"
+            "ONU(12) received bytes:       18446744073709551615\n"
+            "ONU(3) received bytes:        120\n"
+            "ONU(12) BIP Error:            9\n"
+            "ONU(3) Unknown Counter:       5\n"
+        )
+
+        rows = GponOnuStatusParser().parse_block('rcom 4 gpononuponstat showall 2', {'output': output})
+
+        self.assertEqual(rows, [
+            {'Slot': '4-2', 'Sub Port': 'ONU(12)', 'received bytes': 2 ** 64 - 1, 'BIP Error': 9},
+            {'Slot': '4-2', 'Sub Port': 'ONU(3)', 'received bytes': 120},
+        ])
+
+
+class SubportStatusTests(SimpleTestCase):
+    showline_output = (
+        "shelf = 1,  slot = 3, port 2, line type = ONU\n"
+        "subport\n"
+        "1-12    ACT  OOS  ACT  NONE DSA  ADN  OOS  OOS  OOS  OOS  OOS  OOS  \n"
+        "13-24    ACT  OOS  \n"
+    )
+
+    def test_parsed_rows_round_trip(self):
+        row, = OnuLineStatsParser().parse_block('showline 3', {'output': self.showline_output})
+        statuses = unpack_statuses(row['Subport Status'])
+
+        self.assertEqual(len(statuses), 14)
+        self.assertEqual(statuses['4'], 'NONE')
+        self.assertEqual(statuses['13'], 'ACT')
+        self.assertEqual(pack_statuses(expand_subport_status(row)), row['Subport Status'])
+        self.assertEqual(count_status(row['Subport Status'], SubportStatus.ACT), 3)
+
+    def test_shared_block_is_scanned_once(self):
+        output = self.showline_output + '-' * 72 + "\nshelf = 1,  slot = 3, port 2, line type = OLT\nsubport\n1-2    ACT  OOS\n"
+        onu_parser, olt_parser = OnuLineStatsParser(), OLTLineStatsParser()
+        scanner = onu_parser.section_scanner
+
+        with mock.patch.object(scanner, 'scan', wraps=scanner.scan) as scan:
+            onu_rows, olt_rows = parse_shared_block([onu_parser, olt_parser], 'showline 3', {'output': output})
+
+        self.assertEqual(scan.call_count, 1)
+        self.assertEqual(onu_rows, onu_parser.parse_block('showline 3', {'output': output}))
+        self.assertEqual([row['Line Type'] for row in olt_rows], ['OLT subport'])
+        self.assertEqual(unpack_statuses(olt_rows[0]['Subport Status']), {'1': 'ACT', '2': 'OOS'})
+
+    def test_unknown_and_missing_subports(self):
+        codes = pack_statuses({'1': 'ACT', '3': 'XYZ'})
+
+        self.assertEqual(codes, bytes([SubportStatus.ACT, SubportStatus.ABSENT, SubportStatus.UNKNOWN]))
+        self.assertEqual(unpack_statuses(codes), {'1': 'ACT', '3': 'UNKNOWN'})
+
+
+class NativeValueTests(SimpleTestCase):
+    def test_uptime_forms(self):
+        self.assertEqual(parse_uptime('149:12:05:49'), timedelta(days=149, hours=12, minutes=5, seconds=49))
+        self.assertEqual(parse_uptime('3 days, 16 hours, 14 minutes'), timedelta(days=3, hours=16, minutes=14))
+        self.assertEqual(parse_uptime('1 day, 1 hour, 1 minute'), timedelta(days=1, hours=1, minutes=1))
+        self.assertIsNone(parse_uptime(None))
+        self.assertIsNone(parse_uptime('unknown'))
+
+    def test_card_stats_are_numbers(self):
+        output = SyntheticLogWriter().card_stats(['1']).split('\n', 1)[1]
+
+        row, = CardStatsParser().parse_block('card stats all', {'output': output})
+
+        self.assertEqual(row['Card Memory Used (KB)'], 756571)
+        self.assertEqual(row['Uptime'], timedelta(days=3, hours=16, minutes=3, seconds=57))
+
+
+class BlockResultMemoTests(SimpleTestCase):
+    output = SubportStatusTests.showline_output
+
+    def setUp(self):
+        store_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(store_dir.cleanup)
+        self.store_path = os.path.join(store_dir.name, 'memo.sqlite3')
+        self.memo = BlockResultMemo(max_bytes=64 * 1024, store_path=self.store_path)
+        memo_override = mock.patch.object(CommandParserBase, 'block_memo', self.memo)
+        memo_override.start()
+        self.addCleanup(memo_override.stop)
+
+    def parse(self, output=None):
+        return OnuLineStatsParser().parse_block_memoized('showline 3', {'output': output or self.output})
+
+    def test_identical_blocks_are_parsed_once(self):
+        rows = self.parse()
+        with mock.patch.object(OnuLineStatsParser, 'parse_block') as parse_block:
+            self.assertEqual(self.parse(), rows)
+        parse_block.assert_not_called()
+        self.assertEqual((self.memo.hits, self.memo.misses), (1, 1))
+
+        # Rows are decoded afresh on every hit, with their bytes and timedelta values
+        self.parse()[0]['Slot'] = 'changed'
+        self.assertEqual(self.parse(), rows)
+        self.assertIsInstance(rows[0]['Subport Status'], bytes)
+        uptime_rows = [{'Uptime': timedelta(days=3, seconds=5)}]
+        self.memo.put('uptime', uptime_rows)
+        self.assertEqual(self.memo.get('uptime'), uptime_rows)
+
+    def test_changed_output_or_parser_code_misses(self):
+        self.parse()
+        self.parse(self.output.replace('ACT  OOS  \n', 'OOS  OOS  \n'))
+        with mock.patch('report.block_memo.parser_code_version', return_value='edited'):
+            self.parse()
+        self.assertEqual((self.memo.hits, self.memo.misses), (0, 3))
+
+    def test_memory_is_capped_in_bytes(self):
+        self.memo.max_bytes = 200
+        for slot in range(20):
+            self.memo.put(f"block {slot}", [{'Slot': str(slot)}])
+        self.assertLessEqual(self.memo.size, 200)
+        self.assertLess(len(self.memo.entries), 20)
+        self.assertIn('block 19', self.memo.entries)
+
+    def test_store_is_shared_and_evicted(self):
+        rows = self.parse()
+        other_process = BlockResultMemo(max_bytes=64 * 1024, store_path=self.store_path)
+        self.assertEqual(other_process.get(self.memo.key(OnuLineStatsParser(), 'showline 3', self.output)), rows)
+
+        self.memo.store_max_bytes = 1000
+        for slot in range(50):
+            self.memo.put(f"block {slot}", [{'Slot': str(slot), 'Padding': os.urandom(32)}])
+        self.assertLessEqual(self.memo.store_size(), 1000)
+        self.assertIsNotNone(other_process.get('block 49'))
+        self.memo.clear()
+        self.assertIsNone(self.memo.get('block 0'))
+
+
+class ParseCacheTests(SimpleTestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        self.cache = ParseCache(self.cache_dir, max_bytes=10 * 1024 ** 2)
+
+    def test_stored_output_is_loaded(self):
+        key = self.cache.key('checksum', 'patterns')
+        output = {'Alarms': [{'AlarmSeverity': 'critical'}], 'Card Stats': []}
+        self.cache.store(key, output, 'checksum', complete=False)
+
+        self.assertEqual(self.cache.load(key), output)
+        self.assertEqual(list(self.cache.load_iter(key)), list(output.items()))
+        self.assertIsNone(self.cache.load(key, require_complete=True))
+        self.assertIsNone(self.cache.load(self.cache.key('other checksum', 'patterns')))
+
+    def test_key_changes_with_patterns_and_parser_code(self):
+        key = self.cache.key('checksum', 'patterns')
+
+        self.assertNotEqual(self.cache.key('checksum', 'edited patterns'), key)
+        with mock.patch('report.parse_cache.parser_code_version', return_value='edited'):
+            self.assertNotEqual(self.cache.key('checksum', 'patterns'), key)
+
+    def test_unreadable_entry_is_discarded(self):
+        key = self.cache.key('checksum', 'patterns')
+        self.cache.path(key).write_bytes(b'not gzip')
+
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            self.assertIsNone(self.cache.load(key))
+        self.assertFalse(self.cache.path(key).exists())
+
+    def test_least_recently_used_entries_are_evicted(self):
+        keys = [self.cache.key(f"checksum {i}", 'patterns') for i in range(3)]
+        for written_at, key in enumerate(keys, start=1000):
+            self.cache.store(key, {'Alarms': [{'Id': key}]}, key, complete=True)
+            os.utime(self.cache.path(key), (written_at, written_at))
+        self.cache.load(keys[0])  # Read last, so kept although it was written first
+        self.cache.max_bytes = sum(self.cache.path(key).stat().st_size for key in (keys[0], keys[2]))
+
+        self.assertEqual(self.cache.evict(), [keys[1]])
+        self.assertEqual(sorted(entry['key'] for entry in self.cache.entries()), sorted([keys[0], keys[2]]))
+
+    def test_second_parse_of_a_log_is_served_from_the_cache(self):
+        log_path = os.path.join(self.cache_dir, 'log_192.0.2.7.txt')
+        SyntheticLogWriter(pon_ports=1, onus_per_port=2, alarms=3).write(log_path, 20_000)
+
+        with override_settings(PARSE_CACHE_ENABLED=True, PARSE_CACHE_DIR=self.cache_dir), \
+                mock.patch('sys.stdout', new_callable=StringIO):
+            with parsed_log_output(log_path, streaming=False, create_excel=True) as (_, parsed):
+                pass
+            with mock.patch.object(LogParser, 'parse', side_effect=AssertionError('parsed again')):
+                with parsed_log_output(log_path, streaming=False, create_excel=True) as (_, cached):
+                    pass
+
+        self.assertEqual(cached, parsed)
+
+    def test_parser_code_version_covers_imported_modules(self):
+        report_dir = os.path.dirname(__file__)
+        for module in PARSER_CODE_MODULES:
+            with open(os.path.join(report_dir, module)) as source:
+                tree = ast.parse(source.read())
+            imported = {f"{node.module}.py" for node in ast.walk(tree) if isinstance(node, ast.ImportFrom) and node.level}
+            self.assertLessEqual(imported, set(PARSER_CODE_MODULES), module)
+
+
+@override_settings(PARSE_CACHE_ENABLED=False, LOG_PARSER_MODE=MODE_STREAMING)
+class StreamedParsingTests(SimpleTestCase):
+    def setUp(self):
+        logs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(logs_dir.cleanup)
+        self.log_path = os.path.join(logs_dir.name, 'log_192.0.2.7.txt')
+        SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5).write(self.log_path, 200_000)
+
+    def test_blocks_are_not_collected(self):
+        log_parser = LogParser(self.log_path, load_command_patterns(), mode=MODE_STREAMING)
+
+        self.assertGreater(sum(1 for _ in log_parser.iter_blocks()), 100)
+        self.assertEqual(log_parser.commands, {})
+        self.assertEqual(log_parser.blocks, {})
+
+    def test_streamed_rows_match_a_buffered_parse(self):
+        log_parser = LogParser(self.log_path, load_command_patterns(), mode=MODE_BUFFERED)
+        log_parser.parse()
+        expected = parse_commands(parser_factory, log_parser.get_commands())
+
+        # Every block is handed to the parsers as it is read, never kept in LogParser.commands
+        with mock.patch.object(LogParser, 'shared_block', side_effect=AssertionError('block collected')):
+            with parsed_log_output(self.log_path, create_excel=True) as (_, output):
+                streamed = {}
+                for command, rows in output:
+                    streamed.setdefault(command, []).extend(rows)
+
+        self.assertEqual(streamed, expected)
+
+
+class ParserFactoryTests(SimpleTestCase):
+    def test_one_shared_instance_per_command(self):
+        self.assertEqual(set(parser_factory.parsers), set(CommandParserBase.registry))
+        for command, parser_class in CommandParserBase.registry.items():
+            parser = parser_factory.get_parser(command)
+            self.assertIsInstance(parser, parser_class)
+            self.assertIs(parser_factory.get_parser(command), parser)
+
+        with self.assertRaisesMessage(ValueError, 'No parser registered for command: Unknown'):
+            parser_factory.get_parser('Unknown')
+
+    def test_registering_a_parser_replaces_its_instance(self):
+        factory = ParserFactory.from_registry(CommandParserBase.registry)
+        alarms = factory.get_parser('Alarms')
+        factory.register_parser('Alarms', AlarmParser)
+
+        self.assertIsNot(factory.get_parser('Alarms'), alarms)
+
+    def test_shared_parsers_keep_no_state_between_logs(self):
+        logs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(logs_dir.cleanup)
+        commands = []
+        for ip_address, (pon_ports, alarms) in {'192.0.2.7': (2, 5), '192.0.2.8': (4, 12)}.items():
+            log_path = os.path.join(logs_dir.name, f"log_{ip_address}.txt")
+            SyntheticLogWriter(pon_ports=pon_ports, onus_per_port=4, alarms=alarms).write(log_path, 50_000)
+            log_parser = LogParser(log_path, load_command_patterns())
+            log_parser.parse()
+            commands.append(log_parser.get_commands())
+
+        # Parsing the logs in turn with the shared instances gives what fresh instances give
+        for _ in range(2):
+            for commands_data in commands:
+                for command, blocks in commands_data.items():
+                    parser = parser_factory.get_parser(command)
+                    self.assertEqual(parser.parse(blocks), type(parser)().parse(blocks), command)
+                    self.assertEqual(vars(parser), {}, command)
+
+
+class ParallelParsingTests(SimpleTestCase):
+    def setUp(self):
+        logs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(logs_dir.cleanup)
+        log_path = os.path.join(logs_dir.name, 'log_192.0.2.7.txt')
+        SyntheticLogWriter(pon_ports=4, onus_per_port=4, alarms=20).write(log_path, 100_000)
+        log_parser = LogParser(log_path, load_command_patterns())
+        log_parser.parse()
+        self.commands = log_parser.get_commands()
+
+    def test_pool_parse_matches_serial_parse(self):
+        serial = parse_commands(parser_factory, self.commands)
+        parallel = parse_commands(parser_factory, self.commands, workers=2, shard_size=3)
+
+        self.assertEqual(list(parallel), list(serial))
+        self.assertEqual(parallel, serial)
+
+    def test_shards_are_merged_in_order_whatever_finishes_first(self):
+        started = itertools.count()
+
+        def parse_early_shards_last(groups):
+            # The tasks submitted first take the longest, so they finish last
+            time.sleep(max(0.0, 0.05 - 0.01 * next(started)))
+            return parse_task(groups)
+
+        with mock.patch('report.parallel_parsing.ProcessPoolExecutor', ThreadPoolExecutor), \
+                mock.patch('report.parallel_parsing.parse_task', parse_early_shards_last):
+            parallel = parse_commands_parallel(self.commands, workers=4, shard_size=2)
+
+        self.assertEqual(parallel, parse_commands(parser_factory, self.commands))
+
+    def test_shared_blocks_are_scanned_once(self):
+        serial = parse_commands(parser_factory, self.commands)
+        scanner = OnuLineStatsParser.section_scanner
+
+        with mock.patch('report.parallel_parsing.ProcessPoolExecutor', ThreadPoolExecutor), \
+                mock.patch.object(scanner, 'scan', wraps=scanner.scan) as scan:
+            parallel = parse_commands_parallel(self.commands, workers=2, shard_size=2)
+
+        self.assertEqual(scan.call_count, len(self.commands['ONU-Line-Stats']))
+        self.assertEqual(parallel, serial)
+
+    def test_commands_sharing_blocks_travel_together(self):
+        units = group_shared_commands(self.commands)
+
+        self.assertIn(['ONU-Line-Stats', 'OLT-Line-Stats'], units)
+        self.assertEqual(sorted(command for unit in units for command in unit), sorted(self.commands))
+
+
+class BlockIndexTests(SimpleTestCase):
+    def setUp(self):
+        logs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(logs_dir.cleanup)
+        self.log_path = os.path.join(logs_dir.name, 'log_192.0.2.7.txt')
+        SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5).write(self.log_path, 50_000)
+        self.patterns = load_command_patterns()
+
+    def parse(self, mode, patterns=None):
+        log_parser = LogParser(
+            self.log_path, patterns or self.patterns, mode=mode, index_path=block_index_path(self.log_path),
+        )
+        log_parser.parse()
+        return log_parser
+
+    def outputs(self, log_parser):
+        return {
+            command: {command_line: block['output'] for command_line, block in blocks.items()}
+            for command, blocks in log_parser.get_commands().items()
+        }
+
+    def test_indexed_blocks_match_streaming(self):
+        indexed, streamed = self.parse(MODE_INDEXED), self.parse(MODE_STREAMING)
+        self.assertGreater(len(indexed.block_index), 50)
+
+        self.assertEqual(self.outputs(indexed), self.outputs(streamed))
+        self.assertEqual(
+            parse_commands(parser_factory, indexed.get_commands()),
+            parse_commands(parser_factory, streamed.get_commands()),
+        )
+
+    def test_index_is_rebuilt_when_log_or_patterns_change(self):
+        builds = mock.patch.object(LogParser, 'build_block_index', autospec=True, side_effect=LogParser.build_block_index)
+        with builds as build_block_index:
+            self.parse(MODE_INDEXED)
+            self.assertTrue(os.path.exists(block_index_path(self.log_path)))
+            self.parse(MODE_INDEXED)
+            self.assertEqual(build_block_index.call_count, 1)
+
+            stat = os.stat(self.log_path)
+            os.utime(self.log_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+            self.parse(MODE_INDEXED)
+            self.assertEqual(build_block_index.call_count, 2)
+
+            # Appended to, with the modification time put back
+            stat = os.stat(self.log_path)
+            with open(self.log_path, 'a', encoding=LOG_ENCODING) as file:
+                file.write("AUTO> alarm show\nNo alarms\n")
+            os.utime(self.log_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+            appended = self.parse(MODE_INDEXED)
+            self.assertEqual(build_block_index.call_count, 3)
+            self.assertIn('No alarms', appended.get_commands()['Alarms']['alarm show']['output'])
+
+            patterns = {'Alarms': ['alarm show']}
+            self.parse(MODE_INDEXED, patterns)
+            self.assertEqual(build_block_index.call_count, 4)
+            self.parse(MODE_INDEXED)
+            self.assertEqual(build_block_index.call_count, 5)
+
+
+class ProcessingJobTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, JOB_WORK_DIR=os.path.join(media_root.name, 'jobs'), PARSE_CACHE_ENABLED=False,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        # The app reads its settings with the CELERY_ prefix once, so they are set on it directly
+        celery_app.conf.CELERY_TASK_ALWAYS_EAGER = True
+        self.addCleanup(setattr, celery_app.conf, 'CELERY_TASK_ALWAYS_EAGER', False)
+
+        self.log_path = os.path.join(media_root.name, 'log.txt')
+        SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5).write(self.log_path, 0)
+        with open(self.log_path, 'rb') as file:
+            upload = SimpleUploadedFile('log_192.0.2.7_20240101.txt', file.read())
+        self.file_upload = FileUpload.objects.create(file_path=upload)
+
+    def test_upload_is_processed_in_stages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(self.file_upload)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ProcessingJob.SUCCEEDED, job.error)
+        self.assertIn('parse', job.stages)
+        self.assertEqual(job.stages['ingest Alarms']['status'], ProcessingJob.SUCCEEDED)
+        # Recorded for the render stage, which removes the state rows the log no longer reported
+        self.assertEqual(job.stages['ingest Alarms']['model'], 'report_data.Alarms')
+        self.assertEqual(job.stages['render']['status'], ProcessingJob.SUCCEEDED)
+        self.assertEqual(job.run.node.ip_address, '192.0.2.7')
+        self.assertTrue(NodeSummary.objects.filter(node=job.run.node).exists())
+        self.assertFalse(os.path.exists(job.work_dir))
+
+        response = self.client.get(reverse('job_status', args=[job.pk]))
+        self.assertEqual(response.json()['status'], ProcessingJob.SUCCEEDED)
+        self.assertEqual(self.client.get(reverse('job_status', args=[job.pk + 1])).status_code, 404)
+
+    @override_settings(LOG_PARSER_MODE=MODE_STREAMING, REPORT_PARSE_WORKERS=1)
+    def test_commands_streamed_in_several_groups_are_spooled_whole(self):
+        # Three slots, so the per-slot commands each come in three groups of blocks
+        writer = SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5)
+        writer.write(self.log_path, 3 * len(writer.slot_section(1)))
+        with open(self.log_path, 'rb') as file:
+            upload = SimpleUploadedFile('log_192.0.2.7_20240102.txt', file.read())
+        file_upload = FileUpload.objects.create(file_path=upload)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(file_upload)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.SUCCEEDED, job.error)
+        commands = job.stages['parse']['commands']
+        self.assertEqual(len(commands), len(set(commands)))
+
+        # The same log ingested in one go by process_data for another node
+        other_log_path = os.path.join(os.path.dirname(self.log_path), 'log_192.0.2.6.txt')
+        shutil.copy(self.log_path, other_log_path)
+        process_data(other_log_path, create_report=False)
+
+        models = [apps.get_model(job.stages[f"ingest {command}"]['model']) for command in commands]
+        self.assertIn(GponOnuStats, models)
+        for model in models:
+            expected = model.objects.filter(node_id='192.0.2.6').count()
+            self.assertGreater(expected, 0, model.__name__)
+            self.assertEqual(model.objects.filter(node_id='192.0.2.7').count(), expected, model.__name__)
+
+    def test_failed_job_resumes_from_completed_stages(self):
+        def ingest_failing_alarms(run, command, rows):
+            if command == 'Alarms':
+                raise RuntimeError('database went away')
+            return ingest_command(run, command, rows)
+
+        with mock.patch('report.tasks.ingest_command', ingest_failing_alarms):
+            with self.captureOnCommitCallbacks(execute=True):
+                job = start_processing(self.file_upload)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.FAILED)
+        self.assertEqual(job.error, 'ingest Alarms: database went away')
+        self.assertFalse(NodeLease.objects.exists())
+        parsed_at = job.stages['parse']['started_at']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            resumed = start_processing(self.file_upload)
+        resumed.refresh_from_db()
+
+        self.assertEqual(resumed.pk, job.pk)
+        self.assertEqual(resumed.status, ProcessingJob.SUCCEEDED, resumed.error)
+        self.assertEqual(resumed.stages['parse']['started_at'], parsed_at)
+        self.assertEqual(resumed.stages['ingest Alarms']['status'], ProcessingJob.SUCCEEDED)
+        # A processed log is not processed again
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.assertEqual(start_processing(self.file_upload).pk, job.pk)
+        self.assertEqual(callbacks, [])
+
+    def test_failed_command_leaves_the_lease_to_the_error_callback(self):
+        with mock.patch('report.tasks.chord') as ingest_chord, self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(self.file_upload)
+        job.refresh_from_db()
+        callback = ingest_chord.return_value.call_args.args[0]
+        self.assertEqual(callback.options['link_error'], [release_job_lease.si(job.pk)])
+        self.assertTrue(os.path.exists(os.path.join(job.work_dir, 'Alarms.pickle.gz')))
+
+        with mock.patch('report.tasks.ingest_command', side_effect=RuntimeError('database went away')):
+            ingest_log_command.apply((job.pk, 'Alarms'))
+        # Other commands of the job may still be ingesting under the lease
+        self.assertTrue(NodeLease.objects.filter(holder=job.holder).exists())
+
+        release_job_lease.apply((job.pk,))
+        self.assertFalse(NodeLease.objects.exists())
+
+    def test_retry_requires_post(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(self.file_upload)
+
+        self.assertEqual(self.client.get(reverse('retry_job', args=[job.pk])).status_code, 405)
+        self.assertEqual(self.client.post(reverse('retry_job', args=[job.pk])).json()['job_id'], job.pk)
+
+    def test_stale_running_job_is_resumed(self):
+        started_at = timezone.now()
+        job = ProcessingJob.objects.create(
+            file_upload=self.file_upload, checksum=self.file_upload.checksum, status=ProcessingJob.RUNNING,
+            stages={'parse': {'status': ProcessingJob.RUNNING, 'started_at': started_at.isoformat()}},
+        )
+        # Still within a lease's lifetime, so its worker may be busy with it
+        with self.captureOnCommitCallbacks() as callbacks:
+            start_processing(self.file_upload)
+        self.assertEqual(callbacks, [])
+
+        with mock.patch('django.utils.timezone.now', return_value=started_at + timedelta(hours=1)):
+            with self.captureOnCommitCallbacks(execute=True):
+                start_processing(self.file_upload)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.SUCCEEDED, job.error)
+
+    def test_archive_members_are_ingested_as_node_logs(self):
+        archive_path = os.path.join(os.path.dirname(self.log_path), 'nightly.tar.gz')
+        with tarfile.open(archive_path, 'w:gz') as archive:
+            for ip_address in ['192.0.2.8', '192.0.2.9']:
+                archive.add(self.log_path, f"nightly/log_{ip_address}.txt")
+        with open(archive_path, 'rb') as file:
+            file_upload = FileUpload.objects.create(file_path=SimpleUploadedFile('nightly.tar.gz', file.read()))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(file_upload)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ProcessingJob.SUCCEEDED, job.error)
+        self.assertEqual(set(job.stages), {'ingest nightly/log_192.0.2.8.txt', 'ingest nightly/log_192.0.2.9.txt', 'render'})
+        runs = HealthCheckRun.objects.filter(file_upload=file_upload)
+        self.assertEqual(sorted(runs.values_list('node_id', flat=True)), ['192.0.2.8', '192.0.2.9'])
+
+    def test_failed_archive_member_does_not_stop_the_others(self):
+        archive_path = os.path.join(os.path.dirname(self.log_path), 'nightly.zip')
+        with zipfile.ZipFile(archive_path, 'w') as archive:
+            for ip_address in ['192.0.2.8', '192.0.2.9']:
+                archive.write(self.log_path, f"log_{ip_address}.txt")
+        with open(archive_path, 'rb') as file:
+            file_upload = FileUpload.objects.create(file_path=SimpleUploadedFile('nightly.zip', file.read()))
+
+        def process_log_failing_first(log_source, file_name, *args, **kwargs):
+            if file_name == 'log_192.0.2.8':
+                raise ValueError('truncated log')
+            return process_log(log_source, file_name, *args, **kwargs)
+
+        with mock.patch('report.tasks.process_log', process_log_failing_first), \
+                mock.patch('report.tasks.generate_word_report') as report, \
+                self.captureOnCommitCallbacks(execute=True):
+            job = start_processing(file_upload)
+        job.refresh_from_db()
+
+        self.assertEqual(job.status, ProcessingJob.FAILED)
+        self.assertEqual(job.error, 'ingest log_192.0.2.8.txt: truncated log')
+        self.assertTrue(job.stage_succeeded('ingest log_192.0.2.9.txt'))
+        self.assertTrue(job.stage_succeeded('render'))
+        self.assertEqual([node.ip_address for node in report.call_args.kwargs['nodes']], ['192.0.2.9'])
+        self.assertFalse(NodeLease.objects.exists())
+
+        # Resuming the job ingests the member that failed
+        with self.captureOnCommitCallbacks(execute=True):
+            start_processing(file_upload)
+        job.refresh_from_db()
+        self.assertEqual(job.status, ProcessingJob.SUCCEEDED, job.error)
+        runs = HealthCheckRun.objects.filter(file_upload=file_upload)
+        self.assertEqual(sorted(runs.values_list('node_id', flat=True)), ['192.0.2.8', '192.0.2.9'])
+
+
+class NodeLeaseTests(TestCase):
+    def test_one_holder_at_a_time(self):
+        self.assertTrue(NodeLease.acquire('192.0.2.7', 'job 1'))
+        self.assertFalse(NodeLease.acquire('192.0.2.7', 'job 2'))
+        self.assertTrue(NodeLease.acquire('192.0.2.8', 'job 2'))
+        self.assertTrue(NodeLease.renew('192.0.2.7', 'job 1'))
+
+        # An expired lease is taken over, and its former holder cannot renew it
+        NodeLease.objects.filter(ip_address='192.0.2.7').update(expires_at=timezone.now())
+        self.assertTrue(NodeLease.acquire('192.0.2.7', 'job 2'))
+        self.assertFalse(NodeLease.renew('192.0.2.7', 'job 1'))
+
+        NodeLease.release('192.0.2.7', 'job 1')
+        self.assertEqual(NodeLease.objects.get(ip_address='192.0.2.7').holder, 'job 2')
+        NodeLease.release('192.0.2.7', 'job 2')
+        self.assertTrue(NodeLease.acquire('192.0.2.7', 'job 1'))
+
+    def test_holders_outside_jobs_are_unique(self):
+        holder = NodeLease.unique_holder()
+        self.assertNotEqual(holder, NodeLease.unique_holder())
+        self.assertLessEqual(len(holder), NodeLease._meta.get_field('holder').max_length)
+
+
+@override_settings(PARSE_CACHE_ENABLED=False)
+class ImportLogsTests(TestCase):
+    def test_directories_and_archives_skip_known_logs(self):
+        logs_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(logs_dir.cleanup)
+        writer = SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5)
+        for ip_address in ['192.0.2.1', '192.0.2.2']:
+            writer.write(os.path.join(logs_dir.name, f"log_{ip_address}.txt"), 0)
+            with open(os.path.join(logs_dir.name, f"log_{ip_address}.txt"), 'a') as file:
+                file.write(f"{ip_address}\n")
+        other_log = (writer.header() + writer.alarm_show()).encode(LOG_ENCODING)
+        with gzip.open(os.path.join(logs_dir.name, 'log_192.0.2.4.txt.gz'), 'wb') as file:
+            file.write(other_log + b'192.0.2.4\n')
+        with zipfile.ZipFile(os.path.join(logs_dir.name, 'nightly.zip'), 'w') as archive:
+            # A copy of a log already in the directory, and a log of another node
+            archive.write(os.path.join(logs_dir.name, 'log_192.0.2.1.txt'), 'nightly/log_192.0.2.1.txt')
+            archive.writestr('nightly/log_192.0.2.3.txt', other_log)
+
+        out = StringIO()
+        call_command('import_logs', logs_dir.name, workers=1, stdout=out)
+
+        self.assertIn('Found 3 logs and 1 archives', out.getvalue())
+        self.assertIn('Imported 4 logs', out.getvalue())
+        self.assertIn('1 skipped', out.getvalue())
+        runs = dict(HealthCheckRun.objects.values_list('node_id', 'checksum'))
+        self.assertEqual(set(runs), {'192.0.2.1', '192.0.2.2', '192.0.2.3', '192.0.2.4'})
+        # Archive members are checksummed as they are streamed out of the archive
+        self.assertEqual(runs['192.0.2.3'], hashlib.md5(other_log).hexdigest())
+
+        # Known logs are recognised by their checksum before anything is parsed
+        out = StringIO()
+        with mock.patch('report.libs.parsed_log_output') as parsed_log_output:
+            call_command('import_logs', os.path.join(logs_dir.name, '*.txt*'), workers=1, stdout=out)
+        parsed_log_output.assert_not_called()
+        self.assertIn('Found 3 logs and 0 archives', out.getvalue())
+        self.assertIn('Imported 0 logs', out.getvalue())
+        self.assertIn('3 skipped', out.getvalue())
+
+
+class ArchiveMemberTests(SimpleTestCase):
+    def setUp(self):
+        archives_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(archives_dir.cleanup)
+        self.archives_dir = archives_dir.name
+        self.logs = {f"nightly/log_192.0.2.{i}.txt": f"AUTO> alarm show\nlog {i}\n".encode() * 200 for i in range(3)}
+
+    def test_members_are_opened_by_name_and_offset(self):
+        for name, mode in [('nightly.zip', None), ('nightly.tar', 'w'), ('nightly.tar.gz', 'w:gz')]:
+            archive_path = os.path.join(self.archives_dir, name)
+            if mode is None:
+                with zipfile.ZipFile(archive_path, 'w') as archive:
+                    for member_name, data in self.logs.items():
+                        archive.writestr(member_name, data)
+            else:
+                with tarfile.open(archive_path, mode) as archive:
+                    for member_name, data in self.logs.items():
+                        info = tarfile.TarInfo(member_name)
+                        info.size = len(data)
+                        archive.addfile(info, io.BytesIO(data))
+
+            members = [(member.name, member.offset) for member in iter_archive_logs(archive_path)]
+            self.assertEqual([member_name for member_name, _ in members], list(self.logs), name)
+            # Read in reverse, so a tarball is read from before where it was left
+            for member_name, offset in reversed(members):
+                with open_archive_member(archive_path, member_name, offset) as member:
+                    self.assertEqual(member.file.read(), self.logs[member_name], name)
+
+
+@override_settings(PARSE_CACHE_ENABLED=False, LOG_PARSER_MODE=MODE_STREAMING)
+class StreamedLogIngestionTests(TestCase):
+    def setUp(self):
+        writer = SyntheticLogWriter(pon_ports=2, onus_per_port=4, alarms=5)
+        self.log = (writer.header() + writer.alarm_show()).encode(LOG_ENCODING)
+
+    def process_stream(self, **kwargs):
+        collected_at = timezone.now()
+        with mock.patch('tempfile.SpooledTemporaryFile', side_effect=AssertionError('log spooled')):
+            return process_log(io.BytesIO(self.log), 'log_192.0.2.5', collected_at, len(self.log), create_report=False, **kwargs)
+
+    def test_checksum_is_attached_once_the_stream_is_read(self):
+        stats = self.process_stream()
+
+        self.assertFalse(stats['skipped'])
+        self.assertEqual(stats['checksum'], hashlib.md5(self.log).hexdigest())
+        run = HealthCheckRun.objects.get(node_id='192.0.2.5')
+        self.assertEqual(run.checksum, stats['checksum'])
+        self.assertEqual(Alarms.objects.filter(last_seen_run=run).count(), 5)
+
+    def test_known_log_is_rolled_back(self):
+        run = HealthCheckRun.objects.get(node_id=self.process_stream()['node'])
+        alarm = Alarms.objects.filter(node_id='192.0.2.5').first()
+        Alarms.objects.filter(pk=alarm.pk).update(alarm_severity='minor')
+
+        for skip_known in (False, True):
+            stats = self.process_stream(skip_known=skip_known)
+
+            self.assertTrue(stats['skipped'])
+            self.assertEqual(stats['rows'], 0)
+            self.assertEqual(list(HealthCheckRun.objects.all()), [run])
+            self.assertEqual(Alarms.objects.get(pk=alarm.pk).alarm_severity, 'minor')
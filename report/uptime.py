@@ -0,0 +1,37 @@
+import re
+from datetime import timedelta
+
+# 'cardstats' prints uptime as days:hours:minutes:seconds
+CLOCK_PATTERN = re.compile(r'^(\d+):(\d{2}):(\d{2}):(\d{2})$')
+# 'slots <slot>' prints it as '3 days, 16 hours, 14 minutes'
+UNIT_PATTERN = re.compile(r'(\d+)\s*(day|hour|minute|second)s?\b')
+
+
+def parse_uptime(text):
+    """
+    Parses an uptime in either of the forms the MXK prints into a timedelta.
+
+    Returns None for empty text or text in neither form.
+    """
+    text = (text or '').strip()
+    match = CLOCK_PATTERN.match(text)
+    if match:
+        days, hours, minutes, seconds = map(int, match.groups())
+        return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    units = UNIT_PATTERN.findall(text)
+    if not units:
+        return None
+    return timedelta(**{f"{unit}s": int(value) for value, unit in units})
+
+
+def format_clock_uptime(uptime):
+    """Formats a timedelta the way 'cardstats' prints uptime."""
+    minutes, seconds = divmod(uptime.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{uptime.days}:{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def format_unit_uptime(uptime):
+    """Formats a timedelta the way 'slots <slot>' prints uptime."""
+    hours, minutes = divmod(uptime.seconds // 60, 60)
+    return f"{uptime.days} days, {hours} hours, {minutes} minutes"
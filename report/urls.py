@@ -19,7 +19,7 @@ from django.urls import path
 from .views import report_catalog, report_config, file_upload_view, file_list
 from django.urls import path
 from .views import report_catalog, report_config, file_upload_view, file_list, delete_file
-from .views import download_report, report_catalog_view
+from .views import download_report, report_catalog_view, job_status, retry_job
 
 urlpatterns = [
     path('report-catalog/', report_catalog_view, name='report_catalog'),
@@ -27,6 +27,8 @@ urlpatterns = [
     path('file-upload/', file_upload_view, name='file_upload'),
     path('files-list/', file_list, name='files_list'),
     path('delete-file/<int:file_id>/', delete_file, name='delete_file'),
+    path('jobs/<int:job_id>/status/', job_status, name='job_status'),
+    path('jobs/<int:job_id>/retry/', retry_job, name='retry_job'),
     path('download/<int:report_id>/', download_report, name='download_report'),
 
     
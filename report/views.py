@@ -18,10 +18,12 @@ from .models import FileUpload
 from django.db import IntegrityError
 from django.contrib import messages
 import logging
+import shutil
 from django.http import JsonResponse
+from django.views.decorators.http import require_POST
 log = logging.getLogger(__name__)
-from .libs import process_data
-from .models import Report
+from .models import ProcessingJob, Report
+from .tasks import start_processing
 from django.http import HttpResponse, Http404
 
 
@@ -38,6 +40,9 @@ def report_config(request):
 def file_list(request):
     files = []
     file_uploads = FileUpload.objects.all()
+    latest_jobs = {}
+    for job in ProcessingJob.objects.filter(file_upload__in=file_uploads).order_by('created_at'):
+        latest_jobs[job.file_upload_id] = job
     for file_upload in file_uploads:
         file_id = file_upload.id  # Add file_id
         file_name = file_upload.file_name
@@ -45,6 +50,7 @@ def file_list(request):
         file_size = file_upload.get_size_with_units()
         file_date = file_upload.uploaded_at.strftime("%Y-%m-%d %H:%M:%S")
         checksum = file_upload.checksum  # Add checksum column
+        job = latest_jobs.get(file_id)
         file_info = {
             'file_id': file_id,  # Include file_id in file_info dictionary
             'file_name': file_name,
@@ -52,6 +58,10 @@ def file_list(request):
             'checksum': checksum,
             'file_size': file_size,
             'file_date': file_date,
+            'job_id': job.pk if job else None,
+            'job_status': job.get_status_display() if job else '',
+            'job_finished': job is None or job.status in (ProcessingJob.SUCCEEDED, ProcessingJob.FAILED),
+            'job_failed': job is not None and job.status == ProcessingJob.FAILED,
         }
         files.append(file_info)
     
@@ -67,8 +77,8 @@ def file_upload_view(request):
             try:
                 file_upload = form.save()
                 messages.success(request, 'File uploaded successfully.')
-                # Process the uploaded file
-                process_data(file_upload.file_path.path)
+                # Process the uploaded file in the background, the file list polls its job
+                start_processing(file_upload)
                 # Redirect to the files_list URL
                 return HttpResponseRedirect(reverse('files_list'))
             except IntegrityError:
@@ -80,6 +90,25 @@ def file_upload_view(request):
     return render(request, 'report/file_upload.html', {'form': form})
 
 
+def job_status(request, job_id):
+    try:
+        job = ProcessingJob.objects.get(id=job_id)
+    except ProcessingJob.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Job not found.'}, status=404)
+    return JsonResponse(job.to_dict())
+
+
+@require_POST
+def retry_job(request, job_id):
+    try:
+        job = ProcessingJob.objects.select_related('file_upload').get(id=job_id)
+    except ProcessingJob.DoesNotExist:
+        return JsonResponse({'status': 'error', 'message': 'Job not found.'}, status=404)
+    # Resumes the job from its last completed stage if it failed, leaves it alone otherwise
+    job = start_processing(job.file_upload)
+    return JsonResponse(job.to_dict())
+
+
 def delete_file(request, file_id):
     try:
         file_upload = FileUpload.objects.get(id=file_id)
@@ -90,6 +119,11 @@ def delete_file(request, file_id):
             log.info(f"File deleted: {file_path}")
         else:
             log.warning(f"File not found: {file_path}")
+        if os.path.exists(file_upload.block_index_path):
+            os.remove(file_upload.block_index_path)
+        # Spool files a failed job kept for its resumption
+        for job in file_upload.jobs.all():
+            shutil.rmtree(job.work_dir, ignore_errors=True)
         # Delete the file from the database
         file_upload.delete()
         log.info("File record deleted from the database.")
@@ -0,0 +1,86 @@
+import csv
+import io
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from report_data.models import Alarms, GponOnuStats, GponOnuStatsDelta, OnuLineStatus
+
+# Tables large enough on a full chassis that even batched INSERTs dominate back-loads
+COPY_MODELS = (Alarms, GponOnuStats, GponOnuStatsDelta, OnuLineStatus)
+
+
+def copy_supported(model):
+    """Whether rows of ``model`` go through COPY; the ORM upsert is used everywhere else."""
+    return settings.INGESTION_COPY and model in COPY_MODELS and connection.vendor == 'postgresql'
+
+
+def copy_value(field, value):
+    """Renders a model value as a field of PostgreSQL's CSV COPY format."""
+    value = field.get_prep_value(value)
+    if value is None:
+        return r'\N'
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return '\\x' + bytes(value).hex()
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value)
+
+
+def copy_upsert(model, instances, unique_fields, update_fields, compare_fields):
+    """
+    Upserts model instances by COPYing them into a temporary staging table and merging
+    that into the model's table with one ``INSERT ... ON CONFLICT DO UPDATE``.
+
+    Rows whose stored ``compare_fields`` are identical are left untouched. ``instances``
+    must not repeat a key. The staging table lives until the surrounding transaction
+    commits and is emptied before each batch.
+
+    Returns:
+    tuple: The number of rows inserted and the number updated.
+    """
+    quote_name = connection.ops.quote_name
+    fields = unique_fields + update_fields
+    table = quote_name(model._meta.db_table)
+    staging = quote_name(f"{model._meta.db_table}_staging")
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    updates = ', '.join(f"{quote_name(field.column)} = EXCLUDED.{quote_name(field.column)}" for field in update_fields)
+    current = ', '.join(f"{table}.{quote_name(field.column)}" for field in compare_fields)
+    incoming = ', '.join(f"EXCLUDED.{quote_name(field.column)}" for field in compare_fields)
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for instance in instances:
+        writer.writerow([copy_value(field, getattr(instance, field.attname)) for field in fields])
+    buffer.seek(0)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TEMPORARY TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+            f"SELECT {columns} FROM {table} WITH NO DATA"
+        )
+        cursor.execute(f"TRUNCATE {staging}")
+        cursor.copy_expert(f"COPY {staging} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '\\N')", buffer)
+        # xmax is 0 only for freshly inserted rows, which tells inserts from updates
+        cursor.execute(
+            f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {staging} "
+            f"ON CONFLICT ({', '.join(quote_name(field.column) for field in unique_fields)}) DO UPDATE SET {updates} "
+            f"WHERE ({current}) IS DISTINCT FROM ({incoming}) "
+            f"RETURNING xmax = 0"
+        )
+        outcomes = [inserted for inserted, in cursor.fetchall()]
+    return outcomes.count(True), outcomes.count(False)
+
+
+def copy_insert(model, fields, rows):
+    """
+    COPYs rows of plain values (numbers, strings, booleans, datetimes) in the order of
+    ``fields`` straight into the model's table, without any conflict handling.
+    """
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(field.column) for field in fields)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    buffer.seek(0)
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {quote_name(model._meta.db_table)} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
@@ -0,0 +1,142 @@
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+
+from report_data.copy_ingestion import copy_insert, copy_supported
+from report_data.ingestion_libs import batched
+from report_data.models import GponOnuStats, GponOnuStatsDelta, HealthCheckRun
+
+# Cumulative GPON ONU counters, in the column order of the delta arrays
+GPON_COUNTERS = [
+    'upstream_bip_units', 'fec_corrected_bytes', 'fec_corrected_codewords', 'fec_uncorrected_codewords',
+    'total_received_codewords', 'received_bytes', 'received_packets', 'transmitted_bytes',
+    'transmitted_packets', 'unreceived_bursts', 'bip_error', 'remote_bip_error',
+    'drift_of_window_indications',
+]
+
+# Columns of the rows written by compute_chunk
+DELTA_FIELDS = [
+    'node', 'run', 'previous_run', 'collected_at', 'interval_seconds', 'slot', 'sub_port', 'counter_reset',
+    *GPON_COUNTERS,
+]
+
+COUNTER_32_BIT = 2 ** 32
+
+
+def counter_deltas(previous, current):
+    """
+    Deltas of cumulative counters between two aligned snapshots.
+
+    ``previous`` and ``current`` are int64 arrays of the same shape. A counter that went
+    down either wrapped past 2**32, when it had been in the top half of the 32 bit range
+    and came back below that, or was reset and is taken to have counted up from zero.
+
+    Returns:
+    tuple: The int64 deltas and a boolean array marking the resets.
+    """
+    deltas = current - previous
+    dropped = deltas < 0
+    wrapped = dropped & (previous < COUNTER_32_BIT) & (previous - current > COUNTER_32_BIT // 2)
+    deltas = np.where(wrapped, deltas + COUNTER_32_BIT, deltas)
+    reset = dropped & ~wrapped
+    return np.where(reset, current, deltas), reset
+
+
+def align(previous_keys, current_keys):
+    """
+    Matches rows of two snapshots by key.
+
+    Returns:
+    tuple: Indexes into ``current_keys`` and ``previous_keys`` of the rows found in both.
+    """
+    if not len(previous_keys) or not len(current_keys):
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+    order = np.argsort(previous_keys, kind='stable')
+    sorted_keys = previous_keys[order]
+    positions = np.searchsorted(sorted_keys, current_keys).clip(max=len(sorted_keys) - 1)
+    found = sorted_keys[positions] == current_keys
+    return np.flatnonzero(found), order[positions[found]]
+
+
+def run_pairs(runs):
+    """Pairs each run with the previous run of its node, dropping runs without one."""
+    previous = HealthCheckRun.objects.filter(
+        node=OuterRef('node'), collected_at__lt=OuterRef('collected_at'),
+    ).order_by('-collected_at').values('pk')[:1]
+    runs = runs.annotate(previous_run_id=Subquery(previous)).exclude(previous_run_id=None)
+    pairs = list(runs.select_related(None).only('pk', 'node_id', 'collected_at'))
+    previous_runs = HealthCheckRun.objects.in_bulk({run.previous_run_id for run in pairs})
+    return [(run, previous_runs[run.previous_run_id]) for run in pairs]
+
+
+def compute_gpon_deltas(runs, chunk_size=200):
+    """
+    Computes GponOnuStatsDelta rows for ``runs`` (a HealthCheckRun queryset) against the
+    previous run of each node, replacing deltas computed before.
+
+    Runs are processed ``chunk_size`` at a time: the counters of a chunk and of the runs
+    before them are read with one query and diffed together as arrays, so a fleet of
+    thousands of nodes costs a few queries per chunk rather than per node.
+
+    Returns:
+    int: The number of delta rows written.
+    """
+    written = 0
+    for pairs in batched(run_pairs(runs), chunk_size):
+        written += compute_chunk(pairs)
+    return written
+
+
+def compute_chunk(pairs):
+    """Diffs the counters of ``(run, previous run)`` pairs and stores the deltas."""
+    current_pair = {run.pk: index for index, (run, _) in enumerate(pairs)}
+    previous_pair = {}
+    for index, (_, previous) in enumerate(pairs):
+        previous_pair.setdefault(previous.pk, []).append(index)
+
+    rows = GponOnuStats.objects.filter(run_id__in=current_pair.keys() | previous_pair.keys()).values_list(
+        'run_id', 'slot', 'sub_port', *GPON_COUNTERS,
+    )
+    current_rows, current_keys, current_onus = [], [], []
+    previous_rows, previous_keys, counters = [], [], []
+    for row_index, (run_id, slot, sub_port, *values) in enumerate(rows.iterator()):
+        counters.append(values)
+        if run_id in current_pair:
+            current_rows.append(row_index)
+            current_keys.append(f"{current_pair[run_id]}/{slot}/{sub_port}")
+            current_onus.append((current_pair[run_id], slot, sub_port))
+        for index in previous_pair.get(run_id, ()):
+            previous_rows.append(row_index)
+            previous_keys.append(f"{index}/{slot}/{sub_port}")
+    if not counters:
+        return 0
+
+    counters = np.array(counters, dtype=np.int64)
+    matched, previous_matched = align(np.array(previous_keys), np.array(current_keys))
+    current_index = np.array(current_rows, dtype=np.intp)[matched]
+    previous_index = np.array(previous_rows, dtype=np.intp)[previous_matched]
+    deltas, reset = counter_deltas(counters[previous_index], counters[current_index])
+    reset = reset.any(axis=1)
+
+    intervals = [(run.collected_at - previous.collected_at).total_seconds() for run, previous in pairs]
+    rows = []
+    for position, key_index in enumerate(matched):
+        pair_index, slot, sub_port = current_onus[key_index]
+        run, previous = pairs[pair_index]
+        rows.append((
+            run.node_id, run.pk, previous.pk, run.collected_at, intervals[pair_index],
+            slot, sub_port, bool(reset[position]), *deltas[position].tolist(),
+        ))
+
+    fields = [GponOnuStatsDelta._meta.get_field(name) for name in DELTA_FIELDS]
+    with transaction.atomic():
+        GponOnuStatsDelta.objects.filter(run__in=[run for run, _ in pairs]).delete()
+        if copy_supported(GponOnuStatsDelta):
+            copy_insert(GponOnuStatsDelta, fields, rows)
+        else:
+            GponOnuStatsDelta.objects.bulk_create(
+                [GponOnuStatsDelta(**{field.attname: value for field, value in zip(fields, row)}) for row in rows],
+                batch_size=settings.INGESTION_BATCH_SIZE,
+            )
+    return len(rows)
@@ -1,16 +1,311 @@
 
-from report_data.models import InventoryBackPlane, Alarms, SlotStatus, InventoryCard, NetworkInterface, Alarms, CardStats, OltLineStatus, OnuLineStatus, GponOnuStats
-from django.db.utils import IntegrityError
-from datetime import datetime
+from report_data.models import InventoryBackPlane, Alarms, SlotStatus, InventoryCard, NetworkInterface, Alarms, CardStats, OltLineStatus, OnuLineStatus, GponOnuStats, HealthCheckRun
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+from datetime import datetime, timedelta, timezone as dt_timezone
+import hashlib
+from itertools import islice
+from django.conf import settings
+from report.subport_status import SubportStatus, count_status, pack_statuses
+from report.uptime import parse_uptime
+from report_data.copy_ingestion import copy_supported, copy_upsert
+
+
+def batched(iterable, size):
+    """Yields lists of up to ``size`` items, consuming ``iterable`` lazily."""
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class IngestionResult:
+    """
+    Outcome of ingesting one command's rows: how many were inserted, updated or left
+    unchanged, and which failed.
+
+    Failures are collected rather than printed as they happen, so a command with
+    thousands of rows reports once with a summary.
+    """
+
+    # Failed rows named individually in the summary; the rest are only counted
+    max_reported_failures = 10
+
+    def __init__(self, model):
+        self.model = model
+        self.inserted = 0
+        self.updated = 0
+        self.unchanged = 0
+        self.failures = []
+
+    def count(self, outcome):
+        setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def fail(self, description, error):
+        self.failures.append((description, error))
+
+    def report(self):
+        print(
+            f"{self.model.__name__}: {self.inserted} inserted, {self.updated} updated, "
+            f"{self.unchanged} unchanged, {len(self.failures)} failed."
+        )
+        for description, error in self.failures[:self.max_reported_failures]:
+            print(f"  {description}: {error}")
+        if len(self.failures) > self.max_reported_failures:
+            print(f"  ... and {len(self.failures) - self.max_reported_failures} more.")
+
+
+# Fields recording which runs wrote and last saw a row. They are left out of the content
+# hash, so a row that differs from the stored one only in these is unchanged: it is not
+# rewritten and keeps pointing at the run that last changed it.
+RUN_FIELDS = ('run', 'last_seen_run')
+HASH_FIELD = 'content_hash'
+SEEN_FIELD = 'last_seen_run'
+
+
+def upsert_fields(model):
+    """
+    Returns the fields identifying a row of ``model`` (its first ``unique_together``),
+    the fields a re-ingested row refreshes (every other concrete field but the key) and
+    the fields its content hash covers (those minus RUN_FIELDS and the hash itself).
+    """
+    opts = model._meta
+    unique_fields = [opts.get_field(name) for name in opts.unique_together[0]]
+    update_fields = [
+        field for field in opts.concrete_fields
+        if not field.primary_key and field not in unique_fields
+    ]
+    hashed_fields = [field for field in update_fields if field.name not in RUN_FIELDS + (HASH_FIELD,)]
+    return unique_fields, update_fields, hashed_fields
+
+
+def has_seen_field(model):
+    """Whether rows of ``model`` record the last run that saw them; counter rows belong to one run."""
+    return any(field.name == SEEN_FIELD for field in model._meta.concrete_fields)
+
+
+def comparable(field, value):
+    value = field.to_python(value)
+    # psycopg2 returns bytea as a memoryview of format 'c', which never equals bytes
+    return bytes(value) if isinstance(value, memoryview) else value
+
+
+def field_values(instance, fields):
+    return tuple(comparable(field, getattr(instance, field.attname)) for field in fields)
+
 
+def content_hash(instance, fields):
+    """
+    Hashes the values of ``fields`` of an instance. Values are normalized the way the
+    fields store them, and datetimes to UTC, so a row parsed again from a later log
+    hashes the same in any process as long as its values did not change.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for value in field_values(instance, fields):
+        if isinstance(value, datetime) and timezone.is_aware(value):
+            value = value.astimezone(dt_timezone.utc)
+        digest.update(repr(value).encode())
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def stored_rows(model, keys, unique_fields, seen):
+    """
+    Maps the keys among ``keys`` already stored to the primary key, content hash and,
+    with ``seen``, the last run that saw the row. Only those columns are read, however
+    wide the table.
+    """
+    lookups = {
+        f"{field.attname}__in": {key[i] for key in keys}
+        for i, field in enumerate(unique_fields)
+    }
+    columns = ['pk', HASH_FIELD, f"{SEEN_FIELD}_id"] if seen else ['pk', HASH_FIELD]
+    stored = {}
+    for row in model.objects.filter(**lookups).values_list(*[field.attname for field in unique_fields], *columns):
+        key = tuple(comparable(field, value) for field, value in zip(unique_fields, row))
+        if key in keys:
+            pk, stored_hash, *last_seen = row[len(unique_fields):]
+            stored[key] = (pk, stored_hash, last_seen[0] if last_seen else None)
+    return stored
+
+
+def ingest_in_batches(model, data_list, build, describe, batch_size=None):
+    """
+    Consumes parsed rows in fixed-size batches and upserts the model instances built for
+    each batch, all inside one transaction.
+
+    Rows are matched on the model's ``unique_together`` key, so re-ingesting a log for
+    the same node refreshes the stored rows instead of dropping the new values. Each row
+    gets a content hash, and only the keys and hashes of stored rows are read back to
+    compare with: new and changed rows are written, with one ``INSERT ... ON CONFLICT
+    DO UPDATE`` per batch, while unchanged ones only have ``last_seen_run`` moved to
+    this run, with one ``UPDATE`` per batch. A batch the database rejects is retried
+    row by row under savepoints so only the offending rows are dropped. On PostgreSQL
+    the high-volume tables in ``copy_ingestion.COPY_MODELS`` are written through COPY
+    and a staging table instead.
+
+    Only one batch is held at a time, so ``data_list`` may be a generator such as
+    ``CommandParserBase.parse_iter`` and memory stays flat however many rows a log has.
+
+    Parameters:
+    model (Model): The model the rows are upserted into.
+    data_list (iterable): Parsed row dictionaries.
+    build (callable): Returns the unsaved model instance for a row.
+    describe (callable): Names a row in the failure report.
+    batch_size (int, optional): Rows per batch, settings.INGESTION_BATCH_SIZE by default.
+
+    Returns:
+    IngestionResult
+    """
+    result = IngestionResult(model)
+    unique_fields, update_fields, hashed_fields = upsert_fields(model)
+    seen = has_seen_field(model)
+    copy = copy_supported(model)
+    with transaction.atomic():
+        for batch in batched(data_list, batch_size or settings.INGESTION_BATCH_SIZE):
+            instances = []
+            for data in batch:
+                try:
+                    instance = build(data)
+                    instance.content_hash = content_hash(instance, hashed_fields)
+                    if seen:
+                        instance.last_seen_run_id = instance.run_id
+                    instances.append((data, instance))
+                except Exception as e:
+                    result.fail(describe(data) if isinstance(data, dict) else repr(data), e)
+            pending, unchanged = plan_upsert(model, instances, unique_fields, seen, result)
+            if copy:
+                copy_batch(model, pending, unique_fields, update_fields, describe, result)
+            else:
+                upsert_batch(model, pending, unique_fields, update_fields, describe, result)
+            if unchanged:
+                model.objects.filter(pk__in=unchanged).update(**{SEEN_FIELD: instances[0][1].run_id})
+    result.report()
+    return result
+
+
+def remove_unseen_rows(run, models):
+    """
+    Deletes the rows of ``run``'s node in the state tables of ``models`` that ``run`` did
+    not see, so those tables hold what the node's latest log reported: an alarm that
+    cleared or a card that was pulled goes away instead of lingering. Meant to run once
+    per run after all its commands were ingested, since streamed commands are ingested
+    a few blocks at a time. Pass only the models whose rows were all ingested, as a row
+    that failed was not seen either.
+
+    Nothing is deleted for a run older than the node's latest one, e.g. a back-loaded
+    log, as the rows it did not see may have been seen by a later run.
 
-def ingest_inventory_backplane_data(node, data_list):
+    Returns:
+    int: The number of rows deleted.
+    """
+    if HealthCheckRun.objects.filter(node=run.node_id, collected_at__gt=run.collected_at).exists():
+        return 0
+    removed = 0
+    with transaction.atomic():
+        for model in dict.fromkeys(models):
+            if not has_seen_field(model):
+                continue
+            deleted, _ = model.objects.filter(node_id=run.node_id).exclude(**{f"{SEEN_FIELD}_id": run.pk}).delete()
+            if deleted:
+                print(f"{model.__name__}: {deleted} rows no longer reported removed.")
+                removed += deleted
+    return removed
+
+
+def plan_upsert(model, instances, unique_fields, seen, result):
+    """
+    Sorts a batch into rows to insert or update by comparing content hashes with the
+    stored rows, counting unchanged rows straight away.
+
+    A key repeated within the batch keeps its last row, as if the rows had been
+    upserted one after another.
+
+    Returns:
+    tuple: ``[data, instance, outcome]`` entries to write, and the primary keys of
+    unchanged rows whose ``last_seen_run`` is not yet the batch's run.
+    """
+    keyed = [(field_values(instance, unique_fields), data, instance) for data, instance in instances]
+    stored = stored_rows(model, {key for key, _, _ in keyed}, unique_fields, seen)
+    pending = {}
+    unchanged = []
+    for key, data, instance in keyed:
+        if key in pending:
+            current = pending[key][1].content_hash
+        else:
+            current = stored[key][1] if key in stored else None
+        if current == instance.content_hash:
+            result.unchanged += 1
+            if seen and key not in pending and stored[key][2] != instance.run_id:
+                unchanged.append(stored[key][0])
+        elif key in pending:
+            result.updated += 1
+            pending[key][:2] = data, instance
+        else:
+            pending[key] = [data, instance, 'inserted' if current is None else 'updated']
+    return list(pending.values()), unchanged
+
+
+def copy_batch(model, pending, unique_fields, update_fields, describe, result):
+    """Writes the planned rows through COPY, or through the ORM if the merge fails."""
+    if not pending:
+        return
+    try:
+        inserted, updated = copy_upsert(
+            model, [instance for _, instance, _ in pending], unique_fields, update_fields,
+            [model._meta.get_field(HASH_FIELD)],
+        )
+    except DatabaseError as e:
+        print(f"COPY into {model._meta.db_table} failed, upserting the batch through the ORM: {e}")
+        upsert_batch(model, pending, unique_fields, update_fields, describe, result)
+        return
+    result.inserted += inserted
+    result.updated += updated
+    result.unchanged += len(pending) - inserted - updated
+
+
+def upsert_batch(model, pending, unique_fields, update_fields, describe, result):
+    """Writes the planned rows with one upsert, or row by row if the batch is rejected."""
+    def upsert(instances):
+        with transaction.atomic():
+            model.objects.bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=[field.name for field in unique_fields],
+                update_fields=[field.name for field in update_fields],
+            )
+
+    if not pending:
+        return
+    try:
+        upsert([instance for _, instance, _ in pending])
+        for _, _, outcome in pending:
+            result.count(outcome)
+    except DatabaseError:
+        for data, instance, outcome in pending:
+            try:
+                upsert([instance])
+                result.count(outcome)
+            except DatabaseError as e:
+                result.fail(describe(data), e)
+
+
+def native_kb(value):
+    """Memory sizes arrive as ints; older parsed rows had them comma-formatted."""
+    return int(value.replace(',', '')) if isinstance(value, str) else int(value)
+
+
+def native_uptime(value):
+    """Uptimes arrive as timedeltas; older parsed rows had them as printed by the MXK."""
+    return parse_uptime(value) if isinstance(value, str) else value
+
+
+def ingest_inventory_backplane_data(run, data_list):
     """
     Ingests a list of inventory backplane data dictionaries into the InventoryBackPlane table.
 
     Parameters:
-    node (Node): The node instance associated with the inventory backplane data.
-    data_list (list): A list of dictionaries containing the inventory backplane data.
+    run (HealthCheckRun): The health check run the inventory backplane data was collected in.
+    data_list (iterable): Dictionaries containing the inventory backplane data.
 
     Example data_list:
     [
@@ -30,38 +325,35 @@ def ingest_inventory_backplane_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            InventoryBackPlane.objects.create(
-                node=node,
-                eeprom_contents=data.get('EEPROM contents', ''),
-                eeprom_id=data.get('EEPROM_ID', ''),
-                version=data.get('Version', ''),
-                size=int(data.get('Size', 0)),
-                card_type=data.get('CardType', ''),
-                card_version=data.get('CardVersion', ''),
-                serial_num=data.get('SerialNum', ''),
-                shelf_number=data.get('ShelfNumber', ''),
-                clei_code=data.get('CLEI Code', ''),
-                cksum=data.get('Cksum', ''),
-                feature_bits_modification_date=data.get('Feature bits modification date', '')
-            )
-            print(f"Data for {data['EEPROM contents']} ingested successfully.")
-        except IntegrityError:
-            print(f"Data for {data['EEPROM contents']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting data for {data['EEPROM contents']}: {e}")
-
-
-def ingest_alarms_data(node, data_list):
+    IngestionResult
+    """
+    def build(data):
+        return InventoryBackPlane(
+            node=run.node,
+            run=run,
+            eeprom_contents=data.get('EEPROM contents', ''),
+            eeprom_id=data.get('EEPROM_ID', ''),
+            version=data.get('Version', ''),
+            size=int(data.get('Size', 0)),
+            card_type=data.get('CardType', ''),
+            card_version=data.get('CardVersion', ''),
+            serial_num=data.get('SerialNum', ''),
+            shelf_number=data.get('ShelfNumber', ''),
+            clei_code=data.get('CLEI Code', ''),
+            cksum=data.get('Cksum', ''),
+            feature_bits_modification_date=data.get('Feature bits modification date', '')
+        )
+
+    return ingest_in_batches(InventoryBackPlane, data_list, build, lambda data: f"Data for {data.get('EEPROM contents')}")
+
+
+def ingest_alarms_data(run, data_list):
     """
     Ingests a list of alarm data dictionaries into the Alarms table.
 
     Parameters:
-    node (Node): The node instance associated with the alarms data.
-    data_list (list): A list of dictionaries containing the alarms data.
+    run (HealthCheckRun): The health check run the alarms data was collected in.
+    data_list (iterable): Dictionaries containing the alarms data.
 
     Example data_list:
     [
@@ -74,30 +366,27 @@ def ingest_alarms_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            Alarms.objects.create(
-                node=node,
-                resource_id=data.get('ResourceId', ''),
-                alarm_type=data.get('AlarmType', ''),
-                alarm_severity=data.get('AlarmSeverity', '')
-            )
-            print(f"Alarm for {data['ResourceId']} ingested successfully.")
-        except IntegrityError:
-            print(f"Alarm for {data['ResourceId']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting alarm for {data['ResourceId']}: {e}")
+    IngestionResult
+    """
+    def build(data):
+        return Alarms(
+            node=run.node,
+            run=run,
+            resource_id=data.get('ResourceId', ''),
+            alarm_type=data.get('AlarmType', ''),
+            alarm_severity=data.get('AlarmSeverity', '')
+        )
+
+    return ingest_in_batches(Alarms, data_list, build, lambda data: f"Alarm for {data.get('ResourceId')}")
 
 
-def ingest_slot_status_data(node, data_list):
+def ingest_slot_status_data(run, data_list):
     """
     Ingests a list of slot status data dictionaries into the SlotStatus table.
 
     Parameters:
-    node (Node): The node instance associated with the slot status data.
-    data_list (list): A list of dictionaries containing the slot status data.
+    run (HealthCheckRun): The health check run the slot status data was collected in.
+    data_list (iterable): Dictionaries containing the slot status data.
 
     Example data_list:
     [
@@ -109,7 +398,7 @@ def ingest_slot_status_data(node, data_list):
             'Type': '*MXK-MC-TOP',
             'Card Version': '800-03681-01-A',
             'Software Version': 'MXK 3.4.2.144.007.2',
-            'Uptime': '149 days, 12 hours, 17 minutes',
+            'Uptime': timedelta(days=149, hours=12, minutes=17),
             'Mode': 'FUNCTIONAL',
             'ROM Version': 'MXK 3.4.2.144.007',
             'Serial Number': '8676551',
@@ -121,41 +410,38 @@ def ingest_slot_status_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            SlotStatus.objects.create(
-                node=node,
-                component=data.get('Component', ''),
-                shelf=int(data.get('Shelf', 0)),
-                slot=data.get('Slot', ''),
-                chassis_type=data.get('Chassis Type', ''),
-                type=data.get('Type', ''),
-                card_version=data.get('Card Version', ''),
-                software_version=data.get('Software Version', ''),
-                uptime=data.get('Uptime', ''),
-                mode=data.get('Mode', ''),
-                rom_version=data.get('ROM Version', ''),
-                serial_number=data.get('Serial Number', ''),
-                additional_information=data.get('Additional Information', ''),
-                state=data.get('State', ''),
-                slots_status=data.get('Slots Status', '')
-            )
-            print(f"Slot status for {data['Slot']} ingested successfully.")
-        except IntegrityError:
-            print(f"Slot status for {data['Slot']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting slot status for {data['Slot']}: {e}")
-
-
-def ingest_card_stats_data(node, data_list):
+    IngestionResult
+    """
+    def build(data):
+        return SlotStatus(
+            node=run.node,
+            run=run,
+            component=data.get('Component', ''),
+            shelf=int(data.get('Shelf', 0)),
+            slot=data.get('Slot', ''),
+            chassis_type=data.get('Chassis Type', ''),
+            type=data.get('Type', ''),
+            card_version=data.get('Card Version', ''),
+            software_version=data.get('Software Version', ''),
+            uptime=native_uptime(data.get('Uptime')),
+            mode=data.get('Mode', ''),
+            rom_version=data.get('ROM Version', ''),
+            serial_number=data.get('Serial Number', ''),
+            additional_information=data.get('Additional Information', ''),
+            state=data.get('State', ''),
+            slots_status=data.get('Slots Status', '')
+        )
+
+    return ingest_in_batches(SlotStatus, data_list, build, lambda data: f"Slot status for {data.get('Slot')}")
+
+
+def ingest_card_stats_data(run, data_list):
     """
     Ingests a list of card stats data dictionaries into the CardStats table.
 
     Parameters:
-    node (Node): The node instance associated with the card stats data.
-    data_list (list): A list of dictionaries containing the card stats data.
+    run (HealthCheckRun): The health check run the card stats data was collected in.
+    data_list (iterable): Dictionaries containing the card stats data.
 
     Example data_list:
     [
@@ -164,48 +450,46 @@ def ingest_card_stats_data(node, data_list):
             'CPU Idle (%)': 91,
             'CPU Usage (%)': 9,
             'Memory Utilization (%)': 47.14,
-            'Card Memory Used (KB)': '754,780',
-            'Card Memory Peak (KB)': '356,499',
-            'Card Memory Available (KB)': '398,997',
+            'Card Memory Used (KB)': 754780,
+            'Card Memory Peak (KB)': 356499,
+            'Card Memory Available (KB)': 398997,
             'Status': '1 - OK',
-            'Uptime': '149:12:05:49',
+            'Uptime': timedelta(days=149, hours=12, minutes=5, seconds=49),
             'Software Version': 'MXK 3.4.2.144.007.2'
         },
         ...
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            CardStats.objects.create(
-                node=node,
-                slot=data.get('Slot', ''),
-                cpu_idle_percent=int(data.get('CPU Idle (%)', 0)),
-                cpu_usage_percent=int(data.get('CPU Usage (%)', 0)),
-                memory_utilization_percent=float(data.get('Memory Utilization (%)', 0)),
-                card_memory_used_kb=data.get('Card Memory Used (KB)', '').replace(',', ''),
-                card_memory_peak_kb=data.get('Card Memory Peak (KB)', '').replace(',', ''),
-                card_memory_available_kb=data.get('Card Memory Available (KB)', '').replace(',', ''),
-                status=data.get('Status', ''),
-                uptime=data.get('Uptime', ''),
-                software_version=data.get('Software Version', '')
-            )
-            print(f"Card stats for slot {data['Slot']} ingested successfully.")
-        except IntegrityError:
-            print(f"Card stats for slot {data['Slot']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting card stats for slot {data['Slot']}: {e}")
-
-
-def ingest_onu_line_status_data(node, data_list):
+    IngestionResult
+    """
+    def build(data):
+        return CardStats(
+            node=run.node,
+            run=run,
+            collected_at=run.collected_at,
+            slot=data.get('Slot', ''),
+            cpu_idle_percent=int(data.get('CPU Idle (%)', 0)),
+            cpu_usage_percent=int(data.get('CPU Usage (%)', 0)),
+            memory_utilization_percent=float(data.get('Memory Utilization (%)', 0)),
+            card_memory_used_kb=native_kb(data.get('Card Memory Used (KB)', 0)),
+            card_memory_peak_kb=native_kb(data.get('Card Memory Peak (KB)', 0)),
+            card_memory_available_kb=native_kb(data.get('Card Memory Available (KB)', 0)),
+            status=data.get('Status', ''),
+            uptime=native_uptime(data.get('Uptime')),
+            software_version=data.get('Software Version', '')
+        )
+
+    return ingest_in_batches(CardStats, data_list, build, lambda data: f"Card stats for slot {data.get('Slot')}")
+
+
+def ingest_onu_line_status_data(run, data_list):
     """
     Ingests a list of ONU line status data dictionaries into the OnuLineStatus table.
 
     Parameters:
-    node (Node): The node instance associated with the ONU line status data.
-    data_list (list): A list of dictionaries containing the ONU line status data.
+    run (HealthCheckRun): The health check run the ONU line status data was collected in.
+    data_list (iterable): Dictionaries containing the ONU line status data.
 
     Example data_list:
     [
@@ -215,84 +499,40 @@ def ingest_onu_line_status_data(node, data_list):
             'Port': '1',
             'Channel': '0',
             'Line Type': 'ONU subport',
-            '1': 'ACT',
-            '2': 'ACT',
-            '3': 'ACT',
-            '4': 'ACT',
-            '5': 'ACT',
-            '6': 'ACT',
-            '7': 'ACT',
-            '8': 'ACT',
-            '9': 'ACT',
-            '10': 'ACT',
-            '11': 'ACT',
-            '12': 'ACT',
-            '13': 'ACT',
-            '14': 'OOS',
-            ...
+            'Subport Status': bytes([1, 1, 2, ...]),  # SubportStatus code per subport: ACT, ACT, OOS, ...
         },
         ...
     ]
 
-    Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            OnuLineStatus.objects.create(
-                node=node,
-                shelf=int(data.get('Shelf', 0)),
-                slot=int(data.get('Slot', 0)),
-                port=int(data.get('Port', 0)),
-                channel=int(data.get('Channel', 0)),
-                line_type=data.get('Line Type', ''),
-                line_1=data.get('1', ''),
-                line_2=data.get('2', ''),
-                line_3=data.get('3', ''),
-                line_4=data.get('4', ''),
-                line_5=data.get('5', ''),
-                line_6=data.get('6', ''),
-                line_7=data.get('7', ''),
-                line_8=data.get('8', ''),
-                line_9=data.get('9', ''),
-                line_10=data.get('10', ''),
-                line_11=data.get('11', ''),
-                line_12=data.get('12', ''),
-                line_13=data.get('13', ''),
-                line_14=data.get('14', ''),
-                line_15=data.get('15', ''),
-                line_16=data.get('16', ''),
-                line_17=data.get('17', ''),
-                line_18=data.get('18', ''),
-                line_19=data.get('19', ''),
-                line_20=data.get('20', ''),
-                line_21=data.get('21', ''),
-                line_22=data.get('22', ''),
-                line_23=data.get('23', ''),
-                line_24=data.get('24', ''),
-                line_25=data.get('25', ''),
-                line_26=data.get('26', ''),
-                line_27=data.get('27', ''),
-                line_28=data.get('28', ''),
-                line_29=data.get('29', ''),
-                line_30=data.get('30', ''),
-                line_31=data.get('31', ''),
-                line_32=data.get('32', '')
-            )
-            print(f"ONU line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']} ingested successfully.")
-        except IntegrityError:
-            print(f"ONU line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting ONU line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']}: {e}")
-
+    Rows in the older one key per subport form ('1': 'ACT', ...) are packed on the way in.
 
-def ingest_olt_line_status_data(node, data_list):
+    Returns:
+    IngestionResult
+    """
+    def build(data):
+        codes = data.get('Subport Status') or pack_statuses(data)
+        return OnuLineStatus(
+            node=run.node,
+            run=run,
+            shelf=int(data.get('Shelf', 0)),
+            slot=int(data.get('Slot', 0)),
+            port=int(data.get('Port', 0)),
+            channel=int(data.get('Channel', 0)),
+            line_type=data.get('Line Type', ''),
+            subport_status=codes,
+            active_subport_count=count_status(codes, SubportStatus.ACT),
+        )
+
+    return ingest_in_batches(OnuLineStatus, data_list, build, lambda data: f"ONU line status for shelf {data.get('Shelf')} slot {data.get('Slot')} port {data.get('Port')}")
+
+
+def ingest_olt_line_status_data(run, data_list):
     """
     Ingests a list of OLT line status data dictionaries into the OltLineStatus table.
 
     Parameters:
-    node (Node): The node instance associated with the OLT line status data.
-    data_list (list): A list of dictionaries containing the OLT line status data.
+    run (HealthCheckRun): The health check run the OLT line status data was collected in.
+    data_list (iterable): Dictionaries containing the OLT line status data.
 
     Example data_list:
     [
@@ -302,68 +542,38 @@ def ingest_olt_line_status_data(node, data_list):
             'Port': '1',
             'Channel': '0',
             'Line Type': 'OLT subport',
-            '1': 'ACT',
-            '2': 'ACT',
-            '3': 'ACT',
-            '4': 'ACT',
-            '5': 'ACT',
-            '6': 'ACT',
-            '7': 'ACT',
-            '8': 'ACT',
-            '9': 'ACT',
-            '10': 'ACT',
-            '11': 'ACT',
-            '12': 'ACT',
-            '13': 'ACT',
-            '14': 'ACT',
-            ...
+            'Subport Status': bytes([1, 1, 2, ...]),  # SubportStatus code per subport: ACT, ACT, OOS, ...
         },
         ...
     ]
 
-    Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            OltLineStatus.objects.create(
-                node=node,
-                shelf=int(data.get('Shelf', 0)),
-                slot=int(data.get('Slot', 0)),
-                port=int(data.get('Port', 0)),
-                channel=int(data.get('Channel', 0)),
-                line_type=data.get('Line Type', ''),
-                line_1=data.get('1', ''),
-                line_2=data.get('2', ''),
-                line_3=data.get('3', ''),
-                line_4=data.get('4', ''),
-                line_5=data.get('5', ''),
-                line_6=data.get('6', ''),
-                line_7=data.get('7', ''),
-                line_8=data.get('8', ''),
-                line_9=data.get('9', ''),
-                line_10=data.get('10', ''),
-                line_11=data.get('11', ''),
-                line_12=data.get('12', ''),
-                line_13=data.get('13', ''),
-                line_14=data.get('14', ''),
-                line_15=data.get('15', ''),
-                line_16=data.get('16', '')
-            )
-            print(f"OLT line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']} ingested successfully.")
-        except IntegrityError:
-            print(f"OLT line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting OLT line status for shelf {data['Shelf']} slot {data['Slot']} port {data['Port']}: {e}")
-
+    Rows in the older one key per subport form ('1': 'ACT', ...) are packed on the way in.
 
-def ingest_gpon_onu_stats_data(node, data_list):
+    Returns:
+    IngestionResult
+    """
+    def build(data):
+        return OltLineStatus(
+            node=run.node,
+            run=run,
+            shelf=int(data.get('Shelf', 0)),
+            slot=int(data.get('Slot', 0)),
+            port=int(data.get('Port', 0)),
+            channel=int(data.get('Channel', 0)),
+            line_type=data.get('Line Type', ''),
+            subport_status=data.get('Subport Status') or pack_statuses(data)
+        )
+
+    return ingest_in_batches(OltLineStatus, data_list, build, lambda data: f"OLT line status for shelf {data.get('Shelf')} slot {data.get('Slot')} port {data.get('Port')}")
+
+
+def ingest_gpon_onu_stats_data(run, data_list):
     """
     Ingests a list of GPON ONU stats data dictionaries into the GponOnuStats table.
 
     Parameters:
-    node (Node): The node instance associated with the GPON ONU stats data.
-    data_list (list): A list of dictionaries containing the GPON ONU stats data.
+    run (HealthCheckRun): The health check run the GPON ONU stats data was collected in.
+    data_list (iterable): Dictionaries containing the GPON ONU stats data.
 
     Example data_list:
     [
@@ -388,42 +598,40 @@ def ingest_gpon_onu_stats_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            GponOnuStats.objects.create(
-                node=node,
-                slot=data.get('Slot', ''),
-                sub_port=data.get('Sub Port', ''),
-                upstream_bip_units=data.get('Upstream Bip UNits', 0),
-                fec_corrected_bytes=data.get('FEC Corrected Bytes', 0),
-                fec_corrected_codewords=data.get('FEC Corrected codewords', 0),
-                fec_uncorrected_codewords=data.get('FEC Uncorrected codewords', 0),
-                total_received_codewords=data.get('Total received codewords', 0),
-                received_bytes=data.get('received bytes', 0),
-                received_packets=data.get('received packets', 0),
-                transmitted_bytes=data.get('transmitted bytes', 0),
-                transmitted_packets=data.get('transmitted packets', 0),
-                unreceived_bursts=data.get('Unreceived bursts', 0),
-                bip_error=data.get('BIP Error', 0),
-                remote_bip_error=data.get('Remote BIP Error', 0),
-                drift_of_window_indications=data.get('Drift of Window Indications', 0)
-            )
-            print(f"GPON ONU stats for slot {data['Slot']} sub port {data['Sub Port']} ingested successfully.")
-        except IntegrityError:
-            print(f"GPON ONU stats for slot {data['Slot']} sub port {data['Sub Port']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting GPON ONU stats for slot {data['Slot']} sub port {data['Sub Port']}: {e}")
-
-
-def ingest_network_interface_data(node, data_list):
+    IngestionResult
+    """
+    def build(data):
+        return GponOnuStats(
+            node=run.node,
+            run=run,
+            collected_at=run.collected_at,
+            slot=data.get('Slot', ''),
+            sub_port=data.get('Sub Port', ''),
+            upstream_bip_units=data.get('Upstream Bip UNits', 0),
+            fec_corrected_bytes=data.get('FEC Corrected Bytes', 0),
+            fec_corrected_codewords=data.get('FEC Corrected codewords', 0),
+            fec_uncorrected_codewords=data.get('FEC Uncorrected codewords', 0),
+            total_received_codewords=data.get('Total received codewords', 0),
+            received_bytes=data.get('received bytes', 0),
+            received_packets=data.get('received packets', 0),
+            transmitted_bytes=data.get('transmitted bytes', 0),
+            transmitted_packets=data.get('transmitted packets', 0),
+            unreceived_bursts=data.get('Unreceived bursts', 0),
+            bip_error=data.get('BIP Error', 0),
+            remote_bip_error=data.get('Remote BIP Error', 0),
+            drift_of_window_indications=data.get('Drift of Window Indications', 0)
+        )
+
+    return ingest_in_batches(GponOnuStats, data_list, build, lambda data: f"GPON ONU stats for slot {data.get('Slot')} sub port {data.get('Sub Port')}")
+
+
+def ingest_network_interface_data(run, data_list):
     """
     Ingests a list of network interface data dictionaries into the NetworkInterface table.
 
     Parameters:
-    node (Node): The node instance associated with the network interface data.
-    data_list (list): A list of dictionaries containing the network interface data.
+    run (HealthCheckRun): The health check run the network interface data was collected in.
+    data_list (iterable): Dictionaries containing the network interface data.
 
     Example data_list:
     [
@@ -445,40 +653,37 @@ def ingest_network_interface_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            NetworkInterface.objects.create(
-                node=node,
-                interface=data.get('Interface', ''),
-                vendor_name=data.get('Vendor Name', ''),
-                vendor_oui=data.get('Vendor OUI', ''),
-                vendor_part_number=data.get('Vendor Part Number', ''),
-                vendor_revision_level=data.get('Vendor Revision Level', ''),
-                serial_number=data.get('Serial Number', ''),
-                manufacturing_date=data.get('Manufacturing Date', '1900-01-01'),
-                connector_type=data.get('Connector Type', ''),
-                transceiver_type=data.get('Transceiver Type', ''),
-                nominal_bit_rate_gbps=int(data.get('Nominal Bit Rate (Gbps)', 0)),
-                fiber_link_length_km=int(data.get('9/125mm Fiber Link Length (km)', 0)),
-                fiber_link_length_100m=int(data.get('9/125mm Fiber Link Length (100m)', 0))
-            )
-            print(f"Network interface {data['Interface']} ingested successfully.")
-        except IntegrityError:
-            print(f"Network interface {data['Interface']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting network interface {data['Interface']}: {e}")
-
-
-
-def ingest_inventory_card_data(node, data_list):
+    IngestionResult
+    """
+    def build(data):
+        return NetworkInterface(
+            node=run.node,
+            run=run,
+            interface=data.get('Interface', ''),
+            vendor_name=data.get('Vendor Name', ''),
+            vendor_oui=data.get('Vendor OUI', ''),
+            vendor_part_number=data.get('Vendor Part Number', ''),
+            vendor_revision_level=data.get('Vendor Revision Level', ''),
+            serial_number=data.get('Serial Number', ''),
+            manufacturing_date=data.get('Manufacturing Date', '1900-01-01'),
+            connector_type=data.get('Connector Type', ''),
+            transceiver_type=data.get('Transceiver Type', ''),
+            nominal_bit_rate_gbps=int(data.get('Nominal Bit Rate (Gbps)', 0)),
+            fiber_link_length_km=int(data.get('9/125mm Fiber Link Length (km)', 0)),
+            fiber_link_length_100m=int(data.get('9/125mm Fiber Link Length (100m)', 0))
+        )
+
+    return ingest_in_batches(NetworkInterface, data_list, build, lambda data: f"Network interface {data.get('Interface')}")
+
+
+
+def ingest_inventory_card_data(run, data_list):
     """
     Ingests a list of inventory card data dictionaries into the InventoryCard table.
 
     Parameters:
-    node (Node): The node instance associated with the inventory card data.
-    data_list (list): A list of dictionaries containing the inventory card data.
+    run (HealthCheckRun): The health check run the inventory card data was collected in.
+    data_list (iterable): Dictionaries containing the inventory card data.
 
     Example data_list:
     [
@@ -491,24 +696,19 @@ def ingest_inventory_card_data(node, data_list):
     ]
 
     Returns:
-    None
-    """
-    for data in data_list:
-        try:
-            # Parse the timestamp to the correct format
-            timestamp_str = data.get('Timestamp', '1900-01-01 00:00:00')
-            timestamp = datetime.strptime(timestamp_str, '%b %d %Y, %H:%M:%S')
-
-            InventoryCard.objects.create(
-                node=node,
-                card=data.get('Card', ''),
-                rom_version=data.get('ROM Version', ''),
-                timestamp=timestamp
-            )
-            print(f"Inventory card {data['Card']} ingested successfully.")
-        except ValueError as ve:
-            print(f"Error parsing date for inventory card {data['Card']}: {ve}")
-        except IntegrityError:
-            print(f"Inventory card {data['Card']} already exists and was not ingested.")
-        except Exception as e:
-            print(f"Error ingesting inventory card {data['Card']}: {e}")
+    IngestionResult
+    """
+    def build(data):
+        # Parse the timestamp to the correct format
+        timestamp_str = data.get('Timestamp', '1900-01-01 00:00:00')
+        timestamp = timezone.make_aware(datetime.strptime(timestamp_str, '%b %d %Y, %H:%M:%S'))
+
+        return InventoryCard(
+            node=run.node,
+            run=run,
+            card=data.get('Card', ''),
+            rom_version=data.get('ROM Version', ''),
+            timestamp=timestamp
+        )
+
+    return ingest_in_batches(InventoryCard, data_list, build, lambda data: f"Inventory card {data.get('Card')}")
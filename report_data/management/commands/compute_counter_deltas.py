@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from report_data.counter_deltas import compute_gpon_deltas
+from report_data.models import HealthCheckRun
+
+
+class Command(BaseCommand):
+    help = 'Compute GPON ONU counter deltas between consecutive health check runs of every node'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--node', action='append', help='Only the runs of this node IP (repeatable)')
+        parser.add_argument('--recompute', action='store_true', help='Also recompute runs that already have deltas')
+        parser.add_argument('--chunk-size', type=int, default=200, help='Runs diffed together per query')
+
+    def handle(self, *args, **options):
+        runs = HealthCheckRun.objects.all()
+        if options['node']:
+            runs = runs.filter(node_id__in=options['node'])
+        if not options['recompute']:
+            runs = runs.filter(gpon_onu_deltas=None)
+
+        start = time.perf_counter()
+        written = compute_gpon_deltas(runs, chunk_size=options['chunk_size'])
+        self.stdout.write(f"{written} delta rows written in {time.perf_counter() - start:.2f} s")
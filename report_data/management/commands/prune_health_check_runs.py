@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from report_data.models import HealthCheckRun
+from report_data.retention import prune_runs, runs_to_prune
+
+
+class Command(BaseCommand):
+    help = 'Downsample and expire health check runs and their counter snapshots per the retention settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the runs that would be deleted')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f"Keeping every run for {settings.HEALTH_CHECK_FULL_RESOLUTION_DAYS} days, then one per node every "
+            f"{settings.HEALTH_CHECK_DOWNSAMPLE_DAYS} days up to {settings.HEALTH_CHECK_RETENTION_DAYS} days"
+        )
+        if options['dry_run']:
+            pks = runs_to_prune()
+            self.stdout.write(f"{len(pks)} of {HealthCheckRun.objects.count()} runs would be deleted")
+            return
+        deleted = prune_runs()
+        self.stdout.write(f"Deleted {deleted} runs, {HealthCheckRun.objects.count()} remain")
@@ -0,0 +1,105 @@
+from django.db import migrations, models
+
+LINE_COLUMNS = {
+    'oltlinestatus': 16,
+    'onulinestatus': 32,
+}
+MODEL_NAMES = {
+    'oltlinestatus': 'OltLineStatus',
+    'onulinestatus': 'OnuLineStatus',
+}
+BATCH_SIZE = 1000
+
+# The packed format of this migration, copied from report.subport_status so that later
+# changes to the app leave it as it is: one byte per subport holding its status code, 0
+# for a subport missing from the output and 255 for a status outside the table.
+STATUS_CODES = {'ACT': 1, 'OOS': 2, 'NONE': 3, 'DSA': 4, 'ADN': 5, 'TST': 6, 'INIT': 7}
+UNKNOWN = 255
+STATUS_NAMES = {**{code: name for name, code in STATUS_CODES.items()}, UNKNOWN: 'UNKNOWN'}
+
+
+def pack_statuses(statuses):
+    subports = {int(key): status for key, status in statuses.items() if key.isdigit() and int(key) > 0}
+    codes = bytearray(max(subports, default=0))
+    for subport, status in subports.items():
+        codes[subport - 1] = STATUS_CODES.get(status, UNKNOWN)
+    return bytes(codes)
+
+
+def unpack_statuses(codes):
+    return {str(subport): STATUS_NAMES[code] for subport, code in enumerate(bytes(codes), start=1) if code}
+
+
+def update_in_batches(model, read_fields, write_fields, convert):
+    """Converts every row of ``model`` and saves ``write_fields`` with one UPDATE per batch."""
+    batch = []
+    for row in model.objects.only('pk', *read_fields).iterator(chunk_size=BATCH_SIZE):
+        convert(row)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, write_fields)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, write_fields)
+
+
+def pack_line_columns(apps, schema_editor):
+    for model_name, columns in LINE_COLUMNS.items():
+        line_fields = [f'line_{i}' for i in range(1, columns + 1)]
+
+        def pack(row):
+            statuses = {str(i): getattr(row, field) for i, field in enumerate(line_fields, start=1)}
+            row.subport_status = pack_statuses({key: value for key, value in statuses.items() if value})
+
+        model = apps.get_model('report_data', MODEL_NAMES[model_name])
+        update_in_batches(model, line_fields, ['subport_status'], pack)
+
+
+def unpack_line_columns(apps, schema_editor):
+    for model_name, columns in LINE_COLUMNS.items():
+        line_fields = [f'line_{i}' for i in range(1, columns + 1)]
+
+        def unpack(row):
+            statuses = unpack_statuses(row.subport_status)
+            for i, field in enumerate(line_fields, start=1):
+                setattr(row, field, statuses.get(str(i), ''))
+
+        model = apps.get_model('report_data', MODEL_NAMES[model_name])
+        update_in_batches(model, ['subport_status'], line_fields, unpack)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_data', '0002_slotstatus_chassis_type'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='subport_status',
+                field=models.BinaryField(default=b''),
+            )
+            for model_name in LINE_COLUMNS
+        ],
+        migrations.RunPython(pack_line_columns, unpack_line_columns),
+        # A default lets the columns be added back to populated tables when reversing
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name=f'line_{i}',
+                field=models.CharField(default='', max_length=10),
+            )
+            for model_name, columns in LINE_COLUMNS.items()
+            for i in range(1, columns + 1)
+        ],
+        *[
+            migrations.RemoveField(
+                model_name=model_name,
+                name=f'line_{i}',
+            )
+            for model_name, columns in LINE_COLUMNS.items()
+            for i in range(1, columns + 1)
+        ],
+    ]
@@ -0,0 +1,112 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+STATE_MODELS = [
+    'inventorybackplane', 'inventorycard', 'networkinterface', 'alarms',
+    'oltlinestatus', 'onulinestatus', 'slotstatus',
+]
+COUNTER_MODELS = ['cardstats', 'gpononustats']
+
+
+def attach_existing_rows(apps, schema_editor):
+    # Rows ingested before runs existed become one run per node, collected now
+    HealthCheckRun = apps.get_model('report_data', 'HealthCheckRun')
+    Node = apps.get_model('report_data', 'Node')
+    collected_at = timezone.now()
+    for node in Node.objects.all().iterator():
+        run = HealthCheckRun.objects.create(node=node, checksum='', collected_at=collected_at)
+        for model_name in STATE_MODELS:
+            apps.get_model('report_data', model_name).objects.filter(node=node).update(run=run)
+        for model_name in COUNTER_MODELS:
+            apps.get_model('report_data', model_name).objects.filter(node=node).update(
+                run=run, collected_at=collected_at,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report', '0001_initial'),
+        ('report_data', '0003_packed_subport_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HealthCheckRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('checksum', models.CharField(max_length=32)),
+                ('collected_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('file_upload', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='report.fileupload')),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='runs', to='report_data.node')),
+            ],
+            options={
+                'db_table': 'data_health_check_run',
+                'unique_together': {('node', 'checksum')},
+                'indexes': [models.Index(fields=['node', 'collected_at'], name='data_health_node_id_93cc6b_idx')],
+            },
+        ),
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='run',
+                field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='report_data.healthcheckrun'),
+            )
+            for model_name in STATE_MODELS
+        ],
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='run',
+                field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='report_data.healthcheckrun'),
+            )
+            for model_name in COUNTER_MODELS
+        ],
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='collected_at',
+                field=models.DateTimeField(null=True),
+            )
+            for model_name in COUNTER_MODELS
+        ],
+        migrations.RunPython(attach_existing_rows, migrations.RunPython.noop),
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name='run',
+                field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='report_data.healthcheckrun'),
+            )
+            for model_name in COUNTER_MODELS
+        ],
+        *[
+            migrations.AlterField(
+                model_name=model_name,
+                name='collected_at',
+                field=models.DateTimeField(),
+            )
+            for model_name in COUNTER_MODELS
+        ],
+        migrations.AlterUniqueTogether(
+            name='cardstats',
+            unique_together={('run', 'slot')},
+        ),
+        migrations.AlterUniqueTogether(
+            name='gpononustats',
+            unique_together={('run', 'slot', 'sub_port')},
+        ),
+        migrations.AddIndex(
+            model_name='cardstats',
+            index=models.Index(fields=['node', 'collected_at'], name='data_card_s_node_id_c5e416_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gpononustats',
+            index=models.Index(fields=['node', 'collected_at'], name='data_gpon_o_node_id_78a34b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='gpononustats',
+            index=models.Index(fields=['node', 'slot', 'sub_port', 'collected_at'], name='data_gpon_o_node_id_5c2f45_idx'),
+        ),
+    ]
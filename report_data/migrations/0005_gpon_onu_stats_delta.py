@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_data', '0004_health_check_runs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GponOnuStatsDelta',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collected_at', models.DateTimeField()),
+                ('interval_seconds', models.FloatField()),
+                ('slot', models.CharField(max_length=5)),
+                ('sub_port', models.CharField(max_length=10)),
+                ('counter_reset', models.BooleanField(default=False)),
+                ('upstream_bip_units', models.BigIntegerField()),
+                ('fec_corrected_bytes', models.BigIntegerField()),
+                ('fec_corrected_codewords', models.BigIntegerField()),
+                ('fec_uncorrected_codewords', models.BigIntegerField()),
+                ('total_received_codewords', models.BigIntegerField()),
+                ('received_bytes', models.BigIntegerField()),
+                ('received_packets', models.BigIntegerField()),
+                ('transmitted_bytes', models.BigIntegerField()),
+                ('transmitted_packets', models.BigIntegerField()),
+                ('unreceived_bursts', models.BigIntegerField()),
+                ('bip_error', models.BigIntegerField()),
+                ('remote_bip_error', models.BigIntegerField()),
+                ('drift_of_window_indications', models.BigIntegerField()),
+                ('node', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='report_data.node')),
+                ('previous_run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='report_data.healthcheckrun')),
+                ('run', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gpon_onu_deltas', to='report_data.healthcheckrun')),
+            ],
+            options={
+                'db_table': 'data_gpon_onu_stats_delta',
+                'indexes': [models.Index(fields=['node', 'collected_at'], name='data_gpon_o_node_id_a6c686_idx')],
+                'unique_together': {('run', 'slot', 'sub_port')},
+            },
+        ),
+    ]
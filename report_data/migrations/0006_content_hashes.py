@@ -0,0 +1,43 @@
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F
+
+STATE_MODELS = [
+    'alarms', 'inventorybackplane', 'inventorycard', 'networkinterface',
+    'oltlinestatus', 'onulinestatus', 'slotstatus',
+]
+COUNTER_MODELS = ['cardstats', 'gpononustats']
+
+
+def mark_rows_seen(apps, schema_editor):
+    # Stored rows were last seen by the run that wrote them. Their content hash is left
+    # empty, so each is rewritten once, with its hash, the next time it is ingested.
+    for model_name in STATE_MODELS:
+        apps.get_model('report_data', model_name).objects.update(last_seen_run=F('run'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_data', '0005_gpon_onu_stats_delta'),
+    ]
+
+    operations = [
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='content_hash',
+                field=models.CharField(default='', max_length=32),
+            )
+            for model_name in STATE_MODELS + COUNTER_MODELS
+        ],
+        *[
+            migrations.AddField(
+                model_name=model_name,
+                name='last_seen_run',
+                field=models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='report_data.healthcheckrun'),
+            )
+            for model_name in STATE_MODELS
+        ],
+        migrations.RunPython(mark_rows_seen, migrations.RunPython.noop),
+    ]
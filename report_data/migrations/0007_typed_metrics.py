@@ -0,0 +1,137 @@
+import re
+from datetime import timedelta
+
+from django.db import migrations, models
+
+MEMORY_FIELDS = ['card_memory_used_kb', 'card_memory_peak_kb', 'card_memory_available_kb']
+BATCH_SIZE = 1000
+
+# The uptime forms of this migration, copied from report.uptime so that later changes to
+# the app leave it as it is: 'cardstats' prints days:hours:minutes:seconds and
+# 'slots <slot>' prints '3 days, 16 hours, 14 minutes'
+CLOCK_PATTERN = re.compile(r'^(\d+):(\d{2}):(\d{2}):(\d{2})$')
+UNIT_PATTERN = re.compile(r'(\d+)\s*(day|hour|minute|second)s?\b')
+
+
+def parse_uptime(text):
+    text = (text or '').strip()
+    match = CLOCK_PATTERN.match(text)
+    if match:
+        days, hours, minutes, seconds = map(int, match.groups())
+        return timedelta(days=days, hours=hours, minutes=minutes, seconds=seconds)
+    units = UNIT_PATTERN.findall(text)
+    if not units:
+        return None
+    return timedelta(**{f"{unit}s": int(value) for value, unit in units})
+
+
+def format_clock_uptime(uptime):
+    minutes, seconds = divmod(uptime.seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{uptime.days}:{hours:02}:{minutes:02}:{seconds:02}"
+
+
+def format_unit_uptime(uptime):
+    hours, minutes = divmod(uptime.seconds // 60, 60)
+    return f"{uptime.days} days, {hours} hours, {minutes} minutes"
+
+
+def parse_kb(text):
+    digits = (text or '').replace(',', '').strip()
+    return int(digits) if digits.isdigit() else 0
+
+
+def update_in_batches(model, read_fields, write_fields, convert):
+    """Converts every row of ``model`` and saves ``write_fields`` with one UPDATE per batch."""
+    batch = []
+    for row in model.objects.only('pk', *read_fields).iterator(chunk_size=BATCH_SIZE):
+        convert(row)
+        batch.append(row)
+        if len(batch) == BATCH_SIZE:
+            model.objects.bulk_update(batch, write_fields)
+            batch = []
+    if batch:
+        model.objects.bulk_update(batch, write_fields)
+
+
+def convert_to_native(apps, schema_editor):
+    def card_stats_to_native(row):
+        for name in MEMORY_FIELDS:
+            setattr(row, name, parse_kb(getattr(row, f'{name}_text')))
+        row.uptime = parse_uptime(row.uptime_text)
+
+    def slot_status_to_native(row):
+        row.uptime = parse_uptime(row.uptime_text)
+
+    update_in_batches(
+        apps.get_model('report_data', 'CardStats'), [f'{name}_text' for name in MEMORY_FIELDS] + ['uptime_text'],
+        MEMORY_FIELDS + ['uptime'], card_stats_to_native,
+    )
+    update_in_batches(apps.get_model('report_data', 'SlotStatus'), ['uptime_text'], ['uptime'], slot_status_to_native)
+
+
+def convert_to_text(apps, schema_editor):
+    def card_stats_to_text(row):
+        for name in MEMORY_FIELDS:
+            setattr(row, f'{name}_text', '' if getattr(row, name) is None else str(getattr(row, name)))
+        row.uptime_text = format_clock_uptime(row.uptime) if row.uptime is not None else ''
+
+    def slot_status_to_text(row):
+        row.uptime_text = format_unit_uptime(row.uptime) if row.uptime is not None else ''
+
+    update_in_batches(
+        apps.get_model('report_data', 'CardStats'), MEMORY_FIELDS + ['uptime'],
+        [f'{name}_text' for name in MEMORY_FIELDS] + ['uptime_text'], card_stats_to_text,
+    )
+    update_in_batches(apps.get_model('report_data', 'SlotStatus'), ['uptime'], ['uptime_text'], slot_status_to_text)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_data', '0006_content_hashes'),
+    ]
+
+    operations = [
+        # The text columns are kept under a new name until their values are converted
+        *[
+            migrations.RenameField(model_name='cardstats', old_name=name, new_name=f'{name}_text')
+            for name in MEMORY_FIELDS + ['uptime']
+        ],
+        migrations.RenameField(model_name='slotstatus', old_name='uptime', new_name='uptime_text'),
+        *[
+            migrations.AddField(model_name='cardstats', name=name, field=models.BigIntegerField(null=True))
+            for name in MEMORY_FIELDS
+        ],
+        migrations.AddField(model_name='cardstats', name='uptime', field=models.DurationField(null=True)),
+        migrations.AddField(model_name='slotstatus', name='uptime', field=models.DurationField(null=True)),
+        migrations.RunPython(convert_to_native, convert_to_text),
+        # With a default, the text columns can be added back when the migration is reversed
+        *[
+            migrations.AlterField(model_name='cardstats', name=f'{name}_text', field=models.CharField(max_length=20, default=''))
+            for name in MEMORY_FIELDS + ['uptime']
+        ],
+        migrations.AlterField(model_name='slotstatus', name='uptime_text', field=models.CharField(max_length=50, default='')),
+        *[
+            migrations.RemoveField(model_name='cardstats', name=f'{name}_text')
+            for name in MEMORY_FIELDS + ['uptime']
+        ],
+        migrations.RemoveField(model_name='slotstatus', name='uptime_text'),
+        *[
+            migrations.AlterField(model_name='cardstats', name=name, field=models.BigIntegerField())
+            for name in MEMORY_FIELDS
+        ],
+        migrations.AlterField(
+            model_name='gpononustats',
+            name='upstream_bip_units',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='cardstats',
+            index=models.Index(fields=['memory_utilization_percent'], name='data_card_s_memory__f6209f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='slotstatus',
+            index=models.Index(fields=['uptime'], name='data_slot_s_uptime_d2805b_idx'),
+        ),
+    ]
@@ -0,0 +1,115 @@
+from collections import defaultdict
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Max, Q
+
+# Figures of report_data.summary as of this migration, copied so that later changes to
+# the app leave it as it is. Subport statuses are packed one byte per subport, 1 = ACT.
+ACT = 1
+
+
+def distinct_by_node(queryset, field):
+    values = defaultdict(list)
+    for node_id, value in queryset.values_list('node_id', field).distinct().order_by('node_id', field):
+        values[node_id].append(value)
+    return values
+
+
+def slot_figures(slot_status_data):
+    chassis_types = distinct_by_node(slot_status_data, 'chassis_type')
+    software_versions = distinct_by_node(slot_status_data, 'software_version')
+    rom_versions = distinct_by_node(slot_status_data, 'rom_version')
+
+    figures = {}
+    card_counts = slot_status_data.values('node_id', 'type').annotate(
+        cards=Count('pk'),
+        offline=Count('pk', filter=Q(mode='non-functional')),
+        uptime=Max('uptime'),
+    ).order_by('node_id', 'type')
+    for row in card_counts:
+        node_figures = figures.setdefault(row['node_id'], {
+            'chassis_types': ', '.join(chassis_types[row['node_id']]),
+            'software_versions': ', '.join(software_versions[row['node_id']]),
+            'rom_versions': ', '.join(rom_versions[row['node_id']]),
+            'active_cards': [],
+            'offline_cards': 0,
+            'uptime': None,
+        })
+        node_figures['active_cards'].append(f"{row['type']} ({row['cards']})")
+        node_figures['offline_cards'] += row['offline']
+        if row['uptime'] is not None and (node_figures['uptime'] is None or row['uptime'] > node_figures['uptime']):
+            node_figures['uptime'] = row['uptime']
+    for node_figures in figures.values():
+        node_figures['active_cards'] = ', '.join(node_figures['active_cards'])
+    return figures
+
+
+def interface_figures(network_interface_data):
+    sfp_types = defaultdict(list)
+    vendor_counts = network_interface_data.values('node_id', 'vendor_name').annotate(
+        interfaces=Count('pk'),
+    ).order_by('node_id', 'vendor_name')
+    for row in vendor_counts:
+        sfp_types[row['node_id']].append(f"{row['vendor_name']} X {row['interfaces']}")
+    return {node_id: {'sfp_types': ', '.join(types)} for node_id, types in sfp_types.items()}
+
+
+def line_status_figures(onu_line_status_data):
+    figures = {}
+    for node_id, codes in onu_line_status_data.values_list('node_id', 'subport_status').iterator():
+        node_figures = figures.setdefault(node_id, {'pon_ports_active': 0, 'pon_ports_offline': 0, 'onts': 0})
+        onts = bytes(codes).count(ACT)
+        node_figures['pon_ports_active' if onts else 'pon_ports_offline'] += 1
+        node_figures['onts'] += onts
+    return figures
+
+
+SUMMARY_SECTIONS = {
+    'SlotStatus': slot_figures,
+    'NetworkInterface': interface_figures,
+    'OnuLineStatus': line_status_figures,
+}
+
+
+def summarize_nodes(apps, schema_editor):
+    by_node = defaultdict(dict)
+    for model_name, figures in SUMMARY_SECTIONS.items():
+        for node_id, node_figures in figures(apps.get_model('report_data', model_name).objects.all()).items():
+            by_node[node_id].update(node_figures)
+    NodeSummary = apps.get_model('report_data', 'NodeSummary')
+    NodeSummary.objects.bulk_create([
+        NodeSummary(node_id=node_id, **node_figures) for node_id, node_figures in by_node.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('report_data', '0007_typed_metrics'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NodeSummary',
+            fields=[
+                ('node', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='report_data.node')),
+                ('chassis_types', models.TextField(default='')),
+                ('software_versions', models.TextField(default='')),
+                ('rom_versions', models.TextField(default='')),
+                ('active_cards', models.TextField(default='')),
+                ('offline_cards', models.IntegerField(default=0)),
+                ('uptime', models.DurationField(null=True)),
+                ('pon_ports_active', models.IntegerField(default=0)),
+                ('pon_ports_offline', models.IntegerField(default=0)),
+                ('onts', models.IntegerField(default=0)),
+                ('sfp_types', models.TextField(default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('run', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='report_data.healthcheckrun')),
+            ],
+            options={
+                'db_table': 'data_node_summary',
+            },
+        ),
+        migrations.RunPython(summarize_nodes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    """
+    Gives InventoryCard a surrogate primary key. The card name alone was the primary
+    key, so the same card of a second node collided with the first node's row although
+    rows are keyed by (card, node). Existing rows are numbered by the database as the
+    auto field is added.
+    """
+
+    dependencies = [
+        ('report_data', '0008_node_summary'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='inventorycard',
+            name='card',
+            field=models.CharField(max_length=10),
+        ),
+        migrations.AddField(
+            model_name='inventorycard',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+    ]
@@ -1,5 +1,7 @@
 from django.db import models
 
+from report.subport_status import SubportStatus, count_status, unpack_statuses
+
 class Node(models.Model):
     ip_address = models.GenericIPAddressField(primary_key=True)
     name = models.CharField(max_length=255, unique=True)
@@ -8,8 +10,33 @@ class Node(models.Model):
         db_table = 'data_node'
         
 
+class HealthCheckRun(models.Model):
+    """
+    One ingested health check log of a node. Counter tables keep a snapshot per run, so
+    values can be trended across runs; the other tables hold the latest state of the
+    node and point at the run that last changed each row and the last run that saw it.
+
+    ``last_seen_run`` is not indexed, so marking unchanged rows seen can be a heap-only
+    update on PostgreSQL. ``content_hash`` is the hash of a row's values the ingestion
+    compares to tell whether a re-ingested row changed.
+    """
+    node = models.ForeignKey(Node, on_delete=models.CASCADE, related_name='runs')
+    file_upload = models.ForeignKey('report.FileUpload', on_delete=models.SET_NULL, null=True, blank=True)
+    checksum = models.CharField(max_length=32)
+    collected_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'data_health_check_run'
+        unique_together = (('node', 'checksum'),)
+        indexes = [models.Index(fields=['node', 'collected_at'])]
+
+
 class InventoryBackPlane(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     eeprom_contents = models.CharField(max_length=50)
     eeprom_id = models.CharField(max_length=20)
     version = models.CharField(max_length=10)
@@ -28,10 +55,13 @@ class InventoryBackPlane(models.Model):
 
 
 class InventoryCard(models.Model):
-    card = models.CharField(primary_key=True, max_length=10)
+    card = models.CharField(max_length=10)
     rom_version = models.CharField(max_length=20)
     timestamp = models.DateTimeField()
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
 
     class Meta:
         db_table = 'data_inventory_card'
@@ -40,6 +70,9 @@ class InventoryCard(models.Model):
 
 class NetworkInterface(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     interface = models.CharField(max_length=50)
     vendor_name = models.CharField(max_length=100)
     vendor_oui = models.CharField(max_length=10)
@@ -60,6 +93,9 @@ class NetworkInterface(models.Model):
 
 class Alarms(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     resource_id = models.CharField(max_length=50)
     alarm_type = models.CharField(max_length=50)
     alarm_severity = models.CharField(max_length=20)
@@ -71,27 +107,39 @@ class Alarms(models.Model):
 
 class CardStats(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.CASCADE)
+    content_hash = models.CharField(max_length=32, default='')
+    # The run's collected_at, repeated so trend queries over one node need no join
+    collected_at = models.DateTimeField()
     slot = models.CharField(max_length=10)
     cpu_idle_percent = models.IntegerField()
     cpu_usage_percent = models.IntegerField()
     memory_utilization_percent = models.DecimalField(max_digits=5, decimal_places=2)
-    card_memory_used_kb = models.CharField(max_length=20)
-    card_memory_peak_kb = models.CharField(max_length=20)
-    card_memory_available_kb = models.CharField(max_length=20)
+    card_memory_used_kb = models.BigIntegerField()
+    card_memory_peak_kb = models.BigIntegerField()
+    card_memory_available_kb = models.BigIntegerField()
     status = models.CharField(max_length=20)
-    uptime = models.CharField(max_length=20)
+    uptime = models.DurationField(null=True)
     software_version = models.CharField(max_length=50)
 
     class Meta:
         db_table = 'data_card_stats'
-        unique_together = (('node', 'slot'),)
+        unique_together = (('run', 'slot'),)
+        indexes = [
+            models.Index(fields=['node', 'collected_at']),
+            models.Index(fields=['memory_utilization_percent']),
+        ]
 
 
 class GponOnuStats(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.CASCADE)
+    content_hash = models.CharField(max_length=32, default='')
+    # The run's collected_at, repeated so trend queries over one node need no join
+    collected_at = models.DateTimeField()
     slot = models.CharField(max_length=5)
     sub_port = models.CharField(max_length=10)
-    upstream_bip_units = models.DecimalField(max_digits=20, decimal_places=2)
+    upstream_bip_units = models.BigIntegerField()
     fec_corrected_bytes = models.BigIntegerField()
     fec_corrected_codewords = models.BigIntegerField()
     fec_uncorrected_codewords = models.BigIntegerField()
@@ -107,77 +155,95 @@ class GponOnuStats(models.Model):
 
     class Meta:
         db_table = 'data_gpon_onu_stats'
-        unique_together = (('node', 'slot', 'sub_port'),)
+        unique_together = (('run', 'slot', 'sub_port'),)
+        indexes = [
+            models.Index(fields=['node', 'collected_at']),
+            models.Index(fields=['node', 'slot', 'sub_port', 'collected_at']),
+        ]
 
 
-class OltLineStatus(models.Model):
+class GponOnuStatsDelta(models.Model):
+    """
+    Change of the cumulative GPON ONU counters between a run and the previous run of the
+    node, written by report_data.counter_deltas. A counter that wrapped is unwrapped; one
+    that was reset (e.g. the ONU rebooted) counts from zero and sets counter_reset.
+    """
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.CASCADE, related_name='gpon_onu_deltas')
+    previous_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+')
+    collected_at = models.DateTimeField()
+    interval_seconds = models.FloatField()
+    slot = models.CharField(max_length=5)
+    sub_port = models.CharField(max_length=10)
+    counter_reset = models.BooleanField(default=False)
+    upstream_bip_units = models.BigIntegerField()
+    fec_corrected_bytes = models.BigIntegerField()
+    fec_corrected_codewords = models.BigIntegerField()
+    fec_uncorrected_codewords = models.BigIntegerField()
+    total_received_codewords = models.BigIntegerField()
+    received_bytes = models.BigIntegerField()
+    received_packets = models.BigIntegerField()
+    transmitted_bytes = models.BigIntegerField()
+    transmitted_packets = models.BigIntegerField()
+    unreceived_bursts = models.BigIntegerField()
+    bip_error = models.BigIntegerField()
+    remote_bip_error = models.BigIntegerField()
+    drift_of_window_indications = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'data_gpon_onu_stats_delta'
+        unique_together = (('run', 'slot', 'sub_port'),)
+        indexes = [models.Index(fields=['node', 'collected_at'])]
+
+    def rate(self, metric):
+        """Per second rate of ``metric`` over the interval."""
+        return getattr(self, metric) / self.interval_seconds if self.interval_seconds else None
+
+
+class SubportStatusMixin:
+    """Accessors for the packed ``subport_status`` column of the line status tables."""
+
+    def subport_statuses(self):
+        """Subport states in the ``{'1': 'ACT', ...}`` form emitted by the parsers before."""
+        return unpack_statuses(self.subport_status)
+
+    @property
+    def active_subports(self):
+        return count_status(self.subport_status, SubportStatus.ACT)
+
+
+class OltLineStatus(SubportStatusMixin, models.Model):
+    node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     shelf = models.IntegerField()
     slot = models.IntegerField()
     port = models.IntegerField()
     channel = models.IntegerField()
     line_type = models.CharField(max_length=20)
-    line_1 = models.CharField(max_length=10)
-    line_2 = models.CharField(max_length=10)
-    line_3 = models.CharField(max_length=10)
-    line_4 = models.CharField(max_length=10)
-    line_5 = models.CharField(max_length=10)
-    line_6 = models.CharField(max_length=10)
-    line_7 = models.CharField(max_length=10)
-    line_8 = models.CharField(max_length=10)
-    line_9 = models.CharField(max_length=10)
-    line_10 = models.CharField(max_length=10)
-    line_11 = models.CharField(max_length=10)
-    line_12 = models.CharField(max_length=10)
-    line_13 = models.CharField(max_length=10)
-    line_14 = models.CharField(max_length=10)
-    line_15 = models.CharField(max_length=10)
-    line_16 = models.CharField(max_length=10)
+    # One byte per subport holding its SubportStatus code, see report.subport_status
+    subport_status = models.BinaryField(default=b'')
 
     class Meta:
         db_table = 'data_olt_line_status'
         unique_together = (('node', 'shelf', 'slot', 'port', 'channel'),)
 
 
-class OnuLineStatus(models.Model):
+class OnuLineStatus(SubportStatusMixin, models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     shelf = models.IntegerField()
     slot = models.IntegerField()
     port = models.IntegerField()
     channel = models.IntegerField()
     line_type = models.CharField(max_length=20)
-    line_1 = models.CharField(max_length=10)
-    line_2 = models.CharField(max_length=10)
-    line_3 = models.CharField(max_length=10)
-    line_4 = models.CharField(max_length=10)
-    line_5 = models.CharField(max_length=10)
-    line_6 = models.CharField(max_length=10)
-    line_7 = models.CharField(max_length=10)
-    line_8 = models.CharField(max_length=10)
-    line_9 = models.CharField(max_length=10)
-    line_10 = models.CharField(max_length=10)
-    line_11 = models.CharField(max_length=10)
-    line_12 = models.CharField(max_length=10)
-    line_13 = models.CharField(max_length=10)
-    line_14 = models.CharField(max_length=10)
-    line_15 = models.CharField(max_length=10)
-    line_16 = models.CharField(max_length=10)
-    line_17 = models.CharField(max_length=10)
-    line_18 = models.CharField(max_length=10)
-    line_19 = models.CharField(max_length=10)
-    line_20 = models.CharField(max_length=10)
-    line_21 = models.CharField(max_length=10)
-    line_22 = models.CharField(max_length=10)
-    line_23 = models.CharField(max_length=10)
-    line_24 = models.CharField(max_length=10)
-    line_25 = models.CharField(max_length=10)
-    line_26 = models.CharField(max_length=10)
-    line_27 = models.CharField(max_length=10)
-    line_28 = models.CharField(max_length=10)
-    line_29 = models.CharField(max_length=10)
-    line_30 = models.CharField(max_length=10)
-    line_31 = models.CharField(max_length=10)
-    line_32 = models.CharField(max_length=10)
+    # One byte per subport holding its SubportStatus code, see report.subport_status
+    subport_status = models.BinaryField(default=b'')
+    # The subports in ACT, counted at ingestion so summaries add them up in SQL
+    active_subport_count = models.IntegerField(default=0)
 
     class Meta:
         db_table = 'data_onu_line_status'
@@ -186,6 +252,9 @@ class OnuLineStatus(models.Model):
 
 class SlotStatus(models.Model):
     node = models.ForeignKey(Node, on_delete=models.CASCADE)
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True)
+    last_seen_run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    content_hash = models.CharField(max_length=32, default='')
     component = models.CharField(max_length=50)
     shelf = models.IntegerField()
     slot = models.CharField(max_length=5)
@@ -193,7 +262,7 @@ class SlotStatus(models.Model):
     type = models.CharField(max_length=50)
     card_version = models.CharField(max_length=20)
     software_version = models.CharField(max_length=20)
-    uptime = models.CharField(max_length=50)
+    uptime = models.DurationField(null=True)
     mode = models.CharField(max_length=20)
     rom_version = models.CharField(max_length=20)
     serial_number = models.CharField(max_length=20)
@@ -204,3 +273,29 @@ class SlotStatus(models.Model):
     class Meta:
         db_table = 'data_slot_status'
         unique_together = (('node', 'shelf', 'slot'),)
+        indexes = [models.Index(fields=['uptime'])]
+
+
+class NodeSummary(models.Model):
+    """
+    The "OLT Info" figures of a node's Word report, recomputed once per ingested run, so
+    reports read one row per node instead of aggregating the state tables. See
+    report_data.summary.
+    """
+    node = models.OneToOneField(Node, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    # The run that last changed a figure
+    run = models.ForeignKey(HealthCheckRun, on_delete=models.SET_NULL, null=True, related_name='+')
+    chassis_types = models.TextField(default='')
+    software_versions = models.TextField(default='')
+    rom_versions = models.TextField(default='')
+    active_cards = models.TextField(default='')
+    offline_cards = models.IntegerField(default=0)
+    uptime = models.DurationField(null=True)
+    pon_ports_active = models.IntegerField(default=0)
+    pon_ports_offline = models.IntegerField(default=0)
+    onts = models.IntegerField(default=0)
+    sfp_types = models.TextField(default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'data_node_summary'
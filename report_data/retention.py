@@ -0,0 +1,52 @@
+import datetime
+
+from django.conf import settings
+from django.utils import timezone
+
+from report_data.models import HealthCheckRun
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def runs_to_prune(now=None):
+    """
+    Returns the ids of the health check runs the retention policy drops.
+
+    Runs younger than HEALTH_CHECK_FULL_RESOLUTION_DAYS are all kept. Older ones are
+    downsampled to the latest run of each node in every HEALTH_CHECK_DOWNSAMPLE_DAYS
+    bucket, and runs older than HEALTH_CHECK_RETENTION_DAYS are dropped. The latest run
+    of a node is always kept.
+    """
+    now = now or timezone.now()
+    full_resolution_since = now - datetime.timedelta(days=settings.HEALTH_CHECK_FULL_RESOLUTION_DAYS)
+    retained_since = now - datetime.timedelta(days=settings.HEALTH_CHECK_RETENTION_DAYS)
+    bucket_days = settings.HEALTH_CHECK_DOWNSAMPLE_DAYS
+
+    latest = {}
+    kept_in_bucket = {}
+    candidates = []
+    runs = HealthCheckRun.objects.order_by('node_id', 'collected_at', 'pk').values_list('pk', 'node_id', 'collected_at')
+    for pk, node_id, collected_at in runs.iterator():
+        latest[node_id] = pk
+        if collected_at >= full_resolution_since:
+            continue
+        candidates.append(pk)
+        if collected_at >= retained_since:
+            # Later runs replace earlier ones, so each bucket keeps its latest run
+            kept_in_bucket[(node_id, (collected_at - EPOCH).days // bucket_days)] = pk
+    kept = set(latest.values()) | set(kept_in_bucket.values())
+    return [pk for pk in candidates if pk not in kept]
+
+
+def prune_runs(now=None, chunk_size=100):
+    """
+    Deletes the runs dropped by the retention policy along with their counter snapshots.
+    Rows of the latest-state tables only lose the reference to a deleted run.
+
+    Returns:
+    int: The number of runs deleted.
+    """
+    pks = runs_to_prune(now)
+    for start in range(0, len(pks), chunk_size):
+        HealthCheckRun.objects.filter(pk__in=pks[start:start + chunk_size]).delete()
+    return len(pks)
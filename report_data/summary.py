@@ -0,0 +1,111 @@
+from collections import defaultdict
+
+from django.db.models import Count, Max, Q, Sum
+
+from report_data.models import NetworkInterface, NodeSummary, OnuLineStatus, SlotStatus
+
+
+def distinct_by_node(queryset, field):
+    """Maps each node id to the distinct values of ``field`` in its rows, with one query."""
+    values = defaultdict(list)
+    rows = queryset.values_list('node_id', field).distinct().order_by('node_id', field)
+    for node_id, value in rows:
+        values[node_id].append(value)
+    return values
+
+
+def slot_figures(slot_status_data):
+    """Chassis, version, card and uptime figures of each node in ``slot_status_data``."""
+    chassis_types = distinct_by_node(slot_status_data, 'chassis_type')
+    software_versions = distinct_by_node(slot_status_data, 'software_version')
+    rom_versions = distinct_by_node(slot_status_data, 'rom_version')
+
+    figures = {}
+    card_counts = slot_status_data.values('node_id', 'type').annotate(
+        cards=Count('pk'),
+        offline=Count('pk', filter=Q(mode='non-functional')),
+        uptime=Max('uptime'),
+    ).order_by('node_id', 'type')
+    for row in card_counts:
+        node_figures = figures.setdefault(row['node_id'], {
+            'chassis_types': ', '.join(chassis_types[row['node_id']]),
+            'software_versions': ', '.join(software_versions[row['node_id']]),
+            'rom_versions': ', '.join(rom_versions[row['node_id']]),
+            'active_cards': [],
+            'offline_cards': 0,
+            'uptime': None,
+        })
+        node_figures['active_cards'].append(f"{row['type']} ({row['cards']})")
+        node_figures['offline_cards'] += row['offline']
+        # The longest running card has been up as long as the system
+        if row['uptime'] is not None and (node_figures['uptime'] is None or row['uptime'] > node_figures['uptime']):
+            node_figures['uptime'] = row['uptime']
+    for node_figures in figures.values():
+        node_figures['active_cards'] = ', '.join(node_figures['active_cards'])
+    return figures
+
+
+def interface_figures(network_interface_data):
+    """SFP counts by vendor of each node in ``network_interface_data``."""
+    sfp_types = defaultdict(list)
+    vendor_counts = network_interface_data.values('node_id', 'vendor_name').annotate(
+        interfaces=Count('pk'),
+    ).order_by('node_id', 'vendor_name')
+    for row in vendor_counts:
+        sfp_types[row['node_id']].append(f"{row['vendor_name']} X {row['interfaces']}")
+    return {node_id: {'sfp_types': ', '.join(types)} for node_id, types in sfp_types.items()}
+
+
+def line_status_figures(onu_line_status_data):
+    """
+    PON port and ONT counts of each node in ``onu_line_status_data``. Each ONU line
+    status row is a PON port, active when any of its ONTs is, and every active subport
+    is an ONT, as counted at ingestion.
+    """
+    port_counts = onu_line_status_data.values('node_id').annotate(
+        pon_ports_active=Count('pk', filter=Q(active_subport_count__gt=0)),
+        pon_ports_offline=Count('pk', filter=Q(active_subport_count=0)),
+        onts=Sum('active_subport_count'),
+    ).order_by('node_id')
+    return {row.pop('node_id'): row for row in port_counts}
+
+
+# The figures derived from each state table
+SUMMARY_SECTIONS = {
+    SlotStatus: slot_figures,
+    NetworkInterface: interface_figures,
+    OnuLineStatus: line_status_figures,
+}
+
+
+def update_node_summary(run):
+    """
+    Recomputes the NodeSummary figures of the node of ``run`` from that node's rows only,
+    a few queries per state table, and saves them when a figure changed. Meant to run
+    once per run, after all its commands were ingested and its unseen rows removed.
+    """
+    # A table the node has no rows in anymore resets its figures
+    node_figures = {
+        field.name: field.get_default() for field in NodeSummary._meta.concrete_fields
+        if field.name not in ('node', 'run', 'updated_at')
+    }
+    for model, figures in SUMMARY_SECTIONS.items():
+        node_figures.update(figures(model.objects.filter(node_id=run.node_id)).get(run.node_id, {}))
+    if NodeSummary.objects.filter(node_id=run.node_id).values(*node_figures).first() != node_figures:
+        NodeSummary.objects.update_or_create(node_id=run.node_id, defaults={'run': run, **node_figures})
+
+
+def rebuild_node_summaries():
+    """
+    Recomputes every NodeSummary from the state tables, a few queries per table.
+
+    Returns:
+    int: The number of summaries written.
+    """
+    by_node = defaultdict(dict)
+    for model, figures in SUMMARY_SECTIONS.items():
+        for node_id, node_figures in figures(model.objects.all()).items():
+            by_node[node_id].update(node_figures)
+    for node_id, node_figures in by_node.items():
+        NodeSummary.objects.update_or_create(node_id=node_id, defaults=node_figures)
+    return len(by_node)
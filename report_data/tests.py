@@ -1,3 +1,354 @@
-from django.test import TestCase
+import importlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.db import connection
+from django.db.models import QuerySet
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from report.libs import finish_run, ingest_parsed_data
+from report.subport_status import SubportStatus
+
+from .counter_deltas import compute_gpon_deltas, counter_deltas
+from .ingestion_libs import (
+    ingest_alarms_data, ingest_card_stats_data, ingest_gpon_onu_stats_data, ingest_inventory_card_data,
+    ingest_network_interface_data, ingest_onu_line_status_data, ingest_slot_status_data, remove_unseen_rows,
+)
+from .libs import fetch_olt_info_report_data
+from .models import (
+    Alarms, CardStats, GponOnuStatsDelta, HealthCheckRun, InventoryCard, NetworkInterface, Node, NodeSummary,
+)
+from .retention import EPOCH, prune_runs, runs_to_prune
+from .summary import rebuild_node_summaries, update_node_summary
 
 # Create your tests here.
+
+
+class BulkIngestionTests(TestCase):
+    def setUp(self):
+        self.node = Node.objects.create(ip_address='192.0.2.1', name='192.0.2.1')
+        self.run = self.start_run('a')
+
+    def start_run(self, checksum, days_ago=0):
+        collected_at = timezone.now() - timedelta(days=days_ago)
+        return HealthCheckRun.objects.create(node=self.node, checksum=checksum, collected_at=collected_at)
+
+    def alarm(self, i):
+        return {'ResourceId': f"1-{i}-1-0/gponolt", 'AlarmType': 'linkDown', 'AlarmSeverity': 'critical'}
+
+    @override_settings(INGESTION_BATCH_SIZE=100, INGESTION_COPY=False)
+    def test_rows_are_upserted_in_batches(self):
+        # One savepoint around the command, then per batch the lookup of stored keys and
+        # a savepoint around its INSERT
+        with self.assertNumQueries(2 + 3 * 4):
+            result = ingest_alarms_data(self.run, (self.alarm(i) for i in range(250)))
+
+        self.assertEqual(result.inserted, 250)
+        self.assertEqual(result.failures, [])
+        self.assertEqual(Alarms.objects.filter(node=self.node).count(), 250)
+
+    def test_reingested_rows_are_refreshed(self):
+        ingest_alarms_data(self.run, [self.alarm(0), self.alarm(1)])
+        cleared = dict(self.alarm(1), AlarmSeverity='minor')
+
+        result = ingest_alarms_data(self.run, [self.alarm(0), cleared, self.alarm(2)])
+
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual(Alarms.objects.get(node=self.node, resource_id='1-1-1-0/gponolt').alarm_severity, 'minor')
+        self.assertEqual(Alarms.objects.filter(node=self.node).count(), 3)
+
+    def test_failed_rows_are_collected(self):
+        rows = [
+            {'Slot': '1', 'CPU Idle (%)': 91, 'CPU Usage (%)': 9, 'Memory Utilization (%)': 47.14},
+            {'Slot': '2', 'CPU Idle (%)': 'n/a'},
+        ]
+
+        result = ingest_card_stats_data(self.run, rows)
+
+        self.assertEqual(result.inserted, 1)
+        self.assertEqual([description for description, _ in result.failures], ["Card stats for slot 2"])
+        self.assertEqual(CardStats.objects.get(node=self.node).slot, '1')
+
+    def test_rows_without_their_description_keys_fail_cleanly(self):
+        result = ingest_card_stats_data(self.run, [{'CPU Idle (%)': 'n/a'}, None])
+
+        self.assertEqual([description for description, _ in result.failures], ["Card stats for slot None", "None"])
+
+    def test_same_card_of_two_nodes(self):
+        other = HealthCheckRun.objects.create(
+            node=Node.objects.create(ip_address='192.0.2.2', name='192.0.2.2'), checksum='b', collected_at=timezone.now(),
+        )
+        card = {'Card': 'm1', 'ROM Version': 'MXK 3.4.2.144.007', 'Timestamp': 'Aug  5 2022, 12:30:26'}
+
+        for run in (self.run, other):
+            result = ingest_inventory_card_data(run, [card])
+            self.assertEqual((result.inserted, result.failures), (1, []))
+        self.assertEqual(InventoryCard.objects.filter(card='m1').count(), 2)
+
+    def test_counters_are_kept_per_run(self):
+        card = {'Slot': '1', 'CPU Idle (%)': 91, 'CPU Usage (%)': 9, 'Memory Utilization (%)': 47.14}
+        ingest_card_stats_data(self.run, [card])
+        ingest_alarms_data(self.run, [self.alarm(0), self.alarm(1)])
+        later = self.start_run('b')
+
+        ingest_card_stats_data(later, [dict(card, **{'CPU Usage (%)': 30})])
+        ingest_alarms_data(later, [self.alarm(0), dict(self.alarm(1), AlarmSeverity='minor')])
+
+        history = CardStats.objects.filter(node=self.node).order_by('collected_at')
+        self.assertEqual([stats.cpu_usage_percent for stats in history], [9, 30])
+        # Unchanged state rows keep the run that last changed them
+        runs = dict(Alarms.objects.filter(node=self.node).values_list('resource_id', 'run'))
+        self.assertEqual(runs, {'1-0-1-0/gponolt': self.run.pk, '1-1-1-0/gponolt': later.pk})
+        self.assertEqual(set(Alarms.objects.filter(node=self.node).values_list('last_seen_run', flat=True)), {later.pk})
+
+    @override_settings(INGESTION_COPY=False)
+    def test_unchanged_rows_are_only_marked_seen(self):
+        ingest_alarms_data(self.run, [self.alarm(i) for i in range(3)])
+        later = self.start_run('b')
+
+        # The lookup of stored hashes and one UPDATE of last_seen_run, inside a savepoint
+        with self.assertNumQueries(4):
+            result = ingest_alarms_data(later, [self.alarm(i) for i in range(3)])
+
+        self.assertEqual(result.unchanged, 3)
+        alarms = Alarms.objects.filter(node=self.node)
+        self.assertEqual(set(alarms.values_list('run', 'last_seen_run')), {(self.run.pk, later.pk)})
+
+
+    def test_rows_a_run_did_not_see_are_removed(self):
+        ingest_alarms_data(self.run, [self.alarm(i) for i in range(3)])
+        ingest_card_stats_data(self.run, [{'Slot': '1', 'CPU Idle (%)': 91, 'CPU Usage (%)': 9}])
+        back_loaded = self.start_run('old', days_ago=1)
+        ingest_alarms_data(back_loaded, [self.alarm(0)])
+
+        self.assertEqual(remove_unseen_rows(back_loaded, [Alarms]), 0)
+
+        # Streamed commands reach ingestion a few blocks at a time, so the alarms of one
+        # run arrive in two parts; removal waits for the whole run
+        later = timezone.now() + timedelta(hours=1)
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            ingest_parsed_data('log_192.0.2.1', [('Alarms', [self.alarm(0)]), ('Alarms', [self.alarm(2)])], 'b', later)
+
+        self.assertEqual(
+            sorted(Alarms.objects.filter(node=self.node).values_list('resource_id', flat=True)),
+            ['1-0-1-0/gponolt', '1-2-1-0/gponolt'],
+        )
+        # Counter snapshots belong to their run and are kept
+        self.assertEqual(CardStats.objects.filter(node=self.node).count(), 1)
+
+    def test_rows_are_kept_when_a_group_of_their_command_failed(self):
+        ingest_alarms_data(self.run, [self.alarm(i) for i in range(3)])
+
+        def truncated_group():
+            yield self.alarm(1)
+            raise ValueError('truncated block')
+
+        later = timezone.now() + timedelta(hours=1)
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            # The second group raises, which ingest_command reports and returns no result for
+            ingest_parsed_data('log_192.0.2.1', [('Alarms', [self.alarm(0)]), ('Alarms', truncated_group())], 'b', later)
+            # The second group drops a row, so alarm 2 may still be raised
+            ingest_parsed_data('log_192.0.2.1', [('Alarms', [self.alarm(0)]), ('Alarms', [None])], 'c', later)
+
+        self.assertEqual(Alarms.objects.filter(node=self.node).count(), 3)
+
+@override_settings(HEALTH_CHECK_FULL_RESOLUTION_DAYS=30, HEALTH_CHECK_DOWNSAMPLE_DAYS=7, HEALTH_CHECK_RETENTION_DAYS=365)
+class RetentionTests(TestCase):
+    now = EPOCH + timedelta(days=1000)
+
+    def setUp(self):
+        self.node = Node.objects.create(ip_address='192.0.2.1', name='192.0.2.1')
+
+    def run_days_ago(self, days):
+        return HealthCheckRun.objects.create(node=self.node, checksum=str(days), collected_at=self.now - timedelta(days=days))
+
+    def test_old_runs_are_downsampled_and_expired(self):
+        recent = [self.run_days_ago(1), self.run_days_ago(2)]
+        # Days 960 and 959 after the epoch share a 7 day bucket
+        bucket_latest, bucket_earlier = self.run_days_ago(40), self.run_days_ago(41)
+        expired = self.run_days_ago(400)
+        CardStats.objects.create(
+            node=self.node, run=expired, collected_at=expired.collected_at, slot='1', cpu_idle_percent=0,
+            cpu_usage_percent=0, memory_utilization_percent=0, card_memory_used_kb=0, card_memory_peak_kb=0,
+            card_memory_available_kb=0,
+        )
+
+        self.assertEqual(prune_runs(now=self.now), 2)
+
+        remaining = set(HealthCheckRun.objects.values_list('pk', flat=True))
+        self.assertEqual(remaining, {run.pk for run in recent + [bucket_latest]})
+        self.assertFalse(CardStats.objects.exists())
+
+    def test_latest_run_of_a_node_is_kept(self):
+        only = self.run_days_ago(400)
+
+        self.assertEqual(runs_to_prune(now=self.now), [])
+        self.assertTrue(HealthCheckRun.objects.filter(pk=only.pk).exists())
+
+
+class CounterDeltaTests(TestCase):
+    def setUp(self):
+        self.node = Node.objects.create(ip_address='192.0.2.1', name='192.0.2.1')
+        self.now = timezone.now()
+
+    def test_wraps_and_resets(self):
+        previous = np.array([[100, 2 ** 32 - 10, 5000]], dtype=np.int64)
+        current = np.array([[150, 20, 30]], dtype=np.int64)
+
+        deltas, reset = counter_deltas(previous, current)
+
+        self.assertEqual(deltas.tolist(), [[50, 30, 30]])
+        self.assertEqual(reset.tolist(), [[False, False, True]])
+
+    def ingest_gpon(self, hours_ago, received_bytes):
+        run = HealthCheckRun.objects.create(
+            node=self.node, checksum=str(hours_ago), collected_at=self.now - timedelta(hours=hours_ago),
+        )
+        rows = [
+            {'Slot': '1-1', 'Sub Port': f"ONU({onu})", 'received bytes': value}
+            for onu, value in received_bytes.items()
+        ]
+        ingest_gpon_onu_stats_data(run, rows)
+        return run
+
+    def test_deltas_between_consecutive_runs(self):
+        self.ingest_gpon(2, {1: 1000, 2: 5000})
+        previous = self.ingest_gpon(1, {1: 4600, 2: 7000})
+        latest = self.ingest_gpon(0, {1: 8200, 2: 100, 3: 50})
+
+        self.assertEqual(compute_gpon_deltas(HealthCheckRun.objects.all()), 4)
+
+        deltas = GponOnuStatsDelta.objects.filter(run=latest).order_by('sub_port')
+        self.assertEqual([(delta.sub_port, delta.received_bytes, delta.counter_reset) for delta in deltas], [
+            ('ONU(1)', 3600, False),
+            ('ONU(2)', 100, True),
+        ])
+        self.assertEqual(deltas[0].previous_run, previous)
+        self.assertEqual(deltas[0].rate('received_bytes'), 1.0)
+
+
+class OltInfoReportTests(TestCase):
+    def ingest_node(self, ip_address, card_modes, vendors, subport_statuses=()):
+        node = Node.objects.create(ip_address=ip_address, name=ip_address)
+        run = HealthCheckRun.objects.create(node=node, checksum='a', collected_at=timezone.now())
+        ingest_slot_status_data(run, [
+            {'Shelf': '1', 'Slot': str(slot), 'Chassis Type': 'MXK 1419', 'Type': 'GPON-8', 'Mode': mode,
+             'Software Version': 'MXK 3.4.2.272', 'ROM Version': 'MXK 3.4.2.144.007', 'Uptime': timedelta(days=slot)}
+            for slot, mode in enumerate(card_modes, start=1)
+        ])
+        ingest_network_interface_data(run, [
+            {'Interface': f"1-1-{port}-0/gponolt", 'Vendor Name': vendor}
+            for port, vendor in enumerate(vendors, start=1)
+        ])
+        ingest_onu_line_status_data(run, [
+            {'Shelf': '1', 'Slot': '1', 'Port': str(port), 'Channel': '0', 'Line Type': 'ONU', 'Subport Status': codes}
+            for port, codes in enumerate(subport_statuses, start=1)
+        ])
+        update_node_summary(run)
+        return node
+
+    def test_report_reads_one_summary_per_node(self):
+        act, oos = SubportStatus.ACT, SubportStatus.OOS
+        first = self.ingest_node(
+            '192.0.2.1', ['FUNCTIONAL', 'non-functional'], ['Ligent', 'Ligent', 'Zhone'],
+            [bytes([act, oos, act]), bytes([oos, oos])],
+        )
+        self.ingest_node('192.0.2.2', ['FUNCTIONAL'] * 5, ['Zhone'] * 4)
+
+        with self.assertNumQueries(1):
+            data_by_node = fetch_olt_info_report_data()
+        with self.assertNumQueries(1):
+            only_first = fetch_olt_info_report_data(nodes=[first])
+
+        figures = {row['Info Type']: row['Data'] for row in data_by_node['192.0.2.1']}
+        self.assertEqual(figures['Chassis Type'], 'MXK 1419')
+        self.assertEqual(figures['# Active Cards'], 'GPON-8 (2)')
+        self.assertEqual(figures['# Offline Cards'], '1')
+        self.assertEqual((figures['PON Ports Active'], figures['PON Ports Offline'], figures['# ONTs']), ('1', '1', '2'))
+        self.assertEqual(figures['SFP Types'], 'Ligent X 2, Zhone X 1')
+        self.assertEqual(figures['System Uptime'], '2 days, 0:00:00')
+        self.assertEqual(list(only_first), ['192.0.2.1'])
+        self.assertEqual(only_first['192.0.2.1'], data_by_node['192.0.2.1'])
+
+    def test_summary_follows_changed_rows_once_per_run(self):
+        node = self.ingest_node('192.0.2.1', ['FUNCTIONAL'], ['Zhone'])
+        later = HealthCheckRun.objects.create(node=node, checksum='b', collected_at=timezone.now())
+
+        with self.settings(INGESTION_BATCH_SIZE=1):
+            ingest_network_interface_data(later, [
+                {'Interface': f"1-1-{port}-0/gponolt", 'Vendor Name': 'Ligent'} for port in (1, 2, 3)
+            ])
+        # Ingestion alone leaves the summary for finish_run to recompute, once
+        self.assertEqual(NodeSummary.objects.get(node=node).sfp_types, 'Zhone X 1')
+        finish_run(later, [NetworkInterface])
+
+        summary = NodeSummary.objects.get(node=node)
+        self.assertEqual((summary.sfp_types, summary.run), ('Ligent X 3', later))
+        self.assertEqual(rebuild_node_summaries(), 1)
+        self.assertEqual(NodeSummary.objects.get(node=node).sfp_types, 'Ligent X 3')
+
+        latest = HealthCheckRun.objects.create(node=node, checksum='c', collected_at=timezone.now())
+        finish_run(latest, [NetworkInterface])
+
+        self.assertEqual(NodeSummary.objects.get(node=node).sfp_types, '')
+
+
+class DataMigrationTests(TransactionTestCase):
+    def migrate(self, *targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(list(targets))
+        return executor.loader.project_state(list(targets)).apps
+
+    def tearDown(self):
+        self.migrate(*MigrationExecutor(connection).loader.graph.leaf_nodes())
+
+    def test_back_fills_run_in_batches(self):
+        batch_sizes = [
+            mock.patch.object(importlib.import_module(f'report_data.migrations.{name}'), 'BATCH_SIZE', 2)
+            for name in ('0003_packed_subport_status', '0007_typed_metrics', '0010_onulinestatus_active_subport_count')
+        ]
+        for batch_size in batch_sizes:
+            batch_size.start()
+            self.addCleanup(batch_size.stop)
+
+        apps = self.migrate(('report_data', '0002_slotstatus_chassis_type'))
+        node = apps.get_model('report_data', 'Node').objects.create(ip_address='192.0.2.1', name='192.0.2.1')
+        for port in range(1, 6):
+            apps.get_model('report_data', 'OnuLineStatus').objects.create(
+                node=node, shelf=1, slot=3, port=port, channel=0, line_type='ONU', line_1='ACT', line_3='OOS',
+            )
+        for slot in range(1, 4):
+            apps.get_model('report_data', 'CardStats').objects.create(
+                node=node, slot=str(slot), cpu_idle_percent=90, cpu_usage_percent=10, memory_utilization_percent=47,
+                card_memory_used_kb='1,024', card_memory_peak_kb='2048', card_memory_available_kb='n/a',
+                uptime=f'{slot}:02:03:04',
+            )
+
+        with mock.patch('sys.stdout', new_callable=StringIO), \
+                mock.patch('django.db.models.QuerySet.bulk_update', autospec=True, side_effect=QuerySet.bulk_update) as bulk_update:
+            apps = self.migrate(('report_data', '0010_onulinestatus_active_subport_count'))
+        # Five ONU line rows, three card stats rows, then the five ONU lines again, two at a time
+        self.assertEqual([len(call.args[1]) for call in bulk_update.call_args_list], [2, 2, 1, 2, 1, 2, 2, 1])
+
+        codes = apps.get_model('report_data', 'OnuLineStatus').objects.values_list('subport_status', flat=True)
+        self.assertEqual({bytes(packed) for packed in codes}, {bytes([1, 0, 2])})
+        counts = apps.get_model('report_data', 'OnuLineStatus').objects.values_list('active_subport_count', flat=True)
+        self.assertEqual(set(counts), {1})
+        card_stats = apps.get_model('report_data', 'CardStats').objects.order_by('slot')
+        self.assertEqual(
+            [(stats.card_memory_used_kb, stats.card_memory_available_kb, stats.uptime) for stats in card_stats],
+            [(1024, 0, timedelta(days=slot, hours=2, minutes=3, seconds=4)) for slot in range(1, 4)],
+        )
+        summary = apps.get_model('report_data', 'NodeSummary').objects.get(node_id=node.pk)
+        self.assertEqual((summary.pon_ports_active, summary.onts), (5, 5))
+
+        # And back again
+        with mock.patch('sys.stdout', new_callable=StringIO):
+            apps = self.migrate(('report_data', '0002_slotstatus_chassis_type'))
+        rows = apps.get_model('report_data', 'OnuLineStatus').objects.values_list('line_1', 'line_2', 'line_3')
+        self.assertEqual(set(rows), {('ACT', '', 'OOS')})
+        self.assertEqual(apps.get_model('report_data', 'CardStats').objects.get(slot='1').uptime, '1:02:03:04')
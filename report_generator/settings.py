@@ -129,28 +129,101 @@ STATICFILES_DIRS = [
 
 CELERY_BROKER_URL = env('CELERY_BROKER_URL')
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql',
-        'NAME': env('DB_NAME'),
-        'USER': env('DB_USER'),
-        'PASSWORD': env('DB_PASSWORD'),
-        'HOST': env('DB_HOST'),
-        'PORT': env('DB_PORT', default='5432'),
-    },
-    # 'dzsi': {
-    #     'ENGINE': 'django.db.backends.postgresql',
-    #     'NAME': 'dzsi',
-    #     'USER': 'user',
-    #     'PASSWORD': 'password',
-    #     'HOST': 'db',
-    #     'PORT': 5432,
-    # }
-}
+# Uploads are processed by the Celery tasks in report.tasks: parse, ingest each command
+# in a chord, render. The chord needs a result backend to join on.
+# CELERY_TASK_ALWAYS_EAGER runs the tasks inline in the calling process instead, e.g.
+# in tests or in development without a worker.
+CELERY_RESULT_BACKEND = env('CELERY_RESULT_BACKEND', default=None)
+CELERY_TASK_ALWAYS_EAGER = env.bool('CELERY_TASK_ALWAYS_EAGER', default=False)
+
+# Logs of one node are ingested one at a time: a job holds a lease on its node, renewed
+# at each stage, for this many seconds. A job waiting for the lease of a node is retried
+# every NODE_LEASE_RETRY_SECONDS; logs of different nodes are processed in parallel.
+NODE_LEASE_SECONDS = env.int('NODE_LEASE_SECONDS', default=30 * 60)
+NODE_LEASE_RETRY_SECONDS = env.int('NODE_LEASE_RETRY_SECONDS', default=10)
+
+# How report.log_reader.LogParser reads uploaded logs: 'streaming' iterates the file
+# lazily block by block, 'buffered' reads the whole file into memory first and
+# 'indexed' scans an mmap of the file for block offsets (persisted next to the log)
+# and decodes each block only when a parser reads its output.
+LOG_PARSER_MODE = env('LOG_PARSER_MODE', default='streaming')
+
+# Worker processes used to parse command groups in parallel (1 keeps parsing serial),
+# and the maximum number of command lines a single parse task receives.
+REPORT_PARSE_WORKERS = env.int('REPORT_PARSE_WORKERS', default=1)
+REPORT_PARSE_SHARD_SIZE = env.int('REPORT_PARSE_SHARD_SIZE', default=64)
+
+# DB_ENGINE=sqlite swaps PostgreSQL for a local SQLite file named by DB_NAME, a stand-in
+# database for development and the ingestion benchmark when no PostgreSQL is at hand.
+if env('DB_ENGINE', default='postgresql') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('DB_NAME', default=os.path.join(BASE_DIR, 'db.sqlite3')),
+        },
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': env('DB_NAME'),
+            'USER': env('DB_USER'),
+            'PASSWORD': env('DB_PASSWORD'),
+            'HOST': env('DB_HOST'),
+            'PORT': env('DB_PORT', default='5432'),
+        },
+        # 'dzsi': {
+        #     'ENGINE': 'django.db.backends.postgresql',
+        #     'NAME': 'dzsi',
+        #     'USER': 'user',
+        #     'PASSWORD': 'password',
+        #     'HOST': 'db',
+        #     'PORT': 5432,
+        # }
+    }
 
 LOGOUT_REDIRECT_URL = '/accounts/login/'
 print('base dir', BASE_DIR)
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 MEDIA_URL = '/media/'
 
+# Parsed output of uploaded logs, keyed by log checksum, parser code version and the
+# command_patterns.yaml digest. Least recently used entries are evicted past the size limit.
+# Entries are pickles, so PARSE_CACHE_DIR must be private to the application and never
+# under MEDIA_ROOT or anywhere else the web server serves or accepts files.
+PARSE_CACHE_ENABLED = env.bool('PARSE_CACHE_ENABLED', default=True)
+PARSE_CACHE_DIR = env('PARSE_CACHE_DIR', default=os.path.join(BASE_DIR, 'var', 'parse_cache'))
+PARSE_CACHE_MAX_BYTES = env.int('PARSE_CACHE_MAX_BYTES', default=2 * 1024 ** 3)
+
+# Memo of parsed rows per identical command block, off by default: an in-process LRU of
+# up to this many bytes of compressed rows (0 disables it) backed, when PARSE_MEMO_STORE
+# names a file, by a SQLite store shared between processes and trimmed to
+# PARSE_MEMO_STORE_MAX_BYTES. Memoized blocks are parsed into a list before their rows
+# are handed on, so leave it off where memory must stay flat.
+PARSE_MEMO_MAX_BYTES = env.int('PARSE_MEMO_MAX_BYTES', default=0)
+PARSE_MEMO_STORE = env('PARSE_MEMO_STORE', default=None)
+PARSE_MEMO_STORE_MAX_BYTES = env.int('PARSE_MEMO_STORE_MAX_BYTES', default=256 * 1024 ** 2)
+
+# Working files of processing jobs: the rows their parse stage spools for the ingest
+# stages, kept until the job succeeds so a failed job can resume. Like the parse cache
+# they are pickles and must stay outside MEDIA_ROOT.
+JOB_WORK_DIR = env('JOB_WORK_DIR', default=os.path.join(BASE_DIR, 'var', 'jobs'))
+
+# Parsed rows flow from the parsers into the ingestion functions as a stream; each
+# ingestion function consumes it and bulk inserts it this many rows at a time.
+INGESTION_BATCH_SIZE = env.int('INGESTION_BATCH_SIZE', default=1000)
+
+# On PostgreSQL, batches of the high-volume tables (GPON ONU stats, ONU line status,
+# alarms) are COPYed into a staging table and merged in one statement; False keeps them
+# on the ORM upsert.
+INGESTION_COPY = env.bool('INGESTION_COPY', default=True)
+
+# Health check run history, applied by the prune_health_check_runs command: every run is
+# kept for HEALTH_CHECK_FULL_RESOLUTION_DAYS, older runs are thinned to the latest run per
+# node every HEALTH_CHECK_DOWNSAMPLE_DAYS, and runs past HEALTH_CHECK_RETENTION_DAYS are
+# deleted with their counter snapshots.
+HEALTH_CHECK_FULL_RESOLUTION_DAYS = env.int('HEALTH_CHECK_FULL_RESOLUTION_DAYS', default=90)
+HEALTH_CHECK_DOWNSAMPLE_DAYS = env.int('HEALTH_CHECK_DOWNSAMPLE_DAYS', default=7)
+HEALTH_CHECK_RETENTION_DAYS = env.int('HEALTH_CHECK_RETENTION_DAYS', default=730)
+
 #DATABASE_ROUTERS = ['report_data.routers.ReportDataDatabaseRouter']